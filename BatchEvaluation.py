@@ -0,0 +1,218 @@
+import itertools
+import math
+import os
+import pickle
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from CalculatorExceptions import CalculationError, CalculatorInputError, OperatorError
+from CodeGeneration import PROGRAM, CODEGEN
+from CompiledExpression import CompiledExpression
+from Variable import Variable
+from operators.OperatorType import OperatorType
+
+# The errors the calculator raises for an expression that is invalid or cannot be calculated
+EXPRESSION_ERRORS = (CalculationError, CalculatorInputError, OperatorError)
+
+# A number literal of a valid expression, which is not part of the name of a variable or of an invalid number
+_LITERAL = re.compile(r'(?<![0-9A-Za-z_.])([0-9]+(?:\.[0-9]+)?)(?![0-9A-Za-z_.])')
+
+# The number of expressions of a template from which it is compiled to a generated function (see CodeGeneration), which
+# takes longer to compile but evaluates faster
+TEMPLATE_CODEGEN_SIZE = 64
+
+# The calculator of a worker process, unpickled once when the process starts
+_worker_calculator = None
+
+
+def evaluate_or_error(calculator, expression: str):
+    """
+    Evaluates a mathematical expression, and returns its error instead of raising it. Any error is returned, including
+    the errors of custom operators that do not raise the calculator's errors, so one bad expression never fails a
+    whole batch.
+    :param calculator: the calculator that evaluates the expression
+    :param expression: the mathematical expression
+    :return: the result of the expression, or the error it raised
+    """
+    try:
+        return calculator.evaluate_expression(expression)
+    except Exception as e:
+        return e
+
+
+def split_template(expression: str) -> tuple:
+    """
+    Splits a mathematical expression into its template, which is everything but its number literals, and the texts of
+    its literals. Expressions that only differ in their literals (and in whitespaces) have the same template.
+    :param expression: the mathematical expression
+    :return: a tuple of the template, which is the tuple of the parts of the expression around its literals, and the
+        list of the texts of the literals
+    """
+    parts = _LITERAL.split(expression.replace(' ', '').replace('\t', '').replace('\n', ''))
+    return tuple(parts[0::2]), parts[1::2]
+
+
+def _supports_templates(calculator) -> bool:
+    # Operators whose symbols have the characters of names would split literals differently. Functions are always
+    # followed by their brackets, so no literal comes right after them.
+    return not calculator._use_legacy_parser and not any(
+        op.get_type() != OperatorType.FUNCTION and any(char.isalnum() or char in '._' for char in symbol)
+        for symbol, op in calculator._operators.items())
+
+
+def _compile_template(calculator, template: tuple, mode: str) -> tuple:
+    """
+    Compiles a template, in which the literal of every expression is a variable
+    :param calculator: the calculator
+    :param template: the template, as returned by split_template
+    :param mode: how the template is evaluated, "program" or "codegen"
+    :return: a tuple of the compiled template and a list of the (name, index of literal, negative) tuples of its
+        variables, where the literals with a sign minus before them have their own variables
+    :raises CalculatorInputError: if the template is invalid
+    :raises OperatorError: if an operator of the template is missing an operand
+    """
+    # The literals are numbered from 1, since the parser creates the zero of sign minuses from the text "0"
+    expression = template[0] + "".join(str(index) + part for index, part in enumerate(template[1:], 1))
+    to_number = calculator.get_backend().to_number
+    placeholders = {}
+
+    def placeholder(text: str):
+        digits = text.lstrip('-')
+        # Other numbers are only left in the template of invalid expressions
+        if not digits.isdecimal() or not 0 < int(digits) < len(template):
+            return to_number(text)
+        return placeholders.setdefault(text, Variable(text))
+
+    normalized = calculator._prepare(expression)
+    tree = calculator._parse_expression_tree(normalized, placeholder)
+    if calculator._optimize:
+        tree = calculator._optimize_tree(tree)
+    variables = [(name, int(name.lstrip('-')) - 1, name.startswith('-')) for name in placeholders]
+    return CompiledExpression(calculator, normalized, tree, mode), variables
+
+
+def evaluate_templates(calculator, expressions: list) -> list:
+    """
+    Evaluates many mathematical expressions by grouping the ones that only differ in their number literals, like
+    "(2+3)*4^2" and "(1.5 + 7)*2^2". The template of every group is normalized, validated, parsed and optimized once,
+    with a variable in place of every literal, and is then evaluated with the literals of every expression in the
+    group. Templates of many expressions are compiled to generated functions (see CodeGeneration).
+    The results are the same as evaluating every expression on its own. Expressions whose template is invalid, and
+    expressions that fail with the template of their group, are evaluated on their own, so their errors are exactly
+    the same too.
+    :param calculator: the calculator
+    :param expressions: the mathematical expressions
+    :return: a list of the results of the expressions, in the same order. The result of an expression that could not
+        be evaluated is the error it raised.
+    """
+    if not _supports_templates(calculator):
+        return [evaluate_or_error(calculator, expression) for expression in expressions]
+
+    groups = {}
+    for index, expression in enumerate(expressions):
+        template, literals = split_template(expression)
+        groups.setdefault(template, []).append((index, literals))
+
+    to_number = calculator.get_backend().to_number
+    results = [None] * len(expressions)
+    for template, members in groups.items():
+        try:
+            mode = CODEGEN if len(members) >= TEMPLATE_CODEGEN_SIZE else PROGRAM
+            compiled, variables = _compile_template(calculator, template, mode)
+        except Exception:
+            for index, _ in members:
+                results[index] = evaluate_or_error(calculator, expressions[index])
+            continue
+        for index, literals in members:
+            try:
+                results[index] = compiled.evaluate(**{
+                    name: to_number('-' + literals[literal] if negative else literals[literal])
+                    for name, literal, negative in variables})
+            except Exception:
+                # Evaluated on its own, so its error is exactly the one it raises without templates, and the rest of
+                # the group is not affected
+                results[index] = evaluate_or_error(calculator, expressions[index])
+    return results
+
+
+def _start_worker(pickled_calculator: bytes):
+    global _worker_calculator
+    _worker_calculator = pickle.loads(pickled_calculator)
+
+
+def _evaluate_chunk(expressions: list, templates: bool = False) -> list:
+    if templates:
+        return evaluate_templates(_worker_calculator, expressions)
+    return [evaluate_or_error(_worker_calculator, expression) for expression in expressions]
+
+
+def _evaluate_in_worker(expression: str):
+    return evaluate_or_error(_worker_calculator, expression)
+
+
+def iter_evaluate_in_processes(calculator, expressions, workers: int = None, chunksize: int = 1000,
+                               templates: bool = False):
+    """
+    Lazily evaluates mathematical expressions in a pool of worker processes.
+    Every worker gets a pickled copy of the calculator (its settings and operators, including custom ones, whose
+    classes must be importable by the workers) and evaluates chunks of consecutive expressions. The expressions are
+    read only as the results are consumed, with at most two chunks per worker in flight, so any number of
+    expressions can be evaluated in constant memory.
+    :param calculator: the calculator
+    :param expressions: an iterable of mathematical expressions
+    :param workers: the number of worker processes. Defaults to the number of CPUs.
+    :param chunksize: the number of expressions sent to a worker at once
+    :param templates: whether the expressions of every chunk are grouped by their templates (see evaluate_templates)
+    :return: an iterator over the results of the expressions in the same order, where the result of an expression
+        that could not be evaluated is the error it raised
+    :raises CalculatorInputError: if the number of workers or the chunk size is not positive
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise CalculatorInputError("Number of workers must be positive", workers)
+    if chunksize < 1:
+        raise CalculatorInputError("Chunk size must be positive", chunksize)
+    return _iter_results(calculator, iter(expressions), workers, chunksize, templates)
+
+
+def _iter_results(calculator, expressions, workers: int, chunksize: int, templates: bool):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(pickle.dumps(calculator),)) as executor:
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < workers * 2:
+                    chunk = list(itertools.islice(expressions, chunksize))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(_evaluate_chunk, chunk, templates))
+                if not pending:
+                    return
+                yield from pending.popleft().result()
+        finally:
+            # Nothing waits for the results that are still pending if the caller stopped early
+            for future in pending:
+                future.cancel()
+
+
+def evaluate_in_processes(calculator, expressions: list, workers: int = None, chunksize: int = None,
+                          templates: bool = False) -> list:
+    """
+    Evaluates a list of mathematical expressions in a pool of worker processes (see iter_evaluate_in_processes)
+    :param calculator: the calculator
+    :param expressions: the mathematical expressions
+    :param workers: the number of worker processes. Defaults to the number of CPUs.
+    :param chunksize: the number of expressions sent to a worker at once. Defaults to a quarter of the expressions
+        of each worker, so the workers are kept busy without sending every expression on its own.
+    :param templates: whether the expressions of every chunk are grouped by their templates (see evaluate_templates)
+    :return: the results of the expressions in the same order, where the result of an expression that could not be
+        evaluated is the error it raised
+    :raises CalculatorInputError: if the number of workers or the chunk size is not positive
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, math.ceil(len(expressions) / (max(workers, 1) * 4)))
+    return list(iter_evaluate_in_processes(calculator, expressions, workers, chunksize, templates))
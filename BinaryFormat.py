@@ -0,0 +1,310 @@
+import decimal
+import math
+import struct
+from fractions import Fraction
+
+from Tree import Tree
+from Variable import Variable
+from operators.Operator import Operator
+from operators.OperatorType import OperatorType
+
+# The first bytes of every encoded compiled expression, and the version of the format that follows them. Data of
+# other versions is never decoded.
+MAGIC = b"CX"
+FORMAT_VERSION = 1
+
+# The tags of the nodes of an encoded tree, which are written in postorder
+_FLOAT = 0  # A double, in 8 bytes
+_INTEGRAL_FLOAT = 1  # A float with an integer value, as a zigzag varint (most of the numbers in expressions)
+_INT = 2  # An int, as a zigzag varint of any length
+_FRACTION = 3  # A Fraction, as the zigzag varint of its numerator and the varint of its denominator
+_DECIMAL = 4  # A Decimal, as its text
+_VARIABLE = 5  # The index of the name of a variable
+_BINARY = 6  # The index of the symbol of an inner operator, after both of its operands
+_PREFIX = 7  # The index of the symbol of a left operator, after its operand
+_POSTFIX = 8  # The index of the symbol of a right operator, after its operand
+_CHAIN = 9  # The index of the symbol of an associative operator or a function and the count of its operands, after them
+_SHARED = 10  # The index of an operator node that was already written, and is shared by many parents
+_COMPLEX = 11  # A complex number (like a folded power of a negative number), as the doubles of its two parts
+
+_TAGS = {OperatorType.INNER: _BINARY, OperatorType.LEFT: _PREFIX, OperatorType.RIGHT: _POSTFIX}
+
+# Floats with integer values below this are exact as integers too
+_MAX_INTEGRAL_FLOAT = 2 ** 53
+
+_DOUBLE = struct.Struct("<d")
+_COMPLEX_DOUBLES = struct.Struct("<dd")
+
+
+def _write_varint(out: bytearray, value: int):
+    """Writes a non-negative integer as a varint: 7 bits in every byte, the lowest first"""
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: memoryview, position: int) -> tuple:
+    """
+    Reads a varint
+    :return: a tuple of the integer and the position after it
+    """
+    byte = data[position]
+    position += 1
+    if byte < 0x80:
+        # Small numbers, like the indexes of symbols, take a single byte
+        return byte, position
+    value = byte & 0x7f
+    shift = 7
+    while byte & 0x80:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+    return value, position
+
+
+def _write_signed(out: bytearray, value: int):
+    """Writes an integer as a zigzag varint, with its sign in the lowest bit, so small negative numbers stay short"""
+    _write_varint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+
+
+def _read_signed(data: memoryview, position: int) -> tuple:
+    value, position = _read_varint(data, position)
+    return (value >> 1) ^ -(value & 1), position
+
+
+def _write_text(out: bytearray, text: str):
+    encoded = text.encode()
+    _write_varint(out, len(encoded))
+    out += encoded
+
+
+def _read_text(data: memoryview, position: int) -> tuple:
+    """
+    Reads a text
+    :return: a tuple of the text and the position after it
+    """
+    length, position = _read_varint(data, position)
+    if position + length > len(data):
+        raise IndexError("The text is cut off")
+    # Decoded straight from the buffer, without copying it into bytes first
+    return str(data[position:position + length], "utf-8"), position + length
+
+
+def encode_tree(tree: Tree, out: bytearray = None) -> bytearray:
+    """
+    Encodes an expression tree: the symbols of its operators and the names of its variables, and then its nodes in
+    postorder, each a tag byte followed by varints. Operators are referenced by their symbols, so the tree is decoded
+    with the operators of whoever decodes it. A node shared by many parents (see SubtreeTable) is only written once.
+    :param tree: the expression tree, which compile_tree accepts
+    :param out: a buffer to append the encoding to, or None to start a new one
+    :return: the buffer
+    :raises TypeError: if the tree has numbers of other types than float, int, Fraction, Decimal and complex
+    """
+    out = bytearray() if out is None else out
+    symbols = {}
+    names = {}
+    body = bytearray()
+    # The index of every operator node that was written, by its id. A node that comes again is shared.
+    written = {}
+    for node in tree.iter_postorder(shared=True):
+        value = node.get_value()
+        value_type = type(value)
+        if value_type is float:
+            if value.is_integer() and abs(value) < _MAX_INTEGRAL_FLOAT and (value or math.copysign(1.0, value) > 0):
+                body.append(_INTEGRAL_FLOAT)
+                _write_signed(body, int(value))
+            else:
+                # Including -0.0, which is not an integer when it is read back
+                body.append(_FLOAT)
+                body += _DOUBLE.pack(value)
+        elif value_type is Variable:
+            body.append(_VARIABLE)
+            _write_varint(body, names.setdefault(value.get_name(), len(names)))
+        elif isinstance(value, Operator):
+            if id(node) in written:
+                body.append(_SHARED)
+                _write_varint(body, written[id(node)])
+                continue
+            written[id(node)] = len(written)
+            index = symbols.setdefault(value.get_symbol(), len(symbols))
+            if node.get_operands() is not None:
+                body.append(_CHAIN)
+                _write_varint(body, index)
+                _write_varint(body, len(node.get_operands()))
+            else:
+                body.append(_TAGS[value.get_type()])
+                _write_varint(body, index)
+        elif value_type is int:
+            body.append(_INT)
+            _write_signed(body, value)
+        elif value_type is Fraction:
+            body.append(_FRACTION)
+            _write_signed(body, value.numerator)
+            _write_varint(body, value.denominator)
+        elif value_type is decimal.Decimal:
+            body.append(_DECIMAL)
+            _write_text(body, str(value))
+        elif value_type is complex:
+            body.append(_COMPLEX)
+            body += _COMPLEX_DOUBLES.pack(value.real, value.imag)
+        else:
+            raise TypeError("Cannot encode a number of type " + value_type.__name__)
+
+    for table in (symbols, names):
+        _write_varint(out, len(table))
+        for text in table:
+            _write_text(out, text)
+    _write_varint(out, len(body))
+    out += body
+    return out
+
+
+def _decode_tree(data: memoryview, position: int, operators: dict) -> tuple:
+    """
+    Decodes an expression tree, see encode_tree
+    :return: a tuple of the tree and the position after it
+    """
+    tables = []
+    for _ in range(2):
+        count, position = _read_varint(data, position)
+        table = []
+        for _ in range(count):
+            text, position = _read_text(data, position)
+            table.append(text)
+        tables.append(table)
+    symbols = [operators[symbol] for symbol in tables[0]]
+    variables = [Variable(name) for name in tables[1]]
+    length, position = _read_varint(data, position)
+    end = position + length
+    if end > len(data):
+        raise IndexError("The tree is cut off")
+
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    written = []
+    while position < end:
+        tag = data[position]
+        position += 1
+        if tag == _INTEGRAL_FLOAT:
+            number, position = _read_signed(data, position)
+            push(Tree(float(number)))
+        elif tag >= _BINARY:
+            if tag == _SHARED:
+                index, position = _read_varint(data, position)
+                push(written[index])
+                continue
+            if tag == _COMPLEX:
+                if position + 16 > end:
+                    raise IndexError("A number is cut off")
+                push(Tree(complex(*_COMPLEX_DOUBLES.unpack_from(data, position))))
+                position += 16
+                continue
+            index, position = _read_varint(data, position)
+            op = symbols[index]
+            if tag == _BINARY:
+                right = pop()
+                node = Tree(op, pop(), right)
+            elif tag == _PREFIX:
+                node = Tree(op, None, pop())
+            elif tag == _POSTFIX:
+                node = Tree(op, pop())
+            elif tag == _CHAIN:
+                count, position = _read_varint(data, position)
+                if count < 1 or count > len(stack):
+                    raise IndexError("A chain has too few operands")
+                node = Tree(op, operands=stack[-count:])
+                del stack[-count:]
+            else:
+                raise ValueError("Unknown tag " + str(tag))
+            written.append(node)
+            push(node)
+        elif tag == _VARIABLE:
+            index, position = _read_varint(data, position)
+            push(Tree(variables[index]))
+        elif tag == _FLOAT:
+            if position + 8 > end:
+                raise IndexError("A number is cut off")
+            push(Tree(_DOUBLE.unpack_from(data, position)[0]))
+            position += 8
+        elif tag == _INT:
+            number, position = _read_signed(data, position)
+            push(Tree(number))
+        elif tag == _FRACTION:
+            numerator, position = _read_signed(data, position)
+            denominator, position = _read_varint(data, position)
+            push(Tree(Fraction(numerator, denominator)))
+        elif tag == _DECIMAL:
+            text, position = _read_text(data, position)
+            push(Tree(decimal.Decimal(text)))
+        else:
+            raise ValueError("Unknown tag " + str(tag))
+    if position != end or len(stack) != 1:
+        raise ValueError("Invalid tree")
+    return stack[0], position
+
+
+def decode_tree(data: bytes | bytearray | memoryview, operators: dict) -> Tree:
+    """
+    Decodes an expression tree that encode_tree encoded. The data is read through a memoryview, so it is not copied.
+    :param data: the encoded tree
+    :param operators: the operators of the tree, mapped by their symbols
+    :return: the expression tree
+    :raises ValueError: if the data is not a valid tree, or it has operators that are not in operators
+    """
+    try:
+        with memoryview(data) as view:
+            tree, position = _decode_tree(view, 0, operators)
+            if position != len(view):
+                raise ValueError("Invalid tree")
+    except (KeyError, IndexError, TypeError, ArithmeticError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid tree") from e
+    return tree
+
+
+def dumps_expression(expression: str, tree: Tree | None) -> bytes:
+    """
+    Encodes a compiled expression: the magic bytes and the version of the format, the normalized expression and its
+    expression tree (see encode_tree)
+    :param expression: the normalized expression
+    :param tree: the expression tree, or None if the expression is evaluated from its text
+    :return: the encoded expression
+    :raises TypeError: if the tree has numbers of other types than float, int, Fraction, Decimal and complex
+    """
+    out = bytearray(MAGIC)
+    out.append(FORMAT_VERSION)
+    _write_text(out, expression)
+    out.append(tree is not None)
+    if tree is not None:
+        encode_tree(tree, out)
+    return bytes(out)
+
+
+def loads_expression(data: bytes | bytearray | memoryview, operators: dict) -> tuple:
+    """
+    Decodes a compiled expression that dumps_expression encoded. The data is read through a memoryview, so it is not
+    copied.
+    :param data: the encoded expression
+    :param operators: the operators of the tree, mapped by their symbols
+    :return: a tuple of the normalized expression and its expression tree, or None if it has none
+    :raises ValueError: if the data is not a compiled expression of this version of the format, or it has operators
+        that are not in operators
+    """
+    try:
+        with memoryview(data) as view:
+            if view[:len(MAGIC)] != MAGIC:
+                raise ValueError("Not a compiled expression")
+            if len(view) <= len(MAGIC) or view[len(MAGIC)] != FORMAT_VERSION:
+                raise ValueError("Unsupported version of the format")
+            expression, position = _read_text(view, len(MAGIC) + 1)
+            tree = None
+            position += 1
+            if view[position - 1]:
+                tree, position = _decode_tree(view, position, operators)
+            if position != len(view):
+                raise ValueError("Invalid compiled expression")
+    except (KeyError, IndexError, TypeError, ArithmeticError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid compiled expression") from e
+    return expression, tree
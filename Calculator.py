@@ -1,5 +1,25 @@
+import bisect
+import contextlib
+import os
+import re
+import string
+import threading
+from collections import OrderedDict, namedtuple
+
+from BatchEvaluation import evaluate_in_processes, evaluate_or_error, evaluate_templates
 from CalculatorExceptions import OperatorError, CalculatorInputError, CalculationError
+from CodeGeneration import PROGRAM, CODEGEN, MODES
+from CompiledExpression import CompiledExpression
+from Instrumentation import Instrumentation
+from NumericBackends import NumericBackend, get_backend, FLOAT
+from Optimizer import optimize_tree
+from Parser import Parser, character_classes, symbol_trie, symbol_before, VARIABLE_START, VARIABLE_CHARS, DIGIT_CHAR, \
+    POINT_CHAR, NAME_CHAR, OPEN_CHAR, CLOSE_CHAR, OPERATOR_CHAR
+from PersistentCache import PersistentCache, operators_fingerprint
+from Program import compile_tree
+from SubtreeTable import SubtreeTable
 from Tree import Tree
+from Variable import Variable
 from operators.Operator import Operator, Plus, Minus, Multiply, Divide
 from operators.OperatorType import OperatorType
 
@@ -25,10 +45,85 @@ def _validate_brackets(expression: str):
         raise CalculatorInputError("Missing closing bracket(s)", order_of_brackets)
 
 
+# Two or more minuses in a row
+_MINUS_SEQUENCE = re.compile('-{2,}')
+
+# Characters that are part of numbers, brackets and the arguments of functions, which cannot be part of a symbol
+_RESERVED_CHARS = frozenset(string.digits + string.whitespace + '.(),')
+
+
+def _original_offset(expression: str, index: int) -> int:
+    """
+    Finds the offset in a mathematical expression of one of its characters that are not whitespaces
+    :param expression: the mathematical expression
+    :param index: the index of the character among the characters that are not whitespaces
+    :return: the offset of the character in the expression
+    """
+    for offset, char in enumerate(expression):
+        if char not in ' \t\n':
+            if index == 0:
+                return offset
+            index -= 1
+    return len(expression)
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "maxsize", "currsize"])
+
+# An entry of the operator dispatch table of a calculator: what its loops need to know about an operator, looked up
+# once when the operator is added
+OperatorEntry = namedtuple("OperatorEntry", ["priority", "type", "calc", "op"])
+
+
 class Calculator:
-    def __init__(self):
+    def __init__(self, use_legacy_parser: bool = False, cache_size: int = 1024, optimize: bool = True,
+                 backend: str | NumericBackend = FLOAT, share_subtrees: bool = False,
+                 persistent_cache: str | os.PathLike | PersistentCache = None):
+        """
+        :param use_legacy_parser: build expression trees with the original split-on-last-operator parser instead of
+            the linear precedence climbing parser. Mostly useful for comparing the two.
+        :param cache_size: the maximal number of compiled expressions the calculator keeps. The least recently used
+            expression is dropped when the cache is full. 0 disables the cache.
+        :param optimize: fold constant subtrees and flatten chains of associative operators when compiling
+            expressions
+        :param backend: the kind of numbers to calculate with: "float" (the default), "int" (integers stay exact
+            while the operators keep them integral), "fraction", "decimal" or a NumericBackend
+        :param share_subtrees: intern the trees of compiled expressions in a SubtreeTable, so identical subtrees are
+            calculated once per evaluation and share their memory across all the expressions the calculator compiled
+        :param persistent_cache: the path of an SQLite file, or a PersistentCache, that keeps the plans of compiled
+            expressions between runs, so a calculator with the same operators does not parse them again
+        :raises CalculatorInputError: if the cache size is negative, the backend is unknown, or the legacy parser is
+            used with another backend than float
+        """
+        if cache_size < 0:
+            raise CalculatorInputError("Cache size cannot be negative", cache_size)
+        self._backend = get_backend(backend)
+        if use_legacy_parser and self._backend.get_name() != FLOAT:
+            raise CalculatorInputError("The legacy parser only calculates with floats")
+        self._use_legacy_parser = use_legacy_parser
+        self._optimize = optimize
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_evictions = 0
+        self._instrumentation = None
+        self._subtrees = SubtreeTable() if share_subtrees else None
+        if isinstance(persistent_cache, (str, os.PathLike)):
+            persistent_cache = PersistentCache(persistent_cache)
+        self._persistent_cache = persistent_cache
+        # The fingerprint of the operators, once it is needed (see _get_fingerprint)
+        self._fingerprint = None
         self._operators = {}
-        self._allowed_chars = ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', '.', '(', ')']
+        # The operators adapted to the numeric backend, which are the ones in expression trees
+        self._numeric_operators = {}
+        self._dispatch = {}
+        self._char_classes = character_classes(self._operators)
+        # The tries of the symbols and of the reversed symbols, once an operator has a symbol longer than a character
+        # or is a function. Until then every operator is found by its character alone.
+        self._trie = None
+        self._reversed_trie = None
+        self._allowed_chars = {'0', '1', '2', '3', '4', '5', '6', '7', '8', '9', '.', '(', ')'}
 
         # Adds the 4 default operations: + - / *
         self.add_operators([Plus(), Minus(), Multiply(), Divide()])
@@ -36,6 +131,10 @@ class Calculator:
     def add_operator(self, op: Operator):
         """
         Adds a new operator to the calculator
+        Symbols may be longer than a character, like ** or mod, and the longest symbol that matches is used. Symbols
+        cannot have digits, points, brackets, commas or whitespaces, and longer symbols cannot have minuses either.
+        An operator of type FUNCTION is called by its name, which is like the name of a variable, with its arguments
+        in brackets: max(1, 2, 3).
         :param op: The new operator
         :raises InvalidOperatorError:  if the Operator does not exist, has an invalid or a missing attribute.
         :raises CalculatorInputError: if op is not an instance of Operand or if the calculator already has an operator
@@ -46,21 +145,48 @@ class Calculator:
         if not isinstance(op, Operator):
             raise CalculatorInputError("Only objects that are instances of the class Operators can be added to "
                                        "the calculator as an operator")
-        if op.get_symbol() is None:
+        symbol = op.get_symbol()
+        if symbol is None:
             raise OperatorError("Operator is missing a symbol. Cannot be None!")
-        if len(op.get_symbol()) != 1:
-            raise OperatorError("Operator symbol must be a single character! Current length",
-                                len(op.get_symbol()))
+        if len(symbol) == 0:
+            raise OperatorError("Operator symbol cannot be empty!")
         if op.get_type() is None:
             raise OperatorError("Operator is missing a type. Cannot be None!")
         if op.get_priority() < 1:
             raise OperatorError("Operator has invalid priority set, must be positive! Current priority",
                                 op.get_priority())
-        if op.get_symbol() in self._allowed_chars:
-            raise OperatorError("Operator symbol is already in use and cannot be given an additional use",
-                                op.get_symbol())
-        self._operators[op.get_symbol()] = op
-        self._allowed_chars.append(op.get_symbol())
+        if symbol in self._allowed_chars:
+            raise OperatorError("Operator symbol is already in use and cannot be given an additional use", symbol)
+        function = op.get_type() == OperatorType.FUNCTION
+        if function:
+            if symbol[0] not in VARIABLE_START or not VARIABLE_CHARS.issuperset(symbol):
+                raise OperatorError("Function name must start with a letter or an underscore, followed by letters, "
+                                    "underscores and digits", symbol)
+            if op.get_arity()[0] < 1:
+                raise OperatorError("Function must be called with at least one argument", symbol)
+        elif not _RESERVED_CHARS.isdisjoint(symbol):
+            raise OperatorError("Operator symbol cannot contain digits, points, brackets, commas or whitespaces",
+                                symbol)
+        elif len(symbol) > 1 and '-' in symbol:
+            raise OperatorError("Operator symbol longer than a character cannot contain minuses", symbol)
+        if self._use_legacy_parser and (function or len(symbol) > 1):
+            raise OperatorError("The legacy parser only supports operators with single-character symbols", symbol)
+        self._operators[symbol] = op
+        self._allowed_chars.add(op.get_symbol())
+        numeric_op = self._backend.adapt(op)
+        # The lookup tables are never changed, only replaced, so a loop that is using them never sees a partial update
+        self._numeric_operators = {**self._numeric_operators, op.get_symbol(): numeric_op}
+        self._dispatch = {**self._dispatch, op.get_symbol(): OperatorEntry(op.get_priority(), op.get_type(),
+                                                                           numeric_op._calc, numeric_op)}
+        self._char_classes = character_classes(self._operators)
+        if self._trie is not None or function or len(symbol) > 1:
+            self._trie = symbol_trie(self._operators)
+            # Functions are followed by their brackets, so they never come right before a sequence of minuses
+            self._reversed_trie = symbol_trie([other for other, other_op in self._operators.items()
+                                               if other_op.get_type() != OperatorType.FUNCTION], reverse=True)
+        self._fingerprint = None
+        # Compiled expressions depend on the operators the calculator had when they were compiled
+        self.clear_cache()
 
     def add_operators(self, operators: list):
         """
@@ -73,7 +199,241 @@ class Calculator:
         for op in operators:
             self.add_operator(op)
 
-    def evaluate_expression(self, expression: str) -> float:
+    def evaluate_expression(self, expression: str, **variables) -> float:
+        """
+        Evaluates a mathematical expression
+        :param expression: the mathematical expression as a string
+        :param variables: the values of the variables in the expression, by their names
+        :return: the result of the expression
+        :raises CalculatorInputError: if the expression is invalid or the value of one of its variables is missing
+        :raises CalculationError: if the expression cannot be calculated based on the limitations of its operators
+        """
+        return self.compile(expression).evaluate(**variables)
+
+    def evaluate_batch(self, expressions, workers: int = None, chunksize: int = None, templates: bool = False) -> list:
+        """
+        Evaluates many independent mathematical expressions, in parallel worker processes.
+        An expression that cannot be evaluated does not fail the batch: its result is the error it raised.
+        With a single worker the expressions are evaluated in this process, without starting a pool.
+        :param expressions: the mathematical expressions, as strings
+        :param workers: the number of worker processes. Defaults to the number of CPUs.
+        :param chunksize: the number of expressions sent to a worker at once. Defaults to a quarter of the
+            expressions of each worker.
+        :param templates: whether expressions that only differ in their number literals are compiled once, as a
+            template that is evaluated with the literals of each of them (see evaluate_templates). Pays off when many
+            expressions share the same structure. Every worker groups the expressions of its own chunks.
+        :return: a list of the results of the expressions, in the same order. The result of an expression that could
+            not be evaluated is the error it raised, usually a CalculationError, CalculatorInputError or OperatorError.
+        :raises CalculatorInputError: if the number of workers or the chunk size is not positive
+        """
+        expressions = list(expressions)
+        if workers == 1:
+            if templates:
+                return evaluate_templates(self, expressions)
+            return [evaluate_or_error(self, expression) for expression in expressions]
+        return evaluate_in_processes(self, expressions, workers, chunksize, templates)
+
+    def __getstate__(self) -> dict:
+        # Only the settings and the operators are pickled. The cache and its lock are created again, empty.
+        return {"use_legacy_parser": self._use_legacy_parser, "cache_size": self._cache_size,
+                "optimize": self._optimize, "backend": self._backend, "share_subtrees": self._subtrees is not None,
+                "persistent_cache": self._persistent_cache, "operators": list(self._operators.values())}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state["use_legacy_parser"], state["cache_size"], state["optimize"], state["backend"],
+                      state["share_subtrees"], state["persistent_cache"])
+        # The default operators were already added by __init__
+        self.add_operators([op for op in state["operators"] if not self.is_operator(op.get_symbol())])
+
+    def compile(self, expression: str, mode: str = PROGRAM) -> CompiledExpression:
+        """
+        Normalizes and validates a mathematical expression once, so it can be evaluated many times.
+        Compiled expressions are kept in a least recently used cache, keyed by the normalized expression. An expression
+        that is already normalized is found in the cache without being read at all.
+        :param expression: the mathematical expression as a string
+        :param mode: how the expression is evaluated: "program" runs a program that calls the operators, and "codegen"
+            generates a Python function in which the built-in operators are inlined. Generating the function takes
+            longer, so it pays off for expressions that are evaluated many times.
+        :return: the compiled expression
+        :raises CalculatorInputError: if the expression is invalid, the mode is unknown, or the legacy parser should
+            generate code for an expression with brackets
+        """
+        if mode not in MODES:
+            raise CalculatorInputError("Unknown compilation mode", mode)
+        # Expressions compiled in the default mode are keyed by themselves, so looking them up creates nothing
+        key = expression if mode == PROGRAM else (mode, expression)
+        if self._cache_size > 0:
+            compiled = self._cache_lookup(key)
+            if compiled is not None:
+                return compiled
+
+        # Normalizes and validates the expression in a single pass
+        normalized = self._prepare(expression)
+
+        if normalized != expression:
+            key = normalized if mode == PROGRAM else (mode, normalized)
+            if self._cache_size > 0:
+                compiled = self._cache_lookup(key)
+                if compiled is not None:
+                    return compiled
+        if self._cache_size > 0:
+            with self._cache_lock:
+                self._cache_misses += 1
+        expression = normalized
+
+        # The legacy parser cannot parse brackets, so it evaluates them one by one when the expression is evaluated
+        tree = None
+        if not self._use_legacy_parser or '(' not in expression:
+            tree = self._load_plan(expression)
+            if tree is None:
+                tree = self._parse_expression_tree(expression)
+                if self._optimize:
+                    tree = self._optimize_tree(tree)
+                self._store_plan(expression, tree)
+            if self._subtrees is not None:
+                tree = self._subtrees.intern(tree)
+        elif mode == CODEGEN:
+            raise CalculatorInputError("The legacy parser cannot generate code for expressions with brackets")
+        compiled = CompiledExpression(self, expression, tree, mode)
+
+        if self._cache_size > 0:
+            with self._cache_lock:
+                self._cache[key] = compiled
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+                    self._cache_evictions += 1
+        return compiled
+
+    def _get_fingerprint(self) -> str:
+        """
+        Gets the fingerprint of the operators and settings of the calculator, which keys the plans of its expressions
+        in the persistent cache (see operators_fingerprint)
+        :return: the fingerprint
+        """
+        if self._fingerprint is None:
+            self._fingerprint = operators_fingerprint(self._operators, self._backend.get_name(), self._optimize,
+                                                      self._use_legacy_parser)
+        return self._fingerprint
+
+    def _load_plan(self, expression: str) -> Tree | None:
+        """
+        Loads the expression tree of a normalized expression from the persistent cache
+        :param expression: the normalized expression
+        :return: the expression tree, or None if the calculator has no persistent cache or it has no plan of the
+            expression
+        """
+        if self._persistent_cache is None:
+            return None
+        return self._persistent_cache.load_tree(self._get_fingerprint(), expression, self._numeric_operators)
+
+    def _store_plan(self, expression: str, tree: Tree):
+        """
+        Stores the expression tree of a normalized expression in the persistent cache, if the calculator has one.
+        The plan of an expression without variables whose operators are all pure is its result, if it has one. Only the
+        operators in its tree count, so the result of an impure operator is never kept, even if the optimizer did not
+        calculate it.
+        :param expression: the normalized expression
+        :param tree: the compiled expression tree
+        """
+        if self._persistent_cache is None:
+            return
+        fingerprint = self._get_fingerprint()
+        if not tree.is_leaf() and all(not isinstance(node.get_value(), Variable) and (
+                not isinstance(node.get_value(), Operator) or node.get_value().is_pure())
+                for node in tree.iter_postorder()):
+            try:
+                tree = Tree(compile_tree(tree).run())
+            except (CalculationError, CalculatorInputError, OperatorError, ArithmeticError, ValueError, TypeError):
+                # The expression is kept, and raises its error whenever it is evaluated
+                pass
+        self._persistent_cache.store_tree(fingerprint, expression, tree)
+
+    def _cache_lookup(self, key: str | tuple) -> CompiledExpression | None:
+        """
+        Looks up an expression in the cache of compiled expressions, and counts a hit if it is there
+        :param key: the normalized expression, or a tuple of the compilation mode and the normalized expression for
+            modes other than the default one
+        :return: the compiled expression, or None if it is not in the cache
+        """
+        with self._cache_lock:
+            compiled = self._cache.get(key)
+            if compiled is not None:
+                self._cache.move_to_end(key)
+                self._cache_hits += 1
+            return compiled
+
+    def cache_info(self) -> CacheInfo:
+        """
+        Gets statistics about the cache of compiled expressions
+        :return: the number of cache hits, misses and evictions, the maximal size of the cache and its current size
+        """
+        return CacheInfo(self._cache_hits, self._cache_misses, self._cache_evictions, self._cache_size,
+                         len(self._cache))
+
+    def clear_cache(self):
+        """
+        Removes all compiled expressions from the cache, and the shared subtrees of their trees (if the calculator
+        shares subtrees). The cache statistics are kept.
+        """
+        with self._cache_lock:
+            self._cache.clear()
+        if self._subtrees is not None:
+            self._subtrees.clear()
+
+    def get_backend(self) -> NumericBackend:
+        """
+        Gets the numeric backend the calculator calculates with
+        :return: the backend
+        """
+        return self._backend
+
+    def set_instrumentation(self, instrumentation):
+        """
+        Starts or stops collecting timings and counters of the calculator's work. While no instrumentation is set, the
+        calculator does not do any additional work at all.
+        The cache is cleared, since expressions are instrumented when they are compiled.
+        Expressions that are evaluated by worker processes (evaluate_batch) are not instrumented.
+        :param instrumentation: the Instrumentation that collects the statistics, or None to stop collecting them
+        """
+        if self._instrumentation is not None:
+            self._instrumentation.detach(self)
+        self._instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation.attach(self)
+        self.clear_cache()
+
+    def get_instrumentation(self):
+        """
+        Gets the instrumentation that collects the statistics of the calculator
+        :return: the Instrumentation, or None if the calculator is not instrumented
+        """
+        return self._instrumentation
+
+    @contextlib.contextmanager
+    def instrumented(self, instrumentation=None):
+        """
+        A context manager that instruments the calculator inside its block, and restores the previous instrumentation
+        when the block ends
+        :param instrumentation: the Instrumentation that collects the statistics. A new one by default.
+        :return: the Instrumentation, as the target of the with statement
+        """
+        if instrumentation is None:
+            instrumentation = Instrumentation()
+        previous = self._instrumentation
+        self.set_instrumentation(instrumentation)
+        try:
+            yield instrumentation
+        finally:
+            self.set_instrumentation(previous)
+
+    def _normalize(self, expression: str) -> str:
+        """
+        Removes all whitespaces and unnecessary minuses from a mathematical expression.
+        Compiling an expression does this together with _validate, in a single pass (see _prepare).
+        :param expression: the mathematical expression
+        :return: the normalized expression
+        :raises CalculatorInputError: if the expression is empty
+        """
         expression = expression.replace(' ', '')  # Removes all spaces in the expression
         expression = expression.replace('\t', '')  # Removes all tabs in the expression
         expression = expression.replace('\n', '')  # Removes all newlines in the expression
@@ -83,32 +443,176 @@ class Calculator:
             raise CalculatorInputError("Expression is empty")
 
         # Leaving only necessary minuses in the expression
-        expression = self._remove_adjacent_minuses(expression)
+        return self._remove_adjacent_minuses(expression)
 
-        # Checks for not supported characters
+    def _validate(self, expression: str):
+        """
+        Validates a normalized mathematical expression with a separate pass for each kind of fault: unsupported
+        characters, then brackets, then the structure around operators
+        :param expression: the normalized mathematical expression
+        :raises CalculatorInputError: if the expression is invalid
+        """
         self._validate_characters(expression)
-
-        # Checks for valid brackets usage and structure
         _validate_brackets(expression)
-
-        # Checks for a valid expression structure
         self._validate_structure(expression)
 
-        return self._calc(expression)
+    def _prepare(self, expression: str) -> str:
+        """
+        Normalizes and validates a mathematical expression, with a single pass over its characters in Python.
+        Whitespaces are removed and unsupported characters are found by string methods and set operations first, and
+        sequences of minuses are collapsed only if there are any. The pass then tracks the depth of brackets and checks
+        the structure around every operator and decimal point together, while skipping digits and letters.
+        It is equivalent to _normalize followed by _validate, and raises the same errors: when an expression has more
+        than one fault, the one that _validate would find first. The errors also have the offset of their fault in the
+        original expression.
+        When the calculator has operators with symbols longer than a character or functions, the structure around
+        operators is checked by the parser instead, which reads whole symbols.
+        :param expression: the mathematical expression
+        :return: the normalized expression
+        :raises CalculatorInputError: if the expression is empty or invalid
+        """
+        compact = expression.replace(' ', '').replace('\t', '').replace('\n', '')
+        if compact == "":
+            raise CalculatorInputError("Expression is empty")
+        classes = self._char_classes
+        if not classes.keys() >= set(compact):
+            for offset, char in enumerate(expression):
+                if char not in classes and char not in ' \t\n':
+                    raise CalculatorInputError("The expression contains an unsupported character: " + char,
+                                               offset=offset)
+
+        normalized = self._remove_adjacent_minuses(compact) if '--' in compact else compact
+
+        def offset_of(index: int) -> int:
+            if normalized is not compact:
+                segments = self._minus_segments(compact)
+                segment_start, compact_start = segments[bisect.bisect_right(segments, (index, len(compact))) - 1]
+                index = compact_start + index - segment_start
+            return _original_offset(expression, index)
+
+        open_brackets = []  # The indices of the brackets that are still open
+        structure_fault = None
+        last = len(normalized) - 1
+        symbols = self._trie is not None
+        for ch, char in enumerate(normalized):
+            char_class = classes[char]
+            if char_class == DIGIT_CHAR or char_class == NAME_CHAR:
+                continue
+            if char_class == OPEN_CHAR:
+                open_brackets.append(ch)
+            elif char_class == CLOSE_CHAR:
+                if open_brackets:
+                    open_brackets.pop()
+                elif ch != last:
+                    # Unsupported characters were already checked, so no other fault can take precedence
+                    raise CalculatorInputError("Invalid brackets structure: a closing bracket can only come after "
+                                               "its matching opening bracket.", offset=offset_of(ch))
+                else:
+                    raise CalculatorInputError("Missing closing bracket(s)", -1, offset=offset_of(ch))
+            elif structure_fault is None and (char_class == POINT_CHAR or not symbols):
+                # Most operators are between two operands and most decimal points are between two digits, which is
+                # all the structure that needs to be checked for them
+                if 0 < ch < last:
+                    before = classes[normalized[ch - 1]]
+                    after = classes[normalized[ch + 1]]
+                    if char_class == POINT_CHAR:
+                        if before == DIGIT_CHAR and after == DIGIT_CHAR:
+                            continue
+                    elif before != OPERATOR_CHAR and after != OPERATOR_CHAR:
+                        continue
+                # Faults of brackets take precedence, so the rest of the brackets are still checked
+                message = self._structure_fault(normalized, ch)
+                if message is not None:
+                    structure_fault = (message, ch)
+
+        if open_brackets:
+            raise CalculatorInputError("Missing closing bracket(s)", len(open_brackets),
+                                       offset=offset_of(open_brackets[0]))
+        if structure_fault is not None:
+            raise CalculatorInputError(structure_fault[0], offset=offset_of(structure_fault[1]))
+        return normalized
+
+    def _minus_segments(self, expression: str) -> list:
+        """
+        Finds where the parts of a mathematical expression that _remove_adjacent_minuses copies as they are end up in
+        its result, to find the original offsets of the characters of the result
+        :param expression: the mathematical expression, without whitespaces
+        :return: a sorted list of (index in the result, index in the expression) of the start of every copied part
+        """
+        segments = [(0, 0)]
+        length = 0  # The length of the result so far
+        copied = 0  # The index in the expression up to which it was copied
+        for match in _MINUS_SEQUENCE.finditer(expression):
+            start, end = match.span()
+            length += start - copied
+            kept = self._kept_minuses(expression, start, end)
+            segments.append((length, end - len(kept)))
+            length += len(kept)
+            copied = end
+        return segments
+
+    def _kept_minuses(self, expression: str, start: int, end: int) -> str:
+        """
+        Decides what is left of a sequence of minuses of a mathematical expression (see _remove_adjacent_minuses)
+        :param expression: the mathematical expression, without whitespaces
+        :param start: the index of the first minus of the sequence
+        :param end: the index after the last minus of the sequence
+        :return: the minuses that are left
+        """
+        if (end - start) % 2 == 1:
+            return '-'
+        if start == 0:
+            return '' if end != len(expression) else '--'
+        if self._trie is None:
+            entry = self._dispatch.get(expression[start - 1])
+        else:
+            entry = self._dispatch.get(symbol_before(self._reversed_trie, expression, start))
+        if entry is not None and entry.type != OperatorType.RIGHT:
+            return ''
+        return '--'
 
     def _validate_characters(self, expression: str):
         """
-        The function receives a str expression and checks whether it contains illegal characters
+        The function receives a str expression and checks whether it contains illegal characters.
+        Other than the allowed characters, letters and underscores are allowed as part of the names of variables.
         :param expression: A mathematical expression
         :raises CalculatorInputError: if the expression contains characters that the calculator does not support.
         """
+        classes = self._char_classes
+        if classes.keys() >= set(expression):
+            return
         for char in expression:
-            if char not in self._allowed_chars:
+            if char not in classes:
                 raise CalculatorInputError("The expression contains an unsupported character: " + char)
 
+    def _parse_expression_tree(self, expression: str, to_number=None) -> Tree:
+        """
+        Creates the expression tree of a mathematical expression with the parser the calculator is configured to use.
+        Expressions inside brackets become subtrees, except with the legacy parser, which cannot parse brackets.
+        :param expression: the mathematical expression
+        :param to_number: the function that converts the text of a number to the value of its leaf. Defaults to the
+            backend's. Not supported by the legacy parser.
+        :return: a new expression tree that represents this expression
+        """
+        if self._use_legacy_parser:
+            return self._build_expression_tree(expression)
+        if to_number is None:
+            to_number = self._backend.to_number
+        return Parser(expression, self._numeric_operators, self._char_classes, to_number, self._trie).parse()
+
+    def _optimize_tree(self, tree: Tree) -> Tree:
+        """
+        Creates an optimized copy of an expression tree (see optimize_tree)
+        :param tree: the expression tree
+        :return: the optimized tree
+        """
+        return optimize_tree(tree)
+
     def _build_expression_tree(self, expression: str) -> Tree:
         """
-        The function creates an expression tree of a provided mathematical expression
+        The function creates an expression tree of a provided mathematical expression.
+        This is the original parser, which splits the expression on its last operator with the lowest priority. It
+        takes quadratic time, so it is only used when the calculator is created with use_legacy_parser=True.
         :param expression: the mathematical expression
         :return: a new expression tree that represents this expression
         """
@@ -118,7 +622,7 @@ class Calculator:
                 return Tree(float(expression))
             except ValueError:
                 raise CalculatorInputError("Something went wrong...")
-        op = self._get_operator(expression[op_index])
+        op = self._dispatch[expression[op_index]].op
         current_node = Tree(op)
 
         if op.get_type() != OperatorType.LEFT:
@@ -164,7 +668,9 @@ class Calculator:
 
     def _calc(self, expression: str) -> float:
         """
-        Evaluates the float value of a complex mathematical expression (which contains brackets)
+        Evaluates the float value of a complex mathematical expression (which contains brackets) the way the legacy
+        parser does: the expression inside each pair of brackets is evaluated first and replaced with its result in the
+        expression string. Only used when the calculator is created with use_legacy_parser=True.
         :param expression: the mathematical expression as a string
         :return: the result of the expression
         :raises CalculatorInputError: if the expression contains empty brackets: ().
@@ -199,11 +705,11 @@ class Calculator:
 
     def is_operator(self, char: str) -> bool:
         """
-        Checks whether a character is a supported operator in the calculator
+        Checks whether a character (or a longer symbol) is a supported operator in the calculator
         :param char: the charactor / symbol
         :return: True if it's a supported operator, False otherwise
         """
-        return self._operators.get(char) is not None
+        return char in self._dispatch
 
     def _get_last_operator(self, expression: str) -> int:
         """
@@ -211,23 +717,24 @@ class Calculator:
         :param expression: the mathematical expression
         :return: the index of the operator with the highest priority, or -1 if there are no operators
         """
+        get_entry = self._dispatch.get
         res = -1
         min_priority = None
-        for i in range(len(expression)):
-            if self.is_operator(expression[i]) and (
-                    min_priority is None or self._get_operator(expression[i]).get_priority() <= min_priority):
-                op = self._get_operator(expression[i])
-                if op.get_symbol() != '-' or (
-                        i > 0 and (not self.is_operator(expression[i - 1])
-                                   or self._get_operator(expression[i - 1]).get_type() == OperatorType.RIGHT)):
+        previous = None
+        for i, char in enumerate(expression):
+            entry = get_entry(char)
+            if entry is not None and (min_priority is None or entry.priority <= min_priority):
+                if char != '-' or (i > 0 and (previous is None or previous.type == OperatorType.RIGHT)):
                     """Differentiating between minus that represent sign and - that are operators"""
                     res = i
-                    min_priority = self._get_operator(expression[i]).get_priority()
+                    min_priority = entry.priority
+            previous = entry
         return res
 
     def print_allowed_chars(self):
         """Prints all allowed characters the calculator accepts (numbers as well as operations)."""
-        print("These are all of the available characters the calculator accepts:", self._allowed_chars)
+        print("These are all of the available characters the calculator accepts:", sorted(self._allowed_chars))
+        print("Variables are named with letters, digits and underscores, and cannot start with a digit")
 
     def _remove_adjacent_minuses(self, expression: str) -> str:
         """
@@ -236,109 +743,105 @@ class Calculator:
         A sequence of an even amount of minuses bigger than 2 will be replaced with 2 minuses (--)
         A sequence of an even amount of minuses that comes after an operator that is not of type right will be
         completely removed (since there is no need for them, they cancel each other out)
+        Every sequence is found by a regular expression and replaced on its own, in a single pass in linear time.
         :param expression: the mathematical expression
         :return: the new modified expression string
         """
-        i = 0
-        while i < len(expression) - 1:
-            if expression[i] == expression[i + 1] == '-':
-                j = i + 1
-                while j < len(expression) and expression[j] == '-':
-                    j += 1
-                # Number of minus is uneven
-                if (j - i) % 2 == 1:
-                    return expression[:i] + '-' + self._remove_adjacent_minuses(expression[j:])
-                # There is an operator before all the minuses, therefore it's a sign minus (unless it's of type right)
-                elif ((i == 0 and j != len(expression)) or (i > 0 and self.is_operator(expression[i - 1])
-                                                            and self._get_operator(
-                            expression[i - 1]).get_type() != OperatorType.RIGHT)):
-                    return expression[:i] + self._remove_adjacent_minuses(expression[j:])
-                # The first minus is an operator and there's an even amount of minuses, keeping only 2
-                elif j > i + 2:
-                    return expression[:i] + '--' + self._remove_adjacent_minuses(expression[j:])
-
-            i += 1
-        return expression
+        return _MINUS_SEQUENCE.sub(lambda match: self._kept_minuses(expression, *match.span()), expression)
 
     def _validate_structure(self, expression: str):
         """
-        Checks whether a mathematical expression has a valid structure.
+        Checks whether a mathematical expression has a valid structure. The structure around operators with symbols
+        longer than a character and functions is checked by the parser instead.
         :param expression: the mathematical expression
         :raises: CalculatorInputError if the structure of the expression is invalid.
         """
-        ch = 0
-        while ch < len(expression):
-
-            if expression[ch] == '.':
-                """The . symbol must have digits on both of its sides"""
-                if ch == 0 or not expression[ch - 1].isnumeric():
-                    raise CalculatorInputError(
-                        "Invalid expression structure: a decimal point must be part of a number!")
-                if ch == len(expression) - 1 or not expression[ch + 1].isnumeric():
-                    raise CalculatorInputError(
-                        "Invalid expression structure: a decimal point must be part of a number!")
-
-            elif self.is_operator(expression[ch]):
-                op = self._get_operator(expression[ch])
-                if op.get_type() != OperatorType.LEFT:
-                    """The function will raise an exception if:
-                        1. The current operator is at the start of the expression, other than minus followed by a number
-                            reason: since there is not an operand to the left of the operator
-                                exception:
-                                    - if the operator is a minus followed by a number/nothing (for expressions like -5)
-                            example: +4
-                        2. The operator has another operator to its right that is not a right operator 
-                            and that the current operator is not a minus.
-                            reason: two operators cannot come right after another
-                                exception:
-                                    - if the current operator is a minus (to account for expressions like 5+-6)
-                                    - if the other operator is of type left (to account for expressions like 5!+1)
-                            example: 5++1
-                    """
-                    if ((ch == 0 and (op.get_symbol() != '-' or len(expression) == 1 or not expression[1].isnumeric()))
-                            or (ch != 0 and self.is_operator(expression[ch - 1])
-                                and op.get_symbol() != '-'
-                                and self._get_operator(expression[ch - 1]).get_type() != OperatorType.RIGHT)):
-                        raise CalculatorInputError("Invalid expression structure: operator " + op.get_symbol() +
-                                                   " is missing an operand to its left")
-                if op.get_type() != OperatorType.RIGHT:
-                    """The function will raise an exception if:
-                        1. The current operator is at the end of the expression.
-                            reason: since there is not an operand to the right of the operator
-                            example: 4+
-                        2. The char after the operator is also an operator that is not a minus or a left operator.
-                            reason: two operators cannot come right after another. 
-                                    exception: 
-                                        - if the 2nd operator is a minus (to account for expressions like 3+-5)
-                                        - if the 2nd operator is of type left (to account for expressions like 3+!6)
-                            example: 6++1
-                        3. The char after the operator is a minus and the char after the minus is not a number
-                            reason: to make sure if the operator is followed by a minus, that minus is representing 
-                                    a sign rather than an actual operator.
-                            example: 3+--5
-                            
-                        4. The operator is of type left and is followed by another operator
-                            reason: since the stacking of ~ is not allowed. 
-                            exceptions: if the the other operator is a minus (and therefore can be a sign minus)
-                            example: ~~6
-                            """
-                    if (ch == len(expression) - 1
-                            or (self.is_operator(expression[ch + 1])
-                                and self._get_operator(expression[ch + 1]).get_symbol() != '-'
-                                and ((self._get_operator(expression[ch + 1]).get_type() != OperatorType.LEFT)
-                                     or (ch == len(expression) - 2 or (self.is_operator(expression[ch + 2])
-                                                                       and expression[ch + 2] != '-'))))):
-                        raise CalculatorInputError("Invalid expression structure: operator " + op.get_symbol() +
-                                                   " is missing an operand to its right")
-                    elif (op.get_type() == OperatorType.LEFT
-                          and self.is_operator(expression[ch + 1])
-                          and (expression[ch + 1] != '-'
-                               or ch == len(expression) - 2
-                               or self.is_operator(expression[ch + 2]))):
-                        raise CalculatorInputError("Invalid expression structure: "
-                                                   + op.get_symbol() + " must be followed by a number")
-
-            ch += 1
+        dispatch = self._dispatch if self._trie is None else {}
+        for ch, char in enumerate(expression):
+            if char == '.' or char in dispatch:
+                message = self._structure_fault(expression, ch)
+                if message is not None:
+                    raise CalculatorInputError(message, offset=ch)
+
+    def _structure_fault(self, expression: str | list, ch: int) -> str | None:
+        """
+        Checks the structure around a single operator or decimal point of a mathematical expression.
+        Only the characters from ch - 1 to ch + 2 are looked at, so the check can be made while the expression is
+        still being read, as soon as the two characters after ch are known.
+        :param expression: the mathematical expression, or the list of its characters that were read so far
+        :param ch: the index of the operator or decimal point
+        :return: the description of the fault, or None if the structure around the character is valid
+        """
+        get_entry = self._dispatch.get
+        get_class = self._char_classes.get
+        length = len(expression)
+        char = expression[ch]
+        if char == '.':
+            """The . symbol must have digits on both of its sides"""
+            if ch == 0 or get_class(expression[ch - 1]) != DIGIT_CHAR:
+                return "Invalid expression structure: a decimal point must be part of a number!"
+            if ch == length - 1 or get_class(expression[ch + 1]) != DIGIT_CHAR:
+                return "Invalid expression structure: a decimal point must be part of a number!"
+            return None
+
+        entry = get_entry(char)
+        if entry is not None:
+            if entry.type != OperatorType.LEFT:
+                """The function will raise an exception if:
+                    1. The current operator is at the start of the expression, other than minus followed by a number
+                        reason: since there is not an operand to the left of the operator
+                            exception:
+                                - if the operator is a minus followed by a number/variable (for expressions like -5)
+                        example: +4
+                    2. The operator has another operator to its right that is not a right operator 
+                        and that the current operator is not a minus.
+                        reason: two operators cannot come right after another
+                            exception:
+                                - if the current operator is a minus (to account for expressions like 5+-6)
+                                - if the other operator is of type left (to account for expressions like 5!+1)
+                        example: 5++1
+                """
+                previous = get_entry(expression[ch - 1]) if ch != 0 else None
+                if ((ch == 0 and (char != '-' or length == 1
+                                  or get_class(expression[1]) not in (DIGIT_CHAR, NAME_CHAR)))
+                        or (previous is not None and char != '-' and previous.type != OperatorType.RIGHT)):
+                    return "Invalid expression structure: operator " + char + " is missing an operand to its left"
+            if entry.type != OperatorType.RIGHT:
+                """The function will raise an exception if:
+                    1. The current operator is at the end of the expression.
+                        reason: since there is not an operand to the right of the operator
+                        example: 4+
+                    2. The char after the operator is also an operator that is not a minus or a left operator.
+                        reason: two operators cannot come right after another. 
+                                exception: 
+                                    - if the 2nd operator is a minus (to account for expressions like 3+-5)
+                                    - if the 2nd operator is of type left (to account for expressions like 3+!6)
+                        example: 6++1
+                    3. The char after the operator is a minus and the char after the minus is not a number
+                        reason: to make sure if the operator is followed by a minus, that minus is representing 
+                                a sign rather than an actual operator.
+                        example: 3+--5
+                        
+                    4. The operator is of type left and is followed by another operator
+                        reason: since the stacking of ~ is not allowed. 
+                        exceptions: if the the other operator is a minus (and therefore can be a sign minus)
+                        example: ~~6
+                        """
+                following = get_entry(expression[ch + 1]) if ch != length - 1 else None
+                if (ch == length - 1
+                        or (following is not None
+                            and expression[ch + 1] != '-'
+                            and (following.type != OperatorType.LEFT
+                                 or (ch == length - 2 or (expression[ch + 2] in self._dispatch
+                                                          and expression[ch + 2] != '-'))))):
+                    return "Invalid expression structure: operator " + char + " is missing an operand to its right"
+                elif (entry.type == OperatorType.LEFT
+                      and following is not None
+                      and (expression[ch + 1] != '-'
+                           or ch == length - 2
+                           or expression[ch + 2] in self._dispatch)):
+                    return "Invalid expression structure: " + char + " must be followed by a number"
+        return None
 
     def _get_operator(self, symbol: str) -> Operator | None:
         """
@@ -347,9 +850,8 @@ class Calculator:
         :return: an instance of an operator which is represented by that matching symbol, or None if no matching
                 operator exists in the calculator
         """
-        if not self.is_operator(symbol):
-            return None
-        return self._operators[symbol]
+        entry = self._dispatch.get(symbol)
+        return None if entry is None else entry.op
 
     def evaluate_expression_from_input(self):
         """
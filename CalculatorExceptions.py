@@ -6,10 +6,12 @@ class OperatorError(Exception):
 
 
 class CalculatorInputError(Exception):
-    def __init__(self, reason: str, value: int = None):
+    def __init__(self, reason: str, value: int = None, offset: int = None):
         if value is not None:
             reason += ": " + str(value)
         super().__init__(reason)
+        # The offset in the expression of the character that caused the error, if it is known
+        self.offset = offset
 
 
 class CalculationError(Exception):
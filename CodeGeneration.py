@@ -0,0 +1,196 @@
+import decimal
+
+from CalculatorExceptions import CalculationError, CalculatorInputError
+from Program import check_operands
+from Tree import Tree
+from Variable import Variable
+from operators.Operator import Operator, Plus, Minus, Multiply, Divide, Power, Modulo, Average, Minimum, Maximum, \
+    MinimumFunction, MaximumFunction, Negative
+from operators.OperatorType import OperatorType
+
+# How a compiled expression is evaluated
+PROGRAM = "program"  # By the loop of a Program, which calls the operators
+CODEGEN = "codegen"  # By a Python function generated from the expression, with the built-in operators inlined
+MODES = (PROGRAM, CODEGEN)
+
+
+class GeneratedProgram:
+    """
+    A Python function generated from an expression tree, which is evaluated exactly like a Program (it has the same
+    run method), but runs the arithmetic of the built-in operators directly instead of calling them
+    """
+    __slots__ = ('run', '_source')
+
+    def __init__(self, function, source: str):
+        """
+        :param function: the generated function, which takes the values of the variables
+        :param source: the source code of the function
+        """
+        self.run = function
+        self._source = source
+
+    def get_source(self) -> str:
+        """
+        Gets the source code of the generated function
+        :return: the source code
+        """
+        return self._source
+
+
+def _inner(op: Operator, target: str, left: str, right: str) -> list:
+    """
+    Generates the statements that apply a built-in inner operator, with the same checks its _calc does
+    :return: the lines of the statements, or None if the operator is not inlined
+    """
+    op_class = type(op)
+    if op_class is Plus:
+        return [f"{target} = {left} + {right}"]
+    if op_class is Minus:
+        return [f"{target} = {left} - {right}"]
+    if op_class is Multiply:
+        return [f"{target} = {left} * {right}"]
+    if op_class is Divide:
+        # Integers that divide exactly give an integer
+        return [f"if {right} == 0:",
+                f"    raise CalculationError('Cannot divide by 0')",
+                f"if type({left}) is int and type({right}) is int:",
+                f"    {target}, remainder = divmod({left}, {right})",
+                f"    if remainder:",
+                f"        {target} = {left} / {right}",
+                f"else:",
+                f"    {target} = {left} / {right}"]
+    if op_class is Modulo:
+        return [f"if {right} == 0:",
+                f"    raise CalculationError('Cannot calculate the remainder of division by 0')",
+                f"{target} = {left} % {right}"]
+    if op_class is Average:
+        return [f"{target} = {left} + {right}",
+                f"{target} = {target} // 2 if type({target}) is int and {target} % 2 == 0 else {target} / 2"]
+    if op_class is Minimum:
+        return [f"{target} = {left} if {left} < {right} else {right}"]
+    if op_class is Maximum:
+        return [f"{target} = {left} if {left} > {right} else {right}"]
+    return None
+
+
+def _power(target: str, base: str, exponent: str, exact_power: str) -> list:
+    """
+    Generates the statements of Power, which only calls the operator for exact powers (of integers and fractions),
+    since those need to be limited in size
+    """
+    return [f"if {base} < 0 and -1 < {exponent} < 1:",
+            f"    raise CalculationError('Cannot calculate the root of a negative number')",
+            f"if {base} == 0 and {exponent} < 0:",
+            f"    raise CalculationError('Cannot calculate 0 to the power of a none-positive number')",
+            f"if type({base}) is float or type({exponent}) is float:",
+            f"    {target} = {base} ** {exponent}",
+            f"else:",
+            f"    {target} = {exact_power}({base}, {exponent})"]
+
+
+def _chain(op: Operator, target: str, operands: list) -> list:
+    """
+    Generates the statement that applies a built-in associative operator (or function) on a chain of operands, or None
+    if the operator is not inlined. A chain of Plus is not, since its sum is rounded only once.
+    """
+    op_class = type(op)
+    if op_class is Multiply:
+        return [f"{target} = " + " * ".join(operands)]
+    if op_class is Minimum or op_class is MinimumFunction:
+        # A function may be called with a single argument, which the built-in min does not take
+        return [f"{target} = min(" + ", ".join(operands) + ")" if len(operands) > 1 else f"{target} = {operands[0]}"]
+    if op_class is Maximum or op_class is MaximumFunction:
+        return [f"{target} = max(" + ", ".join(operands) + ")" if len(operands) > 1 else f"{target} = {operands[0]}"]
+    return None
+
+
+def generate_program(tree: Tree) -> GeneratedProgram:
+    """
+    Generates a Python function that evaluates an expression tree, and compiles it.
+    Every node becomes a single assignment to a local variable, in postorder, so the function has no nesting however
+    deep the tree is. The built-in operators (except for the factorial and the digit sum) are inlined as Python
+    operators, min and max, with the same checks and errors as their _calc methods. Other operators, and the numbers of
+    the expression, are bound to the function as closure variables.
+    :param tree: the expression tree
+    :return: the generated program
+    :raises OperatorError: if an operator in the tree is missing one of the operands it requires, or has an operand it
+        does not use
+    """
+    lines = []
+    bound = {}  # The names of the closure variables, mapped to their values
+    callables = {}  # The names of the bound methods of the operators, by the ids of the methods
+    names = {}  # The local variables of the nodes, by their ids
+    variable_names = {}  # The local variables of the variables of the expression, by their names
+    temporaries = 0
+
+    def bind(value, prefix: str) -> str:
+        name = prefix + str(len(bound))
+        bound[name] = value
+        return name
+
+    def bind_method(method) -> str:
+        # Bound methods are created on every access, so they are recognized by their function and instance
+        key = (method.__func__, id(method.__self__))
+        if key not in callables:
+            callables[key] = bind(method, "f")
+        return callables[key]
+
+    for node in tree.iter_postorder(shared=True):
+        if id(node) in names:
+            # A subtree shared by many parents (see SubtreeTable) is only calculated once
+            continue
+        value = node.get_value()
+        if isinstance(value, Variable):
+            name = value.get_name()
+            if name not in variable_names:
+                variable_names[name] = "v" + str(len(variable_names))
+                lines.append(f"if variables is None or {name!r} not in variables:")
+                lines.append(f"    raise CalculatorInputError('Missing a value for the variable', {name!r})")
+                lines.append(f"{variable_names[name]} = variables[{name!r}]")
+            names[id(node)] = variable_names[name]
+            continue
+        if not isinstance(value, Operator):
+            names[id(node)] = bind(value, "c")
+            continue
+
+        check_operands(node)
+        target = "t" + str(temporaries)
+        temporaries += 1
+        names[id(node)] = target
+        if node.get_operands() is not None:
+            operands = [names[id(operand)] for operand in node.get_operands()]
+            statements = _chain(value, target, operands)
+            if statements is None:
+                statements = [f"{target} = {bind_method(value._calc_many)}([" + ", ".join(operands) + "])"]
+        elif value.get_type() == OperatorType.INNER:
+            left, right = names[id(node.get_left())], names[id(node.get_right())]
+            if type(value) is Power:
+                statements = _power(target, left, right, bind_method(value._calc))
+            else:
+                statements = _inner(value, target, left, right)
+            if statements is None:
+                statements = [f"{target} = {bind_method(value._calc)}({left}, {right})"]
+        elif value.get_type() == OperatorType.LEFT:
+            right = names[id(node.get_right())]
+            if type(value) is Negative:
+                statements = [f"{target} = -{right}"]
+            else:
+                statements = [f"{target} = {bind_method(value._calc)}(None, {right})"]
+        else:
+            statements = [f"{target} = {bind_method(value._calc)}({names[id(node.get_left())]}, None)"]
+        lines.extend(statements)
+    lines.append(f"return {names[id(tree)]}")
+
+    source = ("def make(" + ", ".join(bound) + "):\n"
+              "    def evaluate(variables=None):\n"
+              "        try:\n" +
+              "".join("            " + line + "\n" for line in lines) +
+              "        except (OverflowError, decimal.Overflow):\n"
+              "            raise CalculationError('The result is too large to calculate')\n"
+              "        except decimal.InvalidOperation:\n"
+              "            raise CalculationError('The result is not a number')\n"
+              "    return evaluate\n")
+    namespace = {"CalculationError": CalculationError, "CalculatorInputError": CalculatorInputError,
+                 "decimal": decimal}
+    exec(compile(source, "<generated expression>", "exec"), namespace)
+    return GeneratedProgram(namespace["make"](*bound.values()), source)
@@ -0,0 +1,148 @@
+from BinaryFormat import dumps_expression, loads_expression
+from CalculatorExceptions import CalculatorInputError, OperatorError
+from CodeGeneration import PROGRAM, CODEGEN, MODES, GeneratedProgram, generate_program
+from IncrementalEvaluation import IncrementalExpression
+from Program import compile_tree
+from Tree import Tree
+from Variable import Variable
+from VectorizedEvaluation import evaluate_tree_vectorized, NAN
+
+
+class CompiledExpression:
+    """
+    A mathematical expression that has already been normalized and validated by a calculator, and can be evaluated
+    any number of times without repeating that work.
+    Instances are created by Calculator.compile and should not be created directly.
+    """
+    __slots__ = ('_calculator', '_expression', '_tree', '_program')
+
+    def __init__(self, calculator, expression: str, tree: Tree | None, mode: str = PROGRAM):
+        """
+        :param calculator: the calculator that compiled the expression
+        :param expression: the normalized and validated expression
+        :param tree: the expression tree of the expression, or None if it still has brackets that need to be evaluated
+            first
+        :param mode: how the expression is evaluated, "program" or "codegen"
+        """
+        self._calculator = calculator
+        self._expression = expression
+        self._tree = tree
+        self._program = None
+        if tree is not None:
+            # Both check the operands of every operator
+            if mode == CODEGEN:
+                self._program = generate_program(tree)
+            else:
+                self._program = compile_tree(tree, shared=calculator._subtrees is not None)
+            if calculator._instrumentation is not None:
+                self._program = calculator._instrumentation.instrument_program(self._program)
+
+    @classmethod
+    def loads(cls, calculator, data: bytes | bytearray | memoryview, mode: str = PROGRAM) -> 'CompiledExpression':
+        """
+        Loads a compiled expression that dumps encoded, without parsing it again. Its operators are the operators of
+        the given calculator that have the same symbols, so it should have the same operators as the calculator that
+        compiled the expression.
+        :param calculator: the calculator that evaluates the expression
+        :param data: the encoded expression. It is read through a memoryview, so it is not copied.
+        :param mode: how the expression is evaluated, "program" or "codegen" (see Calculator.compile)
+        :return: the compiled expression
+        :raises CalculatorInputError: if the data is not a valid compiled expression of this version of the format,
+            it has operators the calculator does not have, or the mode is unknown
+        """
+        if mode not in MODES:
+            raise CalculatorInputError("Unknown compilation mode", mode)
+        try:
+            expression, tree = loads_expression(data, calculator._numeric_operators)
+        except ValueError as e:
+            raise CalculatorInputError("Invalid compiled expression", str(e)) from e
+        if tree is None and mode == CODEGEN:
+            raise CalculatorInputError("The legacy parser cannot generate code for expressions with brackets")
+        if tree is not None and calculator._subtrees is not None:
+            tree = calculator._subtrees.intern(tree)
+        try:
+            return cls(calculator, expression, tree, mode)
+        except OperatorError as e:
+            raise CalculatorInputError("Invalid compiled expression", str(e)) from e
+
+    def dumps(self) -> bytes:
+        """
+        Encodes the compiled expression in a compact binary format, which is much smaller than a pickle of its
+        expression tree (see BinaryFormat). Operators are referenced by their symbols and numbers are packed as
+        doubles or varints. Load it with CompiledExpression.loads.
+        :return: the encoded expression
+        :raises TypeError: if the expression has numbers of other types than float, int, Fraction, Decimal
+            and complex
+        """
+        return dumps_expression(self._expression, self._tree)
+
+    def get_expression(self) -> str:
+        """
+        Gets the normalized expression (without whitespaces and unnecessary minuses)
+        :return: the normalized expression
+        """
+        return self._expression
+
+    def get_source(self) -> str | None:
+        """
+        Gets the source code of the Python function that evaluates the expression
+        :return: the source code, or None if the expression was not compiled in the "codegen" mode
+        """
+        if isinstance(self._program, GeneratedProgram):
+            return self._program.get_source()
+        return None
+
+    def get_variables(self) -> list:
+        """
+        Gets the names of the variables in the expression
+        :return: the names of the variables, in the order they first appear in the expression
+        """
+        if self._tree is None:
+            return []
+        names = {}
+        for node in self._tree.iter_postorder():
+            if node.is_leaf() and isinstance(node.get_value(), Variable):
+                names[node.get_value().get_name()] = None
+        return list(names)
+
+    def evaluate(self, **variables) -> float:
+        """
+        Evaluates the expression
+        :param variables: the values of the variables in the expression, by their names
+        :return: the result of the expression
+        :raises CalculatorInputError: if the value of one of the variables is missing
+        :raises CalculationError: if the expression cannot be calculated based on the limitations of its operators
+        """
+        if self._program is None:
+            return self._calculator._calc(self._expression)
+        return self._program.run(variables)
+
+    def incremental(self, **variables) -> IncrementalExpression:
+        """
+        Evaluates the expression, and keeps the value of every one of its subtrees, so it can be evaluated again after
+        some of its variables change by calculating only the operators that depend on them (see
+        IncrementalExpression.update). Every call creates a new incremental expression, which is not shared with
+        anyone else that compiled the same expression.
+        :param variables: the initial values of all the variables in the expression, by their names
+        :return: the incremental expression
+        :raises CalculatorInputError: if the value of one of the variables is missing
+        :raises CalculationError: if the expression cannot be calculated based on the limitations of its operators
+        """
+        if self._tree is None:
+            raise CalculatorInputError("The legacy parser cannot evaluate expressions with brackets incrementally")
+        return IncrementalExpression(self._tree, variables)
+
+    def evaluate_vectorized(self, errors: str = NAN, /, **arrays):
+        """
+        Evaluates the expression once over NumPy arrays of values for its variables. Requires NumPy.
+        :param errors: what to do with elements that could not be calculated: "nan" sets their result to NaN, "mask"
+            returns a masked array in which they are masked and "raise" raises a CalculationError
+        :param arrays: arrays of values of the variables in the expression, by their names. They are broadcast
+            against each other.
+        :return: an array of the results of the expression for every element
+        :raises CalculatorInputError: if the array of one of the variables is missing
+        :raises CalculationError: if errors is "raise" and some of the elements could not be calculated
+        """
+        if self._tree is None:
+            raise CalculatorInputError("The legacy parser cannot evaluate expressions with brackets vectorized")
+        return evaluate_tree_vectorized(self._tree, arrays, errors)
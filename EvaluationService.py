@@ -0,0 +1,233 @@
+import asyncio
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from BatchEvaluation import evaluate_or_error, _evaluate_in_worker, _start_worker
+from CalculatorExceptions import CalculatorInputError
+from StreamEvaluator import result_record
+
+# The longest request line the service reads, in bytes
+MAX_REQUEST_SIZE = 1 << 20
+
+
+class EvaluationService:
+    """
+    An asyncio TCP service that evaluates mathematical expressions with the operators of a single calculator.
+    The protocol is JSON Lines: every request is a line with an object like {"id": 1, "expression": "2+3"}, and every
+    response is a line with the object the streaming evaluator writes for its result, and the id of the request if it
+    had one. A client may send many requests on one connection without waiting for their responses (pipelining), and
+    the responses are sent in the order of the requests.
+    Expressions are evaluated in a bounded pool of worker processes (or threads), so the event loop never blocks.
+    Backpressure comes from two limits: at most max_in_flight expressions are evaluated at once over all connections,
+    and a connection stops being read once max_pipeline of its responses are waiting to be sent.
+    """
+
+    def __init__(self, calculator, workers: int = None, use_threads: bool = False, max_in_flight: int = 64,
+                 max_pipeline: int = 256, timeout: float = 10.0):
+        """
+        :param calculator: the calculator whose settings and operators are used. The worker processes get a pickled
+            copy of it, so custom operators must be importable by them.
+        :param workers: the number of worker processes or threads. Defaults to the number of CPUs.
+        :param use_threads: whether to evaluate in a pool of threads instead of processes. Threads start faster and
+            share the calculator's compile cache, but evaluate one expression at a time because of the GIL.
+        :param max_in_flight: the maximum number of expressions evaluated at once, over all connections
+        :param max_pipeline: the maximum number of responses a connection may have waiting to be sent before the
+            service stops reading its requests
+        :param timeout: the number of seconds after which an expression gets an error response. A worker cannot be
+            interrupted, so it only becomes free once the expression is done, and until then the expression still
+            counts towards max_in_flight.
+        :raises CalculatorInputError: if one of the limits is not positive
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        for name, value in (("Number of workers", workers), ("Maximum in flight", max_in_flight),
+                            ("Maximum pipeline", max_pipeline), ("Timeout", timeout)):
+            if value <= 0:
+                raise CalculatorInputError(name + " must be positive", value)
+        self._calculator = calculator
+        self._workers = workers
+        self._use_threads = use_threads
+        self._max_in_flight = max_in_flight
+        self._max_pipeline = max_pipeline
+        self._timeout = timeout
+        self._executor = None
+        self._in_flight = None
+        self._server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> tuple:
+        """
+        Starts the worker pool and starts listening for connections
+        :param host: the address to listen on
+        :param port: the port to listen on, or 0 for any free port
+        :return: the (host, port) tuple the service listens on
+        """
+        if self._use_threads:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers)
+        else:
+            self._executor = ProcessPoolExecutor(max_workers=self._workers, initializer=_start_worker,
+                                                 initargs=(pickle.dumps(self._calculator),))
+        self._in_flight = asyncio.Semaphore(self._max_in_flight)
+        self._server = await asyncio.start_server(self._handle_connection, host, port, limit=MAX_REQUEST_SIZE)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        """
+        Serves connections until the task is cancelled
+        """
+        await self._server.serve_forever()
+
+    async def close(self):
+        """
+        Stops listening for connections and shuts the worker pool down
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        pipeline = asyncio.Semaphore(self._max_pipeline)
+        responses = asyncio.Queue()
+        sender = asyncio.create_task(self._send_responses(responses, writer, pipeline))
+        try:
+            while True:
+                # Once too many responses are waiting, the requests stay in the socket until the client reads them
+                await pipeline.acquire()
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    responses.put_nowait(asyncio.create_task(self._error_response(
+                        CalculatorInputError("Request is too long"))))
+                    break
+                except ConnectionError:
+                    break
+                if not line:
+                    break
+                responses.put_nowait(asyncio.create_task(self._respond(line)))
+        finally:
+            responses.put_nowait(None)
+            await sender
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _send_responses(self, responses: asyncio.Queue, writer: asyncio.StreamWriter,
+                              pipeline: asyncio.Semaphore):
+        """
+        Writes the responses of a connection in the order of its requests
+        :param responses: a queue of the tasks that build the responses, ending with None
+        :param writer: the writer of the connection
+        :param pipeline: the semaphore of the responses the connection has waiting
+        """
+        connected = True
+        while True:
+            response = await responses.get()
+            if response is None:
+                return
+            response = await response
+            if connected:
+                try:
+                    writer.write(response)
+                    await writer.drain()
+                except ConnectionError:
+                    # The rest of the responses are still awaited, so the reader is never stuck on the pipeline
+                    connected = False
+            pipeline.release()
+
+    async def _respond(self, line: bytes) -> bytes:
+        """
+        Evaluates the expression of a request
+        :param line: the line of the request
+        :return: the line of the response
+        """
+        try:
+            request = json.loads(line)
+            expression = request["expression"]
+            if not isinstance(expression, str):
+                raise TypeError
+        except (ValueError, TypeError, KeyError):
+            return await self._error_response(CalculatorInputError("Invalid request, expected an object with an "
+                                                                   "expression"))
+
+        result = await self._evaluate(expression)
+        record = result_record(expression, result)
+        if "id" in request:
+            record = {"id": request["id"], **record}
+        try:
+            return json.dumps(record).encode() + b"\n"
+        except ValueError as e:
+            # A result with more digits than Python converts to text
+            return await self._error_response(e, request.get("id"))
+
+    async def _error_response(self, error: Exception, request_id=None) -> bytes:
+        record = {"error": str(error), "type": type(error).__name__}
+        if request_id is not None:
+            record = {"id": request_id, **record}
+        return json.dumps(record).encode() + b"\n"
+
+    async def _evaluate(self, expression: str):
+        """
+        Evaluates an expression in the worker pool
+        :param expression: the mathematical expression
+        :return: its result, or the error it raised
+        """
+        await self._in_flight.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            if self._use_threads:
+                future = loop.run_in_executor(self._executor, evaluate_or_error, self._calculator, expression)
+            else:
+                future = loop.run_in_executor(self._executor, _evaluate_in_worker, expression)
+        except BaseException:
+            self._in_flight.release()
+            raise
+        # The slot is only released once the worker is done with the expression, even after it timed out, so
+        # max_in_flight bounds the work that is really running
+        future.add_done_callback(self._finished)
+        try:
+            # Shielded, since cancelling the future on a timeout would not stop the worker, only release it too early
+            return await asyncio.wait_for(asyncio.shield(future), self._timeout)
+        except asyncio.TimeoutError:
+            return TimeoutError("Evaluation took longer than " + str(self._timeout) + " seconds")
+        except Exception as e:
+            # Errors of operators that do not raise the calculator's errors, or a worker process that died
+            return e
+
+    def _finished(self, future: asyncio.Future):
+        """
+        Releases the slot of an expression once its worker is done with it
+        :param future: the future of the expression
+        """
+        self._in_flight.release()
+        if not future.cancelled():
+            # Retrieved, so the error of an expression that timed out is not reported as never retrieved
+            future.exception()
+
+
+async def serve(calculator, host: str = "127.0.0.1", port: int = 0, on_start=None, **options):
+    """
+    Runs an evaluation service until the task is cancelled
+    :param calculator: the calculator whose settings and operators are used
+    :param host: the address to listen on
+    :param port: the port to listen on, or 0 for any free port
+    :param on_start: a function that is called with the (host, port) tuple the service listens on once it started
+    :param options: the options of the EvaluationService
+    """
+    async with EvaluationService(calculator, **options) as service:
+        address = await service.start(host, port)
+        if on_start is not None:
+            on_start(address)
+        await service.serve_forever()
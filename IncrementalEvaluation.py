@@ -0,0 +1,166 @@
+import decimal
+
+from CalculatorExceptions import CalculatorInputError, CalculationError
+from Program import CONST, BINARY, PREFIX, POSTFIX, VARIABLE, CHAIN
+from Tree import Tree
+from Variable import Variable
+from operators.Operator import Operator
+from operators.OperatorType import OperatorType
+
+_OPCODES = {OperatorType.INNER: BINARY, OperatorType.LEFT: PREFIX, OperatorType.RIGHT: POSTFIX}
+
+# Chains of associative operators with more operands than this are split into a balanced tree of chains of at most
+# CHAIN_FANOUT operands, so an update recalculates a few short chains instead of all the operands
+WIDE_CHAIN_SIZE = 64
+CHAIN_FANOUT = 16
+
+
+class IncrementalExpression:
+    """
+    An expression that keeps the last value of every one of its subtrees, so when some of its variables change only the
+    operators on the paths from them to the root are calculated again.
+    The nodes of the tree are numbered in postorder, so the operands of a node always come before it, and recalculating
+    the changed nodes in increasing order calculates every one of them once, after its operands.
+    A flattened chain of an associative operator is recalculated from the cached values of all of its operands, so it
+    gives exactly the same result as evaluating the whole expression. A chain of more than WIDE_CHAIN_SIZE operands is
+    split into a balanced tree of chains of at most CHAIN_FANOUT operands, which its associativity allows, so an update
+    only recalculates the short chains on the path from the changed operand. A long sum or product of floats is then
+    rounded a little differently than by evaluating the whole expression. Function calls that are not associative are
+    always recalculated from all of their arguments. A subtree that is shared by many parents (see SubtreeTable) is
+    kept once, and recalculated once when it changes.
+    Instances are created by CompiledExpression.incremental, and belong to whoever created them.
+    """
+    __slots__ = ('_nodes', '_parents', '_values', '_leaves', '_variables', '_dirty')
+
+    def __init__(self, tree: Tree, variables: dict):
+        """
+        :param tree: the compiled expression tree
+        :param variables: the initial values of all the variables in the expression, mapped by their names
+        :raises CalculatorInputError: if the value of one of the variables is missing
+        :raises CalculationError: if the expression cannot be calculated based on the limitations of its operators
+        """
+        # Every node is an (opcode, argument, operand indexes) tuple, with the same opcodes and arguments as a Program
+        self._nodes = []
+        self._parents = []
+        self._leaves = {}
+        index_of = {}
+        for node in tree.iter_postorder(shared=True):
+            if id(node) in index_of:
+                continue
+            value = node.get_value()
+            if isinstance(value, Variable):
+                index_of[id(node)] = self._add_node(VARIABLE, value.get_name(), ())
+                self._leaves.setdefault(value.get_name(), []).append(index_of[id(node)])
+            elif not isinstance(value, Operator):
+                index_of[id(node)] = self._add_node(CONST, value, ())
+            elif node.get_operands() is not None:
+                operands = tuple(index_of[id(operand)] for operand in node.get_operands())
+                if len(operands) > WIDE_CHAIN_SIZE and value.is_associative():
+                    while len(operands) > CHAIN_FANOUT:
+                        operands = tuple(self._add_node(CHAIN, value._calc_many, operands[i:i + CHAIN_FANOUT])
+                                         for i in range(0, len(operands), CHAIN_FANOUT))
+                index_of[id(node)] = self._add_node(CHAIN, value._calc_many, operands)
+            else:
+                operands = tuple(index_of[id(operand)] for operand in (node.get_left(), node.get_right())
+                                 if operand is not None)
+                index_of[id(node)] = self._add_node(_OPCODES[value.get_type()], value._calc, operands)
+
+        missing = [name for name in self._leaves if name not in variables]
+        if missing:
+            raise CalculatorInputError("Missing a value for the variable", missing[0])
+        self._variables = {name: variables[name] for name in self._leaves}
+        self._values = [None] * len(self._nodes)
+        # Every node is calculated the first time
+        self._dirty = set(range(len(self._nodes)))
+        self._recalculate()
+
+    def _add_node(self, code: int, arg, operands: tuple) -> int:
+        """
+        Adds a node after its operands
+        :param code: the opcode of the node
+        :param arg: the argument of the opcode
+        :param operands: the indexes of the operands of the node
+        :return: the index of the node
+        """
+        index = len(self._nodes)
+        self._nodes.append((code, arg, operands))
+        self._parents.append([])
+        for operand in operands:
+            if index not in self._parents[operand]:
+                self._parents[operand].append(index)
+        return index
+
+    def get_result(self) -> float:
+        """
+        Gets the result of the expression with the current values of its variables
+        :return: the result of the expression
+        """
+        return self._values[-1]
+
+    def get_variables(self) -> dict:
+        """
+        Gets the current values of the variables of the expression
+        :return: a dict of the values of the variables, mapped by their names
+        """
+        return dict(self._variables)
+
+    def update(self, **variables) -> float:
+        """
+        Changes the values of some of the variables, and calculates again only the subtrees that depend on them.
+        If the expression cannot be calculated with the new values, the values are still changed, and the subtrees
+        that were not calculated are calculated by the next update.
+        :param variables: the new values of the variables that changed, by their names
+        :return: the new result of the expression
+        :raises CalculatorInputError: if one of the variables is not in the expression
+        :raises CalculationError: if the expression cannot be calculated based on the limitations of its operators
+        """
+        for name in variables:
+            if name not in self._leaves:
+                raise CalculatorInputError("The expression has no variable", name)
+
+        parents = self._parents
+        dirty = self._dirty
+        for name, value in variables.items():
+            self._variables[name] = value
+            stack = list(self._leaves[name])
+            while stack:
+                index = stack.pop()
+                # Stops at nodes that are already going to be calculated, since so are all of their ancestors
+                if index not in dirty:
+                    dirty.add(index)
+                    stack.extend(parents[index])
+        self._recalculate()
+        return self._values[-1]
+
+    def _recalculate(self):
+        """
+        Calculates the value of every dirty node, after the values of its operands
+        :raises CalculationError: if one of the nodes cannot be calculated based on the limitations of its operator
+        """
+        nodes = self._nodes
+        values = self._values
+        dirty = self._dirty
+        try:
+            for index in sorted(dirty):
+                code, arg, operands = nodes[index]
+                if code == CONST:
+                    values[index] = arg
+                elif code == VARIABLE:
+                    values[index] = self._variables[arg]
+                elif code == BINARY:
+                    values[index] = arg(values[operands[0]], values[operands[1]])
+                elif code == PREFIX:
+                    values[index] = arg(None, values[operands[0]])
+                elif code == POSTFIX:
+                    values[index] = arg(values[operands[0]], None)
+                else:
+                    values[index] = arg([values[operand] for operand in operands])
+                dirty.discard(index)
+        except (OverflowError, decimal.Overflow):
+            # Exact integers (like the results of factorials) can become too large to be used as floats
+            raise CalculationError("The result is too large to calculate")
+        except decimal.InvalidOperation:
+            # Like a negative decimal raised to the power of a fraction
+            raise CalculationError("The result is not a number")
+        # A set never shrinks when items are discarded, and iterating it takes as long as the largest it has been
+        dirty.clear()
@@ -0,0 +1,238 @@
+import bisect
+import threading
+from collections import namedtuple
+from time import perf_counter
+
+from CodeGeneration import GeneratedProgram
+from Program import Program, BINARY, PREFIX, POSTFIX, CHAIN
+
+# The phases of compiling and evaluating an expression that are timed
+PREPARE = "prepare"  # Normalizing and validating the expression (Calculator._prepare)
+PARSE = "parse"  # Building its expression tree, with either parser (Calculator._parse_expression_tree)
+OPTIMIZE = "optimize"  # Flattening and folding the tree, including calculating constant subtrees
+EVALUATE = "evaluate"  # Running the compiled program, or the legacy parser's evaluation of brackets (Calculator._calc)
+PHASES = (PREPARE, PARSE, OPTIMIZE, EVALUATE)
+
+# The methods of a calculator that are timed as phases while it is instrumented
+_PHASE_METHODS = {PREPARE: "_prepare", PARSE: "_parse_expression_tree", OPTIMIZE: "_optimize_tree",
+                  EVALUATE: "_calc"}
+
+# The upper bounds of the buckets of the histogram of expression lengths, in characters
+SIZE_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+
+PhaseStats = namedtuple("PhaseStats", ["calls", "seconds"])
+OperatorStats = namedtuple("OperatorStats", ["calls", "seconds"])
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _InstrumentedProgram(Program):
+    """
+    A program whose runs are timed as the evaluate phase, and whose operators are timed one by one
+    """
+    __slots__ = ('_instrumentation',)
+
+    def __init__(self, instructions: list, slot_count: int, instrumentation):
+        super().__init__(instructions, slot_count)
+        self._instrumentation = instrumentation
+
+    def run(self, variables: dict = None) -> float:
+        start = perf_counter()
+        try:
+            return super().run(variables)
+        finally:
+            self._instrumentation._record_phase(EVALUATE, perf_counter() - start)
+
+
+class Instrumentation:
+    """
+    Collects statistics about the work of a calculator: the number of calls and the total time of every phase of
+    compiling and evaluating expressions, the number of calls and the total time of every operator, and a histogram of
+    the lengths of the expressions that were compiled.
+    It only collects them while it is set on a calculator (see Calculator.set_instrumentation and
+    Calculator.instrumented). Until then, and once it is removed, the calculator runs exactly the same code as if it
+    never existed.
+    Operators are timed when compiled programs apply them. Constant subtrees calculated by the optimizer are part of
+    the optimize phase, and the legacy parser's evaluation of brackets is only timed as a whole.
+    The statistics may be collected from many threads at once.
+    """
+
+    def __init__(self, size_buckets: tuple = SIZE_BUCKETS, on_phase=None):
+        """
+        :param size_buckets: the upper bounds of the buckets of the histogram of expression lengths, in increasing
+            order
+        :param on_phase: a function that is called with the name of a phase and the number of seconds it took, every
+            time a phase ends
+        """
+        self._size_buckets = tuple(size_buckets)
+        self._on_phase = on_phase
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clears all the statistics"""
+        with self._lock:
+            self._phases = {phase: [0, 0.0] for phase in PHASES}
+            self._operators = {}
+            # The last bucket counts the expressions that are longer than all the bounds
+            self._size_counts = [0] * (len(self._size_buckets) + 1)
+            self._size_sum = 0
+
+    def attach(self, calculator):
+        """
+        Starts timing the phases of a calculator. Called by Calculator.set_instrumentation.
+        :param calculator: the calculator
+        """
+        for phase, method in _PHASE_METHODS.items():
+            setattr(calculator, method, self._timed(phase, getattr(calculator, method), method == "_prepare"))
+
+    def detach(self, calculator):
+        """
+        Stops timing the phases of a calculator. Called by Calculator.set_instrumentation.
+        :param calculator: the calculator
+        """
+        for method in _PHASE_METHODS.values():
+            vars(calculator).pop(method, None)
+
+    def instrument_program(self, program: Program | GeneratedProgram) -> Program | GeneratedProgram:
+        """
+        Creates a copy of a compiled program that is timed, and whose operators are timed. The operators of a generated
+        program are inlined into its function, so only its runs are timed.
+        :param program: the program
+        :return: the instrumented program
+        """
+        if isinstance(program, GeneratedProgram):
+            run = program.run
+
+            def timed_run(variables: dict = None):
+                start = perf_counter()
+                try:
+                    return run(variables)
+                finally:
+                    self._record_phase(EVALUATE, perf_counter() - start)
+            return GeneratedProgram(timed_run, program.get_source())
+
+        instructions = []
+        for code, arg in program.get_instructions():
+            if code in (BINARY, PREFIX, POSTFIX):
+                arg = self._timed_operator(arg.__self__, arg)
+            elif code == CHAIN:
+                arg = (self._timed_operator(arg[0].__self__, arg[0]), arg[1])
+            instructions.append((code, arg))
+        return _InstrumentedProgram(instructions, program.get_slot_count(), self)
+
+    def _timed(self, phase: str, function, measure_size: bool):
+        """
+        Wraps a method of a calculator so its calls are timed as a phase. Only the outermost call is timed, since the
+        legacy parser's methods call themselves.
+        """
+        depth = threading.local()
+
+        def timed(*args):
+            if getattr(depth, "value", 0):
+                return function(*args)
+            if measure_size:
+                self._record_size(len(args[0]))
+            depth.value = 1
+            start = perf_counter()
+            try:
+                return function(*args)
+            finally:
+                depth.value = 0
+                self._record_phase(phase, perf_counter() - start)
+        return timed
+
+    def _timed_operator(self, op, calc):
+        symbol = op.get_symbol()
+        lock = self._lock
+
+        def timed(*args):
+            start = perf_counter()
+            try:
+                return calc(*args)
+            finally:
+                elapsed = perf_counter() - start
+                with lock:
+                    stats = self._operators.setdefault(symbol, [0, 0.0])
+                    stats[0] += 1
+                    stats[1] += elapsed
+        return timed
+
+    def _record_phase(self, phase: str, seconds: float):
+        with self._lock:
+            stats = self._phases[phase]
+            stats[0] += 1
+            stats[1] += seconds
+        if self._on_phase is not None:
+            self._on_phase(phase, seconds)
+
+    def _record_size(self, size: int):
+        with self._lock:
+            self._size_counts[bisect.bisect_left(self._size_buckets, size)] += 1
+            self._size_sum += size
+
+    def get_phase_stats(self) -> dict:
+        """
+        Gets the statistics of the phases
+        :return: a dict of the names of the phases to their PhaseStats(calls, seconds)
+        """
+        with self._lock:
+            return {phase: PhaseStats(*stats) for phase, stats in self._phases.items()}
+
+    def get_operator_stats(self) -> dict:
+        """
+        Gets the statistics of the operators
+        :return: a dict of the symbols of the operators that were applied to their OperatorStats(calls, seconds)
+        """
+        with self._lock:
+            return {symbol: OperatorStats(*stats) for symbol, stats in self._operators.items()}
+
+    def get_size_histogram(self) -> list:
+        """
+        Gets the histogram of the lengths of the expressions that were compiled
+        :return: a list of (upper bound, count) tuples of every bucket, where the count is of the expressions that are
+            not longer than the upper bound but longer than the one before it. The last bucket's bound is None.
+        """
+        with self._lock:
+            return list(zip(self._size_buckets + (None,), self._size_counts))
+
+    def to_prometheus(self, prefix: str = "calculator") -> str:
+        """
+        Exports the statistics in the Prometheus text exposition format
+        :param prefix: the prefix of the names of the metrics
+        :return: the text of the metrics
+        """
+        with self._lock:
+            phases = {phase: tuple(stats) for phase, stats in self._phases.items()}
+            operators = {symbol: tuple(stats) for symbol, stats in sorted(self._operators.items())}
+            size_counts = list(self._size_counts)
+            size_sum = self._size_sum
+
+        lines = []
+
+        def metric(name: str, metric_type: str, description: str, samples: list):
+            lines.append("# HELP " + prefix + "_" + name + " " + description)
+            lines.append("# TYPE " + prefix + "_" + name + " " + metric_type)
+            for suffix, labels, value in samples:
+                lines.append(prefix + "_" + name + suffix + labels + " " + repr(value))
+
+        metric("phase_calls_total", "counter", "Number of times each phase ran",
+               [("", '{phase="' + phase + '"}', stats[0]) for phase, stats in phases.items()])
+        metric("phase_seconds_total", "counter", "Total time spent in each phase",
+               [("", '{phase="' + phase + '"}', stats[1]) for phase, stats in phases.items()])
+        metric("operator_calls_total", "counter", "Number of times each operator was applied",
+               [("", '{operator="' + _escape_label(symbol) + '"}', stats[0]) for symbol, stats in operators.items()])
+        metric("operator_seconds_total", "counter", "Total time spent applying each operator",
+               [("", '{operator="' + _escape_label(symbol) + '"}', stats[1]) for symbol, stats in operators.items()])
+
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self._size_buckets + ("+Inf",), size_counts):
+            cumulative += count
+            samples.append(("_bucket", '{le="' + str(bound) + '"}', cumulative))
+        samples.append(("_sum", "", size_sum))
+        samples.append(("_count", "", cumulative))
+        metric("expression_size_characters", "histogram", "Lengths of the compiled expressions", samples)
+        return "\n".join(lines) + "\n"
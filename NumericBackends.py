@@ -0,0 +1,232 @@
+import decimal
+import math
+from abc import abstractmethod
+from fractions import Fraction
+
+from CalculatorExceptions import CalculatorInputError
+from operators.Operator import Operator
+from operators.OperatorType import OperatorType
+
+# The names of the numeric backends
+FLOAT = "float"  # Every number is a float, like the calculator always calculated
+INTEGER = "int"  # Integers stay exact Python ints while the operators keep them integral, other numbers are floats
+FRACTION = "fraction"  # Every number is an exact Fraction
+DECIMAL = "decimal"  # Every number is a Decimal, calculated with the precision of the current decimal context
+
+
+class NumericBackend:
+    """
+    An abstract class for the kind of numbers a calculator calculates with. A backend converts the number literals of
+    expressions to its numbers, and operators that do not support its numbers (see Operator.get_numeric_types) get
+    them converted to floats instead. A backend may also convert the results of the operators, so numbers of other
+    types (like the integers factorials return) never mix with its own.
+    """
+
+    @abstractmethod
+    def get_name(self) -> str:
+        """
+        Gets the name of the backend
+        :return: the name
+        """
+        pass
+
+    @abstractmethod
+    def get_types(self) -> tuple:
+        """
+        Gets the types of the numbers the backend converts literals to
+        :return: a tuple of types
+        """
+        pass
+
+    @abstractmethod
+    def to_number(self, text: str):
+        """
+        Converts the text of a number literal to a number
+        :param text: the text of the number, which may start with a minus
+        :raises ValueError: if the text is not a valid number
+        :return: the number
+        """
+        pass
+
+    def get_operand_types(self) -> tuple:
+        """
+        Gets the types of the numbers operators may get as operands: the numbers of the backend, and the integers
+        factorials and digit sums return unless the backend converts them
+        :return: a tuple of types
+        """
+        if self.converts_results() or int in self.get_types():
+            return self.get_types()
+        return self.get_types() + (int,)
+
+    def converts_results(self) -> bool:
+        """
+        Checks whether the backend converts the results of operators with convert_result
+        :return: True if it does, False otherwise
+        """
+        return False
+
+    def convert_result(self, value):
+        """
+        Converts the result of an operator to a number of the backend, if the backend converts results
+        :param value: the result of the operator
+        :return: the number
+        """
+        return value
+
+    def adapt(self, op: Operator) -> Operator:
+        """
+        Adapts an operator to the numbers of the backend
+        :param op: the operator
+        :return: the operator itself if it supports all the numbers it may get as operands (see get_operand_types) and
+            the backend does not convert results, or an operator that converts its operands and results otherwise
+        """
+        supported = op.get_numeric_types()
+        if not self.converts_results() and all(number_type in supported for number_type in self.get_operand_types()):
+            return op
+        return _AdaptedOperator(op, self)
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other)
+
+    def __hash__(self) -> int:
+        return hash(type(self))
+
+
+class FloatBackend(NumericBackend):
+    def get_name(self) -> str:
+        return FLOAT
+
+    def get_types(self) -> tuple:
+        return (float,)
+
+    def to_number(self, text: str) -> float:
+        return float(text)
+
+
+class IntegerBackend(NumericBackend):
+    def get_name(self) -> str:
+        return INTEGER
+
+    def get_types(self) -> tuple:
+        return int, float
+
+    def to_number(self, text: str) -> int | float:
+        digits = text[1:] if text.startswith('-') else text
+        if digits.isdecimal() and digits.isascii():
+            try:
+                return int(text)
+            except ValueError:
+                # Longer than Python converts to an int
+                pass
+        return float(text)
+
+
+class FractionBackend(NumericBackend):
+    def get_name(self) -> str:
+        return FRACTION
+
+    def get_types(self) -> tuple:
+        return (Fraction,)
+
+    def to_number(self, text: str) -> Fraction:
+        return Fraction(text)
+
+    def converts_results(self) -> bool:
+        return True
+
+    def convert_result(self, value):
+        # Integers (like the results of factorials) become fractions, so dividing them stays exact. Floats (like roots)
+        # are not exact anyway, so they are kept.
+        return Fraction(value) if type(value) is int else value
+
+
+class DecimalBackend(NumericBackend):
+    def get_name(self) -> str:
+        return DECIMAL
+
+    def get_types(self) -> tuple:
+        return (decimal.Decimal,)
+
+    def to_number(self, text: str) -> decimal.Decimal:
+        try:
+            return decimal.Decimal(text)
+        except decimal.InvalidOperation:
+            raise ValueError("Invalid decimal number: " + text)
+
+    def converts_results(self) -> bool:
+        return True
+
+    def convert_result(self, value) -> decimal.Decimal:
+        if type(value) is int:
+            return decimal.Decimal(value)
+        if isinstance(value, float):
+            # Decimals cannot be mixed with floats, and the shortest text of a float is the number it was meant to be
+            return decimal.Decimal(repr(value)) if math.isfinite(value) else decimal.Decimal(value)
+        return value
+
+
+BACKENDS = {backend.get_name(): backend for backend in (FloatBackend(), IntegerBackend(), FractionBackend(),
+                                                        DecimalBackend())}
+
+
+def get_backend(backend: str | NumericBackend) -> NumericBackend:
+    """
+    Gets a numeric backend
+    :param backend: the name of one of the backends, or a NumericBackend
+    :return: the backend
+    :raises CalculatorInputError: if there is no backend with the name
+    """
+    if isinstance(backend, NumericBackend):
+        return backend
+    if backend not in BACKENDS:
+        raise CalculatorInputError("Unknown numeric backend", backend)
+    return BACKENDS[backend]
+
+
+class _AdaptedOperator(Operator):
+    """
+    Wraps an operator for a backend: the operands it does not support are converted to floats, and its results are
+    converted by the backend
+    """
+
+    def __init__(self, op: Operator, backend: NumericBackend):
+        super().__init__()
+        self._op = op
+        self._backend = backend
+        self._supported = op.get_numeric_types()
+
+    def _convert(self, operand):
+        if operand is None or isinstance(operand, self._supported):
+            return operand
+        return float(operand)
+
+    def _calc(self, left, right):
+        return self._backend.convert_result(self._op._calc(self._convert(left), self._convert(right)))
+
+    def _calc_many(self, operands: list):
+        return self._backend.convert_result(self._op._calc_many([self._convert(operand) for operand in operands]))
+
+    def calc_vectorized(self, left_operand, right_operand) -> tuple:
+        # Vectorized calculations are always on arrays of floats
+        return self._op.calc_vectorized(left_operand, right_operand)
+
+    def get_numeric_types(self) -> tuple:
+        return self._op.get_numeric_types()
+
+    def is_pure(self) -> bool:
+        return self._op.is_pure()
+
+    def is_associative(self) -> bool:
+        return self._op.is_associative()
+
+    def get_arity(self) -> tuple:
+        return self._op.get_arity()
+
+    def get_symbol(self) -> str:
+        return self._op.get_symbol()
+
+    def get_priority(self) -> int:
+        return self._op.get_priority()
+
+    def get_type(self) -> OperatorType:
+        return self._op.get_type()
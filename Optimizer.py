@@ -0,0 +1,126 @@
+from CalculatorExceptions import CalculationError
+from Tree import Tree
+from Variable import Variable
+from operators.Operator import Operator
+from operators.OperatorType import OperatorType
+
+
+def _is_constant(tree: Tree) -> bool:
+    return tree.is_leaf() and not isinstance(tree.get_value(), (Operator, Variable))
+
+
+def _children(tree: Tree) -> list:
+    """
+    Gets the subtrees of the operands of a node, from left to right
+    :param tree: the node
+    :return: the list of subtrees
+    """
+    if tree.get_operands() is not None:
+        return tree.get_operands()
+    return [child for child in (tree.get_left(), tree.get_right()) if child is not None]
+
+
+def _is_chain(tree: Tree) -> bool:
+    """
+    Checks whether a node applies an associative operator between operands, so it can be part of a flattened chain
+    :param tree: the node
+    :return: True if the node can be flattened, False otherwise
+    """
+    op = tree.get_value()
+    return (isinstance(op, Operator) and op.get_type() == OperatorType.INNER and op.is_associative()
+            and (tree.get_operands() is not None or (tree.has_left() and tree.has_right())))
+
+
+def _flatten(tree: Tree) -> Tree:
+    """
+    Creates a copy of an expression tree in which every chain of the same associative operator is a single node
+    :param tree: the expression tree
+    :return: the flattened tree
+    """
+    # Nodes that continue the chain of their parent are not copied, their operands are collected by the chain's top
+    chained = set()
+    for node in tree.iter_postorder():
+        if _is_chain(node):
+            for child in _children(node):
+                if child.get_value() is node.get_value() and _is_chain(child):
+                    chained.add(id(child))
+
+    flattened = {}
+    for node in tree.iter_postorder():
+        if id(node) in chained:
+            continue
+        if node.is_leaf():
+            flattened[id(node)] = node
+            continue
+
+        op = node.get_value()
+        if node.get_operands() is not None and not _is_chain(node):
+            # The arguments of a function
+            flattened[id(node)] = Tree(op, operands=[flattened[id(operand)] for operand in node.get_operands()])
+            continue
+        if not _is_chain(node):
+            flattened[id(node)] = Tree(op, flattened.get(id(node.get_left())), flattened.get(id(node.get_right())))
+            continue
+
+        operands = []
+        stack = list(reversed(_children(node)))
+        while stack:
+            child = stack.pop()
+            if id(child) in chained:
+                stack.extend(reversed(_children(child)))
+            else:
+                operands.append(flattened[id(child)])
+        if len(operands) == 2:
+            flattened[id(node)] = Tree(op, operands[0], operands[1])
+        else:
+            flattened[id(node)] = Tree(op, operands=operands)
+    return flattened[id(tree)]
+
+
+def _fold_constants(tree: Tree) -> Tree:
+    """
+    Creates a copy of an expression tree in which every subtree without variables is replaced with its value.
+    Only operators that declare themselves pure are calculated, since the results of others may change from one
+    evaluation to the next. Subtrees that cannot be calculated are kept as they are.
+    :param tree: the expression tree
+    :return: the folded tree
+    """
+    folded = {}
+    for node in tree.iter_postorder():
+        op = node.get_value()
+        if node.is_leaf():
+            folded[id(node)] = node
+            continue
+
+        if node.get_operands() is not None:
+            new_node = Tree(op, operands=[folded[id(operand)] for operand in node.get_operands()])
+            operands = new_node.get_operands()
+        else:
+            new_node = Tree(op, folded.get(id(node.get_left())), folded.get(id(node.get_right())))
+            operands = [operand for operand in (new_node.get_left(), new_node.get_right()) if operand is not None]
+
+        if op.is_pure() and all(_is_constant(operand) for operand in operands):
+            try:
+                if new_node.get_operands() is not None:
+                    new_node = Tree(op._calc_many([operand.get_value() for operand in operands]))
+                else:
+                    new_node = Tree(op.calc(None if not new_node.has_left() else new_node.get_left().get_value(),
+                                            None if not new_node.has_right() else new_node.get_right().get_value()))
+            except (CalculationError, ArithmeticError, ValueError):
+                pass
+        folded[id(node)] = new_node
+    return folded[id(tree)]
+
+
+def optimize_tree(tree: Tree) -> Tree:
+    """
+    Creates an optimized copy of an expression tree:
+    1. Chains of the same associative operator, like a+b+c+d, are flattened into a single node that applies the
+       operator on all of their operands at once. Only operators that declare themselves associative are flattened.
+    2. Subtrees without variables are replaced with their value. Only operators that declare themselves pure are
+       calculated. Subtrees that cannot be calculated are kept as they are, so their error is only raised when the
+       expression is evaluated.
+    :param tree: the expression tree
+    :return: the optimized tree
+    """
+    return _fold_constants(_flatten(tree))
@@ -0,0 +1,409 @@
+import string
+
+from CalculatorExceptions import CalculatorInputError
+from Tree import Tree
+from Variable import Variable
+from operators.OperatorType import OperatorType
+
+# Kinds of tokens the tokenizer produces
+NUMBER = 0
+OPERATOR = 1
+SIGN = 2
+OPEN = 3
+CLOSE = 4
+VARIABLE = 5
+FUNCTION = 6
+COMMA = 7
+
+# The names of variables start with a letter or an underscore, followed by letters, underscores and digits
+VARIABLE_START = frozenset(string.ascii_letters + '_')
+VARIABLE_CHARS = VARIABLE_START | frozenset(string.digits)
+
+# Classes of the characters of an expression. Characters the calculator does not support have no class.
+DIGIT_CHAR = 0
+POINT_CHAR = 1
+OPEN_CHAR = 2
+CLOSE_CHAR = 3
+NAME_CHAR = 4  # A letter or an underscore, which starts or continues the name of a variable
+OPERATOR_CHAR = 5
+SYMBOL_CHAR = 6  # A character of an operator symbol longer than a character, which is not an operator on its own
+COMMA_CHAR = 7  # Separates the arguments of functions, if the calculator has any
+
+# The key of the symbol that ends at a node of a trie of symbols. Every other key is a single character.
+_SYMBOL_END = ''
+
+
+def character_classes(operators: dict) -> dict:
+    """
+    Builds a lookup table of the class of every character a calculator supports, so loops over the characters of an
+    expression classify each one with a single lookup.
+    The table is never changed after it is built (a calculator builds a new one when an operator is added), so it
+    can be shared by everyone who reads it.
+    :param operators: the operators the calculator supports, mapped by their symbols
+    :return: a dict of characters to their classes
+    """
+    classes = dict.fromkeys(string.digits, DIGIT_CHAR)
+    classes.update(dict.fromkeys(VARIABLE_START, NAME_CHAR))
+    classes.update({'.': POINT_CHAR, '(': OPEN_CHAR, ')': CLOSE_CHAR})
+    for symbol, op in operators.items():
+        if op.get_type() == OperatorType.FUNCTION:
+            # The names of functions are made of the characters of names, and their arguments are separated by commas
+            classes[','] = COMMA_CHAR
+        elif len(symbol) == 1:
+            # Operator symbols take precedence over the names of variables
+            classes[symbol] = OPERATOR_CHAR
+        else:
+            for char in symbol:
+                classes.setdefault(char, SYMBOL_CHAR)
+    return classes
+
+
+def symbol_trie(symbols, reverse: bool = False) -> dict:
+    """
+    Builds a trie of operator symbols, so the symbol that starts at a position of an expression is found by walking
+    the characters after it, in time that only depends on the length of the longest symbol and not on the number of
+    symbols. Like the table of character classes, the trie is never changed after it is built.
+    :param symbols: the symbols
+    :param reverse: whether to build the trie of the reversed symbols, to find the symbols that end at a position
+    :return: the trie, as nested dicts of characters. The symbol that ends at a node is kept under the key ''.
+    """
+    trie = {}
+    for symbol in symbols:
+        node = trie
+        for char in (reversed(symbol) if reverse else symbol):
+            node = node.setdefault(char, {})
+        node[_SYMBOL_END] = symbol
+    return trie
+
+
+def symbol_before(trie: dict, expression: str, end: int) -> str | None:
+    """
+    Finds the longest operator symbol that ends right before a position of an expression
+    :param trie: the trie of the reversed symbols (see symbol_trie)
+    :param expression: the expression
+    :param end: the position
+    :return: the symbol, or None if no symbol ends there
+    """
+    node = trie
+    symbol = None
+    i = end - 1
+    while i >= 0:
+        node = node.get(expression[i])
+        if node is None:
+            break
+        symbol = node.get(_SYMBOL_END, symbol)
+        i -= 1
+    return symbol
+
+
+def _match_symbol(trie: dict, operators: dict, expression: str, start: int) -> tuple:
+    """
+    Finds the longest operator symbol that starts at a position of an expression. The name of a function only matches
+    when an opening bracket follows it, so it can still be the name of a variable.
+    :return: a tuple of the symbol, or None if no symbol starts there, and the position after it
+    """
+    node = trie
+    symbol = None
+    end = start
+    length = len(expression)
+    i = start
+    while i < length:
+        node = node.get(expression[i])
+        if node is None:
+            break
+        i += 1
+        found = node.get(_SYMBOL_END)
+        if found is not None and (operators[found].get_type() != OperatorType.FUNCTION
+                                  or (i < length and expression[i] == '(')):
+            symbol = found
+            end = i
+    return symbol, end
+
+
+def tokenize(expression: str, operators: dict, classes: dict = None, trie: dict = None) -> list:
+    """
+    Splits a mathematical expression into tokens in a single pass over it.
+    A minus that comes at the start of the expression or right after an operator that is not of type right is a sign
+    minus rather than an operator (the same rule the calculator uses everywhere else).
+    Operator symbols take precedence over the names of variables, so a variable name ends at the first operator.
+    :param expression: the mathematical expression, without whitespaces
+    :param operators: the operators the calculator supports, mapped by their symbols
+    :param classes: the character classes of the operators, as built by character_classes. Built from operators if
+        not given.
+    :param trie: the trie of the symbols of the operators (see symbol_trie), if some of them are longer than a
+        character or are functions. Symbols are then matched with the trie, and the longest symbol wins.
+    :return: a list of (kind, value) tuples, where value is the text of a number, the name of a variable, the operator
+        (or function) or None for a sign minus, brackets and commas
+    :raises CalculatorInputError: if the expression has empty brackets, which are reported before any other fault of
+        its structure or its numbers, like the legacy parser that evaluates brackets first reports them
+    :raises CalculatorInputError: if the expression has characters of longer symbols that are not part of any symbol
+    """
+    if classes is None:
+        classes = character_classes(operators)
+    if trie is not None:
+        return _tokenize_symbols(expression, operators, classes, trie)
+    get_class = classes.get
+    tokens = []
+    expect_operand = True
+    i = 0
+    length = len(expression)
+    while i < length:
+        char = expression[i]
+        char_class = get_class(char)
+        if char_class == OPEN_CHAR:
+            tokens.append((OPEN, None))
+            expect_operand = True
+            i += 1
+            continue
+        if char_class == CLOSE_CHAR:
+            if tokens and tokens[-1][0] == OPEN:
+                raise CalculatorInputError("Brackets cannot be empty!")
+            tokens.append((CLOSE, None))
+            expect_operand = False
+            i += 1
+            continue
+
+        if char_class != OPERATOR_CHAR:
+            start = i
+            i += 1
+            if char_class == NAME_CHAR:
+                while i < length and get_class(expression[i]) in (NAME_CHAR, DIGIT_CHAR):
+                    i += 1
+                tokens.append((VARIABLE, expression[start:i]))
+            else:
+                # Everything up to the next operator, bracket or variable is part of the number
+                while i < length and get_class(expression[i]) in (DIGIT_CHAR, POINT_CHAR, None):
+                    i += 1
+                tokens.append((NUMBER, expression[start:i]))
+            expect_operand = False
+            continue
+
+        op = operators[char]
+        if expect_operand and char == '-':
+            tokens.append((SIGN, None))
+        else:
+            tokens.append((OPERATOR, op))
+            expect_operand = op.get_type() != OperatorType.RIGHT
+        i += 1
+    return tokens
+
+
+def _tokenize_symbols(expression: str, operators: dict, classes: dict, trie: dict) -> list:
+    """
+    Splits a mathematical expression into tokens like tokenize, for operators with symbols longer than a character and
+    functions. Every character that may start a symbol is matched with the trie first, so the expression is still
+    read in a single pass, however many operators there are.
+    """
+    get_class = classes.get
+    tokens = []
+    expect_operand = True
+    i = 0
+    length = len(expression)
+    while i < length:
+        char = expression[i]
+        if char in trie:
+            symbol, end = _match_symbol(trie, operators, expression, i)
+            if symbol is not None:
+                op = operators[symbol]
+                if op.get_type() == OperatorType.FUNCTION:
+                    # The opening bracket of its arguments comes next
+                    tokens.append((FUNCTION, op))
+                elif expect_operand and symbol == '-':
+                    tokens.append((SIGN, None))
+                else:
+                    tokens.append((OPERATOR, op))
+                    expect_operand = op.get_type() != OperatorType.RIGHT
+                i = end
+                continue
+
+        char_class = get_class(char)
+        start = i
+        i += 1
+        if char_class == OPEN_CHAR:
+            tokens.append((OPEN, None))
+            expect_operand = True
+        elif char_class == CLOSE_CHAR:
+            # The brackets of a function call without arguments are not empty brackets, but a call the parser rejects
+            if tokens and tokens[-1][0] == OPEN and (len(tokens) < 2 or tokens[-2][0] != FUNCTION):
+                raise CalculatorInputError("Brackets cannot be empty!")
+            tokens.append((CLOSE, None))
+            expect_operand = False
+        elif char_class == COMMA_CHAR:
+            tokens.append((COMMA, None))
+            expect_operand = True
+        elif char_class == NAME_CHAR:
+            while i < length and get_class(expression[i]) in (NAME_CHAR, DIGIT_CHAR) and not (
+                    expression[i] in trie and _match_symbol(trie, operators, expression, i)[0] is not None):
+                i += 1
+            tokens.append((VARIABLE, expression[start:i]))
+            expect_operand = False
+        elif char_class in (DIGIT_CHAR, POINT_CHAR, None):
+            while i < length and get_class(expression[i]) in (DIGIT_CHAR, POINT_CHAR, None):
+                i += 1
+            tokens.append((NUMBER, expression[start:i]))
+            expect_operand = False
+        else:
+            raise CalculatorInputError("The expression contains an unknown operator at: " + expression[start:])
+    return tokens
+
+
+def _to_number(text: str, to_number) -> float:
+    """
+    Converts the text of a number token to its value
+    :param text: the text of the number
+    :param to_number: the function that converts the text, which raises ValueError if it is not a valid number
+    :return: the value of the number
+    :raises CalculatorInputError: if the text is not a valid number
+    """
+    try:
+        return to_number(text)
+    except ValueError:
+        raise CalculatorInputError("Something went wrong...")
+
+
+class Parser:
+    """
+    An operator precedence parser that builds an expression tree out of a mathematical expression in linear time.
+    Operators with a lower priority end up closer to the root of the tree and operators with the same priority are
+    applied from left to right, exactly like the calculator's original split-on-last-operator parser.
+    An expression inside brackets becomes a subtree, which is treated as a single operand.
+    Operators that are still missing their right operand wait on a stack instead of the call stack, so the depth of
+    the brackets is not limited by the recursion limit.
+    A function call is a single operand too: its arguments are parsed like expressions inside brackets, and become the
+    operands of a node of the function (like a flattened chain of an associative operator).
+    """
+
+    def __init__(self, expression: str, operators: dict, classes: dict = None, to_number=float, trie: dict = None):
+        """
+        :param expression: the mathematical expression, without whitespaces
+        :param operators: the operators the calculator supports, mapped by their symbols
+        :param classes: the character classes of the operators, as built by character_classes. Built from operators if
+            not given.
+        :param to_number: the function that converts the text of a number to its value (see NumericBackend.to_number)
+        :param trie: the trie of the symbols of the operators, if some of them are longer than a character or are
+            functions (see tokenize)
+        """
+        self._operators = operators
+        self._to_number = to_number
+        self._tokens = tokenize(expression, operators, classes, trie)
+        self._operands = []
+        self._pending = []
+
+    def parse(self) -> Tree:
+        """
+        Builds the expression tree of the expression
+        :return: a new expression tree that represents the expression
+        :raises CalculatorInputError: if the expression does not have a valid structure
+        """
+        tokens = self._tokens
+        pending = self._pending
+        expect_operand = True
+        i = 0
+        while i < len(tokens):
+            kind, value = tokens[i]
+            i += 1
+            if expect_operand:
+                if kind == NUMBER:
+                    self._operands.append(Tree(_to_number(value, self._to_number)))
+                    expect_operand = False
+                elif kind == VARIABLE:
+                    self._operands.append(Tree(Variable(value)))
+                    expect_operand = False
+                elif kind == SIGN and i < len(tokens) and tokens[i][0] == NUMBER:
+                    # A sign minus that comes right before a number is part of that number
+                    self._operands.append(Tree(_to_number('-' + tokens[i][1], self._to_number)))
+                    expect_operand = False
+                    i += 1
+                elif kind == OPEN:
+                    # Empty brackets were already rejected by tokenize
+                    pending.append((kind, value))
+                elif kind == FUNCTION:
+                    # The tokenizer only makes a function of a name that an opening bracket follows
+                    if i + 1 < len(tokens) and tokens[i + 1][0] == CLOSE:
+                        raise CalculatorInputError("Invalid expression structure: function " + value.get_symbol() +
+                                                   " cannot be called without arguments")
+                    # The arguments start after the operands that are already there
+                    pending.append((kind, (value, len(self._operands))))
+                    i += 1
+                elif kind == SIGN or (kind == OPERATOR and value.get_type() == OperatorType.LEFT):
+                    pending.append((kind, value))
+                elif kind == OPERATOR:
+                    raise CalculatorInputError("Invalid expression structure: operator " + value.get_symbol() +
+                                               " is missing an operand to its left")
+                elif kind == COMMA or (kind == CLOSE and i >= 2 and tokens[i - 2][0] == COMMA):
+                    raise CalculatorInputError("Invalid expression structure: an argument of a function is missing")
+                else:
+                    raise CalculatorInputError("Something went wrong...")
+            elif kind == CLOSE:
+                self._reduce(0)
+                if not pending:
+                    raise CalculatorInputError("Invalid brackets structure: a closing bracket can only come after its "
+                                               "matching opening bracket.")
+                kind, value = pending.pop()
+                if kind == FUNCTION:
+                    function, start = value
+                    arguments = self._operands[start:]
+                    del self._operands[start:]
+                    self._check_arguments(function, len(arguments))
+                    self._operands.append(Tree(function, operands=arguments))
+            elif kind == COMMA:
+                self._reduce(0)
+                if not pending or pending[-1][0] != FUNCTION:
+                    raise CalculatorInputError("Invalid expression structure: a comma can only separate the arguments "
+                                               "of a function")
+                expect_operand = True
+            elif kind != OPERATOR or value.get_type() == OperatorType.LEFT:
+                raise CalculatorInputError("Invalid expression structure: missing an operator between two operands")
+            else:
+                # Only operators with a higher priority bind to the right operand, so equal priorities go left first
+                self._reduce(value.get_priority())
+                if value.get_type() == OperatorType.RIGHT:
+                    self._operands.append(Tree(value, self._operands.pop()))
+                else:
+                    pending.append((kind, value))
+                    expect_operand = True
+
+        if expect_operand:
+            if tokens and tokens[-1][0] == OPERATOR:
+                raise CalculatorInputError("Invalid expression structure: operator " + tokens[-1][1].get_symbol() +
+                                           " is missing an operand to its right")
+            raise CalculatorInputError("Something went wrong...")
+        self._reduce(0)
+        if pending:
+            raise CalculatorInputError("Missing close bracket")
+        return self._operands.pop()
+
+    @staticmethod
+    def _check_arguments(function, count: int):
+        """
+        Checks the number of arguments a function is called with
+        :param function: the function
+        :param count: the number of arguments
+        :raises CalculatorInputError: if the function cannot be called with that many arguments
+        """
+        minimum, maximum = function.get_arity()
+        if count < minimum or (maximum is not None and count > maximum):
+            raise CalculatorInputError("Invalid expression structure: function " + function.get_symbol() +
+                                       " cannot be called with this number of arguments", count)
+
+    def _reduce(self, min_priority: int):
+        """
+        Applies the pending operators on their operands, until reaching an opening bracket (or the bracket of the
+        arguments of a function) or an operator with a priority lower than min_priority. A sign minus is always
+        applied, since it belongs to a single operand.
+        :param min_priority: the lowest priority of an operator that may be applied
+        """
+        pending = self._pending
+        operands = self._operands
+        while pending:
+            kind, op = pending[-1]
+            if kind == OPEN or kind == FUNCTION or (kind == OPERATOR and op.get_priority() < min_priority):
+                return
+            pending.pop()
+            right = operands.pop()
+            if kind == SIGN:
+                operands.append(Tree(self._operators['-'], Tree(self._to_number('0')), right))
+            elif op.get_type() == OperatorType.LEFT:
+                operands.append(Tree(op, None, right))
+            else:
+                operands.append(Tree(op, operands.pop(), right))
@@ -0,0 +1,197 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import types
+
+from BinaryFormat import encode_tree, decode_tree, FORMAT_VERSION as TREE_FORMAT_VERSION
+from CalculatorExceptions import CalculatorInputError
+from Tree import Tree
+from operators.Operator import Operator
+
+# The version of the format of the plans. Plans of other versions are never read, since it is part of the fingerprint.
+# Plans are expression trees in the binary format of compiled expressions (see BinaryFormat.encode_tree).
+FORMAT_VERSION = 2
+
+# The number of plans a cache keeps by default
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+def _const_fingerprint(const) -> bytes:
+    if isinstance(const, types.CodeType):
+        return _code_fingerprint(const)
+    if isinstance(const, frozenset):
+        # The order of the items of a set depends on the hash seed of the process
+        return b"{" + b",".join(sorted(_const_fingerprint(item) for item in const)) + b"}"
+    if isinstance(const, tuple):
+        return b"(" + b",".join(_const_fingerprint(item) for item in const) + b")"
+    return repr(const).encode()
+
+
+def _code_fingerprint(code: types.CodeType) -> bytes:
+    """
+    Gets the bytes that identify the implementation of a function: its bytecode, the names it uses and its constants.
+    Unlike marshal, they are the same in every process.
+    """
+    return b"\0".join([code.co_code, repr(code.co_names).encode()] +
+                      [_const_fingerprint(const) for const in code.co_consts])
+
+
+def operators_fingerprint(operators: dict, *settings) -> str:
+    """
+    Gets a fingerprint of a set of operators and the settings of a calculator, which changes whenever an operator is
+    added or removed, or the class, symbol, priority, type, arity, numeric types or implementation (the code of _calc
+    and _calc_many) of an operator changes
+    :param operators: the operators of the calculator, mapped by their symbols
+    :param settings: the settings of the calculator that change the plans of expressions (they must have stable
+        representations)
+    :return: the fingerprint, as a hexadecimal string
+    """
+    digest = hashlib.sha256(repr((FORMAT_VERSION, TREE_FORMAT_VERSION, settings)).encode())
+    for symbol in sorted(operators):
+        op = operators[symbol]
+        op_class = type(op)
+        digest.update(repr((symbol, op_class.__module__, op_class.__qualname__, op.get_priority(), op.get_type().name,
+                            op.get_arity(), op.is_associative(), op.is_pure(),
+                            [number_type.__name__ for number_type in op.get_numeric_types()])).encode())
+        for cls in op_class.__mro__:
+            if cls is Operator or cls is object:
+                break
+            for name in ("_calc", "_calc_many"):
+                if name in vars(cls):
+                    digest.update(_code_fingerprint(vars(cls)[name].__code__))
+    return digest.hexdigest()
+
+
+class PersistentCache:
+    """
+    A cache of the plans of compiled expressions (their optimized expression trees) in an SQLite file, which outlives
+    the process, so a calculator that restarts does not parse its expressions again. A plan of an expression without
+    variables whose operators are all pure is just its result.
+    Plans are keyed by the normalized expression and by the fingerprint of the operators and settings of the
+    calculator that compiled it (see operators_fingerprint), so calculators with different operators never read each
+    other's plans.
+    The file is in write-ahead logging mode, so any number of processes can read it while one of them writes. When
+    the cache is larger than its maximal number of entries, the plans that were written first are removed. The cache
+    is only an optimization: if the file cannot be read or written (for example while another process holds it for
+    too long), expressions are compiled as if it were empty, and if it cannot be opened at all (for example in a
+    directory that cannot be written), the cache stays empty.
+    The cache may be used by many threads at once, and pickling it (like with the calculator of a worker process)
+    opens the same file again.
+    """
+
+    def __init__(self, path: str | os.PathLike, max_entries: int = DEFAULT_MAX_ENTRIES, timeout: float = 5.0):
+        """
+        :param path: the path of the SQLite file, which is created if it does not exist
+        :param max_entries: the maximal number of plans the cache keeps
+        :param timeout: the number of seconds to wait for another process that writes to the file
+        :raises CalculatorInputError: if the maximal number of entries is not positive
+        """
+        if max_entries < 1:
+            raise CalculatorInputError("Maximal number of entries must be positive", max_entries)
+        self._path = os.fspath(path)
+        self._max_entries = max_entries
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        # None if the file could not be opened
+        self._connection = None
+        try:
+            # Every statement commits on its own
+            connection = sqlite3.connect(self._path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        except sqlite3.Error:
+            return
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS plans (id INTEGER PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                               "expression TEXT NOT NULL, plan BLOB NOT NULL, UNIQUE (fingerprint, expression))")
+        except sqlite3.Error:
+            connection.close()
+            return
+        self._connection = connection
+
+    def get_path(self) -> str:
+        """
+        Gets the path of the SQLite file
+        :return: the path
+        """
+        return self._path
+
+    def load_tree(self, fingerprint: str, expression: str, operators: dict) -> Tree | None:
+        """
+        Loads the plan of an expression
+        :param fingerprint: the fingerprint of the calculator
+        :param expression: the normalized expression
+        :param operators: the operators of the calculator's trees, mapped by their symbols
+        :return: the expression tree of the plan, or None if there is no valid plan of the expression
+        """
+        if self._connection is None:
+            return None
+        with self._lock:
+            try:
+                row = self._connection.execute("SELECT plan FROM plans WHERE fingerprint = ? AND expression = ?",
+                                               (fingerprint, expression)).fetchone()
+            except sqlite3.Error:
+                return None
+        if row is None:
+            return None
+        try:
+            return decode_tree(row[0], operators)
+        except ValueError:
+            return None
+
+    def store_tree(self, fingerprint: str, expression: str, tree: Tree):
+        """
+        Stores the plan of an expression, and removes the oldest plans if there are too many
+        :param fingerprint: the fingerprint of the calculator
+        :param expression: the normalized expression
+        :param tree: the expression tree of the plan
+        """
+        if self._connection is None:
+            return
+        try:
+            plan = bytes(encode_tree(tree))
+        except TypeError:
+            # The tree has numbers of a type the format does not support
+            return
+        with self._lock:
+            try:
+                self._connection.execute("INSERT OR REPLACE INTO plans (fingerprint, expression, plan) VALUES (?, ?, ?)",
+                                         (fingerprint, expression, plan))
+                # The ids only grow, so all the plans that are not among the newest ones are removed
+                self._connection.execute("DELETE FROM plans WHERE id <= (SELECT MAX(id) FROM plans) - ?",
+                                         (self._max_entries,))
+            except sqlite3.Error:
+                pass
+
+    def __len__(self) -> int:
+        if self._connection is None:
+            return 0
+        with self._lock:
+            try:
+                return self._connection.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+            except sqlite3.Error:
+                return 0
+
+    def clear(self):
+        """Removes all the plans from the file, of every calculator"""
+        if self._connection is None:
+            return
+        with self._lock:
+            try:
+                self._connection.execute("DELETE FROM plans")
+            except sqlite3.Error:
+                pass
+
+    def close(self):
+        """Closes the file"""
+        if self._connection is None:
+            return
+        with self._lock:
+            self._connection.close()
+
+    def __getstate__(self) -> dict:
+        return {"path": self._path, "max_entries": self._max_entries, "timeout": self._timeout}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state["path"], state["max_entries"], state["timeout"])
@@ -0,0 +1,169 @@
+import decimal
+
+from CalculatorExceptions import OperatorError, CalculatorInputError, CalculationError
+from Tree import Tree
+from Variable import Variable
+from operators.Operator import Operator
+from operators.OperatorType import OperatorType
+
+# Opcodes of the instructions of a program
+CONST = 0  # Pushes a number onto the stack
+BINARY = 1  # Pops the right and the left operands and pushes the result of an inner operator on them
+PREFIX = 2  # Replaces the top of the stack with the result of a left operator on it
+POSTFIX = 3  # Replaces the top of the stack with the result of a right operator on it
+VARIABLE = 4  # Pushes the value of a variable onto the stack
+CHAIN = 5  # Pops a number of operands and pushes the result of an associative operator (or a function) on all of them
+STORE = 6  # Saves the top of the stack in a slot, so a subtree shared by many parents is only calculated once
+LOAD = 7  # Pushes the value saved in a slot
+
+_OPCODES = {OperatorType.INNER: BINARY, OperatorType.LEFT: PREFIX, OperatorType.RIGHT: POSTFIX}
+
+
+class Program:
+    """
+    An expression tree flattened into a list of postfix instructions, which are evaluated by a loop over a stack.
+    Every instruction is an (opcode, argument) tuple, where the argument is either a number, the name of a variable,
+    the _calc method of an operator or a tuple of the _calc_many method of an associative operator and the number of
+    its operands, so evaluating a program neither recurses nor looks up anything on the operators.
+    """
+    __slots__ = ('_instructions', '_slot_count')
+
+    def __init__(self, instructions: list, slot_count: int = 0):
+        """
+        :param instructions: the postfix instructions of the program
+        :param slot_count: the number of slots the STORE and LOAD instructions use
+        """
+        self._instructions = instructions
+        self._slot_count = slot_count
+
+    def get_instructions(self) -> list:
+        """
+        Gets the postfix instructions of the program
+        :return: a list of (opcode, argument) tuples
+        """
+        return self._instructions
+
+    def get_slot_count(self) -> int:
+        """
+        Gets the number of slots the program saves the values of shared subtrees in
+        :return: the number of slots
+        """
+        return self._slot_count
+
+    def run(self, variables: dict = None) -> float:
+        """
+        Evaluates the program
+        :param variables: the values of the variables of the expression, mapped by their names
+        :return: the value of the expression the program was compiled from
+        :raises CalculatorInputError: if the value of one of the variables is missing
+        :raises CalculationError: if the expression cannot be calculated based on the limitations of its operators, or
+            its result is too large
+        """
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        slots = [None] * self._slot_count if self._slot_count else None
+        try:
+            for code, arg in self._instructions:
+                if code == CONST:
+                    push(arg)
+                elif code == BINARY:
+                    right = pop()
+                    stack[-1] = arg(stack[-1], right)
+                elif code == PREFIX:
+                    stack[-1] = arg(None, stack[-1])
+                elif code == POSTFIX:
+                    stack[-1] = arg(stack[-1], None)
+                elif code == CHAIN:
+                    calc_many, count = arg
+                    operands = stack[-count:]
+                    del stack[-count:]
+                    push(calc_many(operands))
+                elif code == STORE:
+                    slots[arg] = stack[-1]
+                elif code == LOAD:
+                    push(slots[arg])
+                elif variables is not None and arg in variables:
+                    push(variables[arg])
+                else:
+                    raise CalculatorInputError("Missing a value for the variable", arg)
+        except (OverflowError, decimal.Overflow):
+            # Exact integers (like the results of factorials) can become too large to be used as floats
+            raise CalculationError("The result is too large to calculate")
+        except decimal.InvalidOperation:
+            # Like a negative decimal raised to the power of a fraction
+            raise CalculationError("The result is not a number")
+        return stack[0]
+
+
+def check_operands(node: Tree):
+    """
+    Checks that the operator of a node has exactly the operands it requires
+    :param node: a node whose value is an operator
+    :raises OperatorError: if the operator is missing one of the operands it requires, or has an operand it does not
+        use
+    """
+    value = node.get_value()
+    op_type = value.get_type()
+    if node.get_operands() is not None:
+        if op_type == OperatorType.FUNCTION:
+            minimum, maximum = value.get_arity()
+            if len(node.get_operands()) < max(minimum, 1) or (maximum is not None
+                                                              and len(node.get_operands()) > maximum):
+                raise OperatorError("Function " + value.get_symbol() + " cannot be called with this number of "
+                                    "arguments", len(node.get_operands()))
+        elif op_type != OperatorType.INNER:
+            raise OperatorError("Operator" + value.get_symbol() + " cannot be applied on a chain of operands")
+        return
+    if op_type == OperatorType.FUNCTION:
+        raise OperatorError("Function " + value.get_symbol() + " can only be applied on a list of arguments")
+    if (op_type != OperatorType.LEFT) != node.has_left():
+        if node.has_left():
+            raise OperatorError("Operator" + value.get_symbol() + " cannot have a left operand")
+        raise OperatorError("Operator" + value.get_symbol() + " is missing a left operand")
+    if (op_type != OperatorType.RIGHT) != node.has_right():
+        if node.has_right():
+            raise OperatorError("Operator" + value.get_symbol() + " cannot have a right operand")
+        raise OperatorError("Operator" + value.get_symbol() + " is missing a right operand")
+
+
+def compile_tree(tree: Tree, shared: bool = False) -> Program:
+    """
+    Flattens an expression tree into a program
+    :param tree: the expression tree
+    :param shared: whether nodes of the tree may be shared by many parents (see SubtreeTable). A shared operator node
+        is then calculated once, and its value is saved for the other places it appears in.
+    :return: the program that evaluates the tree
+    :raises OperatorError: if an operator in the tree is missing one of the operands it requires, or has an operand it
+        does not use
+    """
+    instructions = []
+    calculated = {}  # The indexes of the instructions that calculated shared operator nodes, by the ids of the nodes
+    stores = {}  # The slots of the values that are saved, by the indexes of the instructions that calculated them
+    for node in tree.iter_postorder(shared):
+        value = node.get_value()
+        if shared and isinstance(value, Operator):
+            index = calculated.get(id(node))
+            if index is not None:
+                instructions.append((LOAD, stores.setdefault(index, len(stores))))
+                continue
+            calculated[id(node)] = len(instructions)
+        if isinstance(value, Variable):
+            instructions.append((VARIABLE, value.get_name()))
+        elif not isinstance(value, Operator):
+            instructions.append((CONST, value))
+        else:
+            check_operands(node)
+            if node.get_operands() is not None:
+                instructions.append((CHAIN, (value._calc_many, len(node.get_operands()))))
+            else:
+                instructions.append((_OPCODES[value.get_type()], value._calc))
+    if stores:
+        # The values are saved right after they are calculated
+        saving = []
+        for index, instruction in enumerate(instructions):
+            saving.append(instruction)
+            if index in stores:
+                saving.append((STORE, stores[index]))
+        instructions = saving
+    return Program(instructions, len(stores))
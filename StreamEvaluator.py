@@ -0,0 +1,131 @@
+import itertools
+import json
+import math
+import time
+
+from BatchEvaluation import evaluate_or_error, iter_evaluate_in_processes
+
+# Output formats
+PLAIN = "plain"  # A line with the result, or with "error: " and the error, for every expression
+JSONL = "jsonl"  # A JSON object with the expression and its result or error for every expression
+
+
+class StreamSummary:
+    """
+    Statistics about a stream of expressions that were evaluated
+    """
+
+    def __init__(self, expressions: int, errors: int, seconds: float):
+        """
+        :param expressions: the number of expressions that were evaluated
+        :param errors: the number of expressions that could not be evaluated
+        :param seconds: how long it took
+        """
+        self.expressions = expressions
+        self.errors = errors
+        self.seconds = seconds
+
+    def __str__(self) -> str:
+        rate = self.expressions / self.seconds if self.seconds > 0 else math.inf
+        return (str(self.expressions) + " expressions (" + str(self.errors) + " errors) in " +
+                format(self.seconds, ".2f") + " seconds, " + format(rate, ".0f") + " expressions per second")
+
+
+def read_expressions(file):
+    """
+    Reads newline-delimited expressions from a file, one line at a time
+    :param file: a text file, like sys.stdin, which should be opened with a large buffer
+    :return: an iterator over the lines of the file, without their line endings
+    """
+    for line in file:
+        yield line.rstrip('\r\n')
+
+
+def evaluate_expressions(calculator, expressions, workers: int = 1, chunksize: int = 1000):
+    """
+    Lazily evaluates a stream of mathematical expressions, in order
+    :param calculator: the calculator
+    :param expressions: an iterable of mathematical expressions
+    :param workers: the number of worker processes. With a single worker the expressions are evaluated in this
+        process.
+    :param chunksize: the number of expressions sent to a worker at once
+    :return: an iterator over tuples of every expression and its result, or the error it raised
+    """
+    if workers == 1:
+        return ((expression, evaluate_or_error(calculator, expression)) for expression in expressions)
+    # The copy of the expressions only holds the ones the workers have not returned yet
+    expressions, copy = itertools.tee(expressions)
+    return zip(copy, iter_evaluate_in_processes(calculator, expressions, workers, chunksize))
+
+
+def format_result(expression: str, result, output_format: str = PLAIN) -> str:
+    """
+    Formats the result of an expression as a line of output
+    :param expression: the mathematical expression
+    :param result: its result, or the error it raised
+    :param output_format: PLAIN or JSONL
+    :return: the line, with a line ending
+    """
+    if output_format == PLAIN:
+        if isinstance(result, Exception):
+            return "error: " + str(result) + "\n"
+        return str(result) + "\n"
+
+    return json.dumps(result_record(expression, result)) + "\n"
+
+
+def result_record(expression: str, result) -> dict:
+    """
+    Builds the JSON object of the result of an expression
+    :param expression: the mathematical expression
+    :param result: its result, or the error it raised
+    :return: a dict with the expression and either its result or its error, the type of the error and the offset of
+        the character that caused it (if known)
+    """
+    if isinstance(result, Exception):
+        record = {"expression": expression, "error": str(result), "type": type(result).__name__}
+        if getattr(result, "offset", None) is not None:
+            record["offset"] = result.offset
+        return record
+    if isinstance(result, float) and not math.isfinite(result):
+        # JSON has no infinity or NaN
+        return {"expression": expression, "result": str(result)}
+    if not isinstance(result, (int, float)):
+        # Fractions and decimals are written as text, so they stay exact
+        return {"expression": expression, "result": str(result)}
+    return {"expression": expression, "result": result}
+
+
+def evaluate_stream(calculator, input_file, output_file, output_format: str = PLAIN, workers: int = 1,
+                    chunksize: int = 1000, keep_going: bool = False) -> StreamSummary:
+    """
+    Evaluates newline-delimited expressions from a file and writes a line with the result of each one to another
+    file. Expressions are read, evaluated and written in chunks, so any number of them takes constant memory.
+    :param calculator: the calculator
+    :param input_file: the text file to read the expressions from
+    :param output_file: the text file to write the results to
+    :param output_format: PLAIN or JSONL
+    :param workers: the number of worker processes
+    :param chunksize: the number of expressions sent to a worker at once, and of lines written at once
+    :param keep_going: whether to continue after an expression that could not be evaluated, instead of stopping
+        after writing its error
+    :return: the statistics of the stream
+    """
+    start = time.perf_counter()
+    expressions = 0
+    errors = 0
+    lines = []
+    results = evaluate_expressions(calculator, read_expressions(input_file), workers, chunksize)
+    for expression, result in results:
+        expressions += 1
+        lines.append(format_result(expression, result, output_format))
+        if len(lines) >= chunksize:
+            output_file.write("".join(lines))
+            lines.clear()
+        if isinstance(result, Exception):
+            errors += 1
+            if not keep_going:
+                break
+    output_file.write("".join(lines))
+    output_file.flush()
+    return StreamSummary(expressions, errors, time.perf_counter() - start)
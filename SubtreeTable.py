@@ -0,0 +1,92 @@
+import decimal
+import threading
+
+from Tree import Tree
+from Variable import Variable
+from operators.Operator import Operator
+
+# The number of nodes a table keeps by default before it starts over
+DEFAULT_MAX_SIZE = 1 << 18
+
+
+def _leaf_key(value) -> tuple:
+    """
+    Gets the key of a leaf: leaves are only shared if they are the same variable, or numbers that are not only equal
+    but also written the same (0.0 and -0.0, or Decimal("1.0") and Decimal("1.00"), behave differently)
+    """
+    if isinstance(value, Variable):
+        return Variable, value.get_name()
+    if type(value) is float or type(value) is decimal.Decimal:
+        return type(value), repr(value)
+    return type(value), value
+
+
+class SubtreeTable:
+    """
+    A hash-consing table of expression tree nodes: every distinct subtree is kept once, and the trees it interns share
+    the nodes of their identical subtrees, so the trees become directed acyclic graphs. Two nodes are identical if they
+    have the same operator (the same instance) and identical operands, or are identical leaves.
+    Compiled programs calculate a shared node once per evaluation (see compile_tree), and the trees of many expressions
+    interned by the same table (like the expressions of a batch, or in the cache of a calculator) share their memory.
+    Shared nodes must never be changed. The table starts over when it grows past its maximal size, and trees that were
+    already interned keep their nodes.
+    The table may be used by many threads at once.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        :param max_size: the maximal number of nodes the table keeps
+        """
+        self._max_size = max_size
+        # The keys of operator nodes have the ids of the interned nodes of their operands, which are kept alive by the
+        # node of the key
+        self._nodes = {}
+        self._lock = threading.Lock()
+
+    def intern(self, tree: Tree) -> Tree:
+        """
+        Interns the nodes of an expression tree
+        :param tree: the expression tree, whose nodes are not changed
+        :return: a tree with the same structure, made of the shared nodes of the table
+        """
+        interned = {}
+        with self._lock:
+            nodes = self._nodes
+            for node in tree.iter_postorder(shared=True):
+                if id(node) in interned:
+                    continue
+                value = node.get_value()
+                if not isinstance(value, Operator):
+                    key = _leaf_key(value)
+                    shared = nodes.get(key)
+                    if shared is None:
+                        shared = nodes[key] = node
+                    interned[id(node)] = shared
+                    continue
+
+                if node.get_operands() is not None:
+                    operands = [interned[id(operand)] for operand in node.get_operands()]
+                    key = (value, tuple(id(operand) for operand in operands))
+                    shared = nodes.get(key)
+                    if shared is None:
+                        shared = nodes[key] = Tree(value, operands=operands)
+                else:
+                    left = interned[id(node.get_left())] if node.has_left() else None
+                    right = interned[id(node.get_right())] if node.has_right() else None
+                    key = (value, id(left), id(right))
+                    shared = nodes.get(key)
+                    if shared is None:
+                        shared = nodes[key] = Tree(value, left, right)
+                interned[id(node)] = shared
+            result = interned[id(tree)]
+            if len(nodes) > self._max_size:
+                nodes.clear()
+        return result
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def clear(self):
+        """Removes all the nodes from the table. Trees that were already interned keep their nodes."""
+        with self._lock:
+            self._nodes.clear()
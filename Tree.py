@@ -1,11 +1,24 @@
+from Variable import Variable
 from operators.Operator import Operator
 
 
 class Tree:
-    def __init__(self, value: float | Operator, left: 'Tree' = None, right: 'Tree' = None):
+    # Compiled expressions keep their trees for as long as they are cached, so nodes have no per-instance __dict__
+    __slots__ = ('_left', '_right', '_value', '_operands')
+
+    def __init__(self, value: float | Variable | Operator, left: 'Tree' = None, right: 'Tree' = None,
+                 operands: list = None):
+        """
+        :param value: the number or variable of a leaf, or the operator of an inner node
+        :param left: the subtree of the left operand
+        :param right: the subtree of the right operand
+        :param operands: the subtrees of all the operands of an associative operator that was flattened to apply on
+            any number of operands at once. Such a node has neither a left nor a right subtree.
+        """
         self._left = left
         self._right = right
         self._value = value
+        self._operands = operands
 
     def get_right(self) -> 'Tree':
         return self._right
@@ -19,11 +32,14 @@ class Tree:
     def set_right(self, right: 'Tree'):
         self._right = right
 
-    def get_value(self) -> Operator | float:
+    def get_value(self) -> Operator | Variable | float:
         return self._value
 
+    def get_operands(self) -> list | None:
+        return self._operands
+
     def is_leaf(self) -> bool:
-        return self._left is None and self._right is None
+        return self._left is None and self._right is None and self._operands is None
 
     def has_left(self) -> bool:
         return self._left is not None
@@ -31,6 +47,32 @@ class Tree:
     def has_right(self) -> bool:
         return self._right is not None
 
-
-
-
+    def iter_postorder(self, shared: bool = False):
+        """
+        Iterates over the nodes of the tree in post-order: the left subtree, then the right subtree (or all the operands
+        of a flattened node, in order) and then the node itself. The tree is walked with an explicit stack, so its depth
+        is not limited by the recursion limit.
+        :param shared: whether nodes may be shared by many parents (see SubtreeTable). The subtree of a shared node is
+            only walked the first time it is reached, and later only the node itself is yielded again.
+        :return: an iterator over the nodes of the tree
+        """
+        visited = set() if shared else None
+        stack = [(self, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if children_done or node.is_leaf():
+                yield node
+                continue
+            if visited is not None:
+                if id(node) in visited:
+                    yield node
+                    continue
+                visited.add(id(node))
+            # The children are pushed in reverse, so the left subtree comes out first
+            stack.append((node, True))
+            if node._operands is not None:
+                stack.extend((operand, False) for operand in reversed(node._operands))
+            if node._right is not None:
+                stack.append((node._right, False))
+            if node._left is not None:
+                stack.append((node._left, False))
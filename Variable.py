@@ -0,0 +1,20 @@
+class Variable:
+    """
+    A named variable in a mathematical expression. Its value is only given when the expression is evaluated.
+    """
+    __slots__ = ('_name',)
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def get_name(self) -> str:
+        return self._name
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Variable) and other._name == self._name
+
+    def __hash__(self) -> int:
+        return hash(self._name)
+
+    def __repr__(self) -> str:
+        return "Variable(" + self._name + ")"
@@ -0,0 +1,118 @@
+import math
+
+from CalculatorExceptions import CalculationError, CalculatorInputError
+from Tree import Tree
+from Variable import Variable
+from operators.Operator import Operator, np
+from operators.OperatorType import OperatorType
+
+# What to do with elements that could not be calculated
+NAN = "nan"  # Their result is NaN
+MASK = "mask"  # The result is a NumPy masked array in which they are masked
+RAISE = "raise"  # A CalculationError is raised
+
+
+def _apply(op: Operator, left: tuple, right: tuple) -> tuple:
+    """
+    Applies an operator on arrays of operands
+    :param op: the operator
+    :param left: a tuple of the array of left operands and its mask of invalid elements, or a tuple of Nones
+    :param right: a tuple of the array of right operands and its mask of invalid elements, or a tuple of Nones
+    :return: a tuple of the array of results and its mask of invalid elements (or None if all of them are valid)
+    """
+    result, invalid = op.calc_vectorized(left[0], right[0])
+    # An element that could not be calculated in an operand cannot be calculated in the result either
+    for operand_invalid in (left[1], right[1]):
+        if operand_invalid is not None:
+            invalid = operand_invalid if invalid is None else invalid | operand_invalid
+    return np.asarray(result, dtype=float), invalid
+
+
+def _apply_function(op: Operator, arguments: list) -> tuple:
+    """
+    Applies a function that is not associative on arrays of arguments, by calling _calc_many on every element
+    :param op: the function
+    :param arguments: a list of tuples of the array of every argument and its mask of invalid elements
+    :return: a tuple of the array of results and its mask of invalid elements
+    """
+    size = len(arguments[0][0])
+    result = np.empty(size)
+    invalid = np.zeros(size, dtype=bool)
+    for argument_invalid in (argument[1] for argument in arguments):
+        if argument_invalid is not None:
+            invalid |= argument_invalid
+    values = [argument[0].tolist() for argument in arguments]
+    for i in range(size):
+        try:
+            result[i] = op._calc_many([value[i] for value in values])
+        except (CalculationError, ArithmeticError, ValueError):
+            result[i] = math.nan
+            invalid[i] = True
+    return result, invalid
+
+
+def evaluate_tree_vectorized(tree: Tree, arrays: dict, errors: str = NAN):
+    """
+    Evaluates an expression tree once over NumPy arrays of values for its variables, instead of once per element.
+    The arrays are broadcast against each other, and every operator is applied on whole arrays at once.
+    :param tree: the expression tree
+    :param arrays: arrays of values of the variables in the expression, mapped by their names
+    :param errors: what to do with elements that could not be calculated: NAN, MASK or RAISE
+    :return: an array of the results of the expression for every element
+    :raises CalculatorInputError: if the array of one of the variables is missing or the error policy is unknown
+    :raises CalculationError: if the policy is RAISE and some of the elements could not be calculated
+    """
+    if np is None:
+        raise ImportError("NumPy is required for vectorized evaluation")
+    if errors not in (NAN, MASK, RAISE):
+        raise CalculatorInputError("Unknown error policy", errors)
+
+    arrays = {name: np.asarray(array, dtype=float) for name, array in arrays.items()}
+    shape = np.broadcast_shapes(*[array.shape for array in arrays.values()])
+    size = math.prod(shape)
+
+    # Every operand is flattened to the same size, so the operators never have to deal with broadcasting
+    stack = []
+    with np.errstate(all='ignore'):
+        for node in tree.iter_postorder():
+            value = node.get_value()
+            if isinstance(value, Variable):
+                if value.get_name() not in arrays:
+                    raise CalculatorInputError("Missing an array for the variable", value.get_name())
+                stack.append((np.broadcast_to(arrays[value.get_name()], shape).ravel(), None))
+            elif not isinstance(value, Operator):
+                try:
+                    stack.append((np.full(size, float(value)), None))
+                except OverflowError:
+                    # An exact integer (like a folded factorial) that is too large for a float
+                    stack.append((np.full(size, math.inf), np.ones(size, dtype=bool)))
+            elif node.get_operands() is not None:
+                count = len(node.get_operands())
+                operands = stack[-count:]
+                del stack[-count:]
+                if not value.is_associative():
+                    stack.append(_apply_function(value, operands))
+                    continue
+                # A flattened chain (or a call of an associative function) is calculated one pair of operands at a time
+                result, invalid = operands[0]
+                for operand in operands[1:]:
+                    result, invalid = _apply(value, (result, invalid), operand)
+                stack.append((result, invalid))
+            else:
+                right = stack.pop() if value.get_type() != OperatorType.RIGHT else (None, None)
+                left = stack.pop() if value.get_type() != OperatorType.LEFT else (None, None)
+                stack.append(_apply(value, left, right))
+
+    result, invalid = stack.pop()
+    result = result.reshape(shape)
+    if invalid is None:
+        invalid = np.zeros(shape, dtype=bool)
+    invalid = invalid.reshape(shape)
+
+    if errors == MASK:
+        return np.ma.masked_array(result, mask=invalid)
+    if errors == RAISE and invalid.any():
+        raise CalculationError("Could not calculate " + str(int(invalid.sum())) + " of the elements")
+    result = result.copy()
+    result[invalid] = math.nan
+    return result
@@ -0,0 +1,47 @@
+"""
+Measures how evaluate_batch scales with the number of worker processes, from 1 (in this process) up to the number of
+CPUs, on a batch of distinct random expressions.
+
+Run from the repository root:
+    python -m benchmarks.bench_batch [number of expressions]
+"""
+import os
+import random
+import sys
+import time
+
+import Calculator
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+
+def random_expression(rand: random.Random) -> str:
+    expression = str(rand.randint(1, 99))
+    for _ in range(rand.randint(5, 20)):
+        term = rand.choice([str(rand.randint(1, 99)), str(rand.randint(0, 9)) + "!", "~" + str(rand.randint(1, 9)),
+                            "(" + str(rand.randint(1, 99)) + "-" + str(rand.randint(1, 99)) + ")"])
+        expression += " " + rand.choice("+-*/@&$") + " " + term
+    return expression
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rand = random.Random(13)
+    expressions = [random_expression(rand) for _ in range(count)]
+    calc = Calculator.Calculator(cache_size=0)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, cpus} | {2 ** i for i in range(1, cpus.bit_length()) if 2 ** i <= cpus})
+    print(f"{count} expressions, {cpus} CPUs")
+    print(f"{'workers':>8} {'seconds':>9} {'expressions/s':>14} {'speedup':>8}")
+    single = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        calc.evaluate_batch(expressions, workers=workers)
+        seconds = time.perf_counter() - start
+        single = single or seconds
+        print(f"{workers:>8} {seconds:>9.2f} {count / seconds:>14.0f} {single / seconds:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Compares the binary format of compiled expressions (CompiledExpression.dumps and loads, see BinaryFormat) with
+pickling their expression trees, for expressions of growing sizes: the bytes they take, how long it takes to encode
+and decode them, and how long it takes to load a usable compiled expression compared to compiling it again.
+
+Run from the repository root:
+    python -m benchmarks.bench_binary_format
+"""
+import pickle
+import random
+import timeit
+
+import Calculator
+from BinaryFormat import loads_expression
+from CompiledExpression import CompiledExpression
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+NAMES = ["a", "b", "c", "d"]
+
+
+def formula(rand: random.Random, size: int) -> str:
+    """A formula of the variables with size inner operators, and some brackets, tildes and constants"""
+    terms = NAMES + ["~a", "(b-c)", "(d*2)", "0.5", "3", "17.25"]
+    expression = rand.choice(terms)
+    for _ in range(size):
+        expression += rand.choice("+-*/@&$") + rand.choice(terms)
+    return expression
+
+
+def per_call(function, number: int) -> float:
+    """The microseconds a call takes, the best of 3 rounds"""
+    return min(timeit.repeat(function, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    calc = Calculator.Calculator(cache_size=0)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    rand = random.Random(24)
+    print(f"{'operators':>9} {'pickle (B)':>11} {'binary (B)':>11} {'pickle dumps/loads (us)':>24} "
+          f"{'binary dumps/loads (us)':>24} {'compile (us)':>13} {'load (us)':>10}")
+    for size in (4, 16, 64, 256, 1024):
+        expression = formula(rand, size)
+        compiled = calc.compile(expression)
+        tree = compiled._tree
+        pickled = pickle.dumps(tree, pickle.HIGHEST_PROTOCOL)
+        data = compiled.dumps()
+        assert CompiledExpression.loads(calc, data).evaluate(a=1, b=2, c=3, d=4) == compiled.evaluate(a=1, b=2, c=3,
+                                                                                                      d=4)
+        number = max(10, 4000 // size)
+
+        pickle_dumps = per_call(lambda: pickle.dumps(tree, pickle.HIGHEST_PROTOCOL), number)
+        pickle_loads = per_call(lambda: pickle.loads(pickled), number)
+        binary_dumps = per_call(compiled.dumps, number)
+        binary_loads = per_call(lambda: loads_expression(data, calc._numeric_operators), number)
+        compile_time = per_call(lambda: calc.compile(expression), number)
+        load_time = per_call(lambda: CompiledExpression.loads(calc, data), number)
+        print(f"{size:>9} {len(pickled):>11} {len(data):>11} {pickle_dumps:>11.1f} / {pickle_loads:>10.1f} "
+              f"{binary_dumps:>11.1f} / {binary_loads:>10.1f} {compile_time:>13.1f} {load_time:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
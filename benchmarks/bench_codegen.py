@@ -0,0 +1,74 @@
+"""
+Compares three ways of evaluating the same compiled expression many times with changing variables: walking its tree
+recursively, running its program (the default "program" mode), and calling the Python function generated for it (the
+"codegen" mode). Also reports how long compiling takes in each mode, and after how many evaluations generating the
+function pays off.
+
+Run from the repository root:
+    python -m benchmarks.bench_codegen
+"""
+import random
+import timeit
+
+import Calculator
+from Variable import Variable
+from operators.Operator import Operator, Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+NAMES = ["a", "b", "c", "d"]
+
+
+def formula(rand: random.Random, size: int) -> str:
+    """A formula of the variables with size inner operators, and some brackets, tildes and constants"""
+    terms = NAMES + ["~a", "(b-c)", "(d*2)", "0.5", "3"]
+    expression = rand.choice(terms)
+    for _ in range(size):
+        expression += rand.choice("+-*/@&$") + rand.choice(terms)
+    return expression
+
+
+def walk(tree, variables: dict):
+    """Evaluates a compiled tree recursively, calling every operator"""
+    value = tree.get_value()
+    if isinstance(value, Variable):
+        return variables[value.get_name()]
+    if not isinstance(value, Operator):
+        return value
+    if tree.get_operands() is not None:
+        return value._calc_many([walk(operand, variables) for operand in tree.get_operands()])
+    left = walk(tree.get_left(), variables) if tree.has_left() else None
+    right = walk(tree.get_right(), variables) if tree.has_right() else None
+    return value._calc(left, right)
+
+
+def main():
+    calc = Calculator.Calculator(cache_size=0)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    rand = random.Random(20)
+    print(f"{'operators':>9} {'tree (us)':>10} {'program (us)':>13} {'codegen (us)':>13} {'speedup':>8} "
+          f"{'compile (us)':>13} {'codegen compile (us)':>21} {'break-even':>11}")
+    for size in (4, 16, 64, 256, 1024):
+        expression = formula(rand, size)
+        program = calc.compile(expression)
+        generated = calc.compile(expression, mode="codegen")
+        tree = program._tree
+        inputs = [{name: rand.uniform(1, 10) for name in NAMES} for _ in range(200)]
+        assert all(program.evaluate(**values) == generated.evaluate(**values) for values in inputs)
+
+        def per_evaluation(function) -> float:
+            return min(timeit.repeat(lambda: [function(values) for values in inputs], number=5, repeat=3)) / (
+                5 * len(inputs))
+
+        tree_time = per_evaluation(lambda values: walk(tree, values))
+        program_time = per_evaluation(lambda values: program.evaluate(**values))
+        codegen_time = per_evaluation(lambda values: generated.evaluate(**values))
+        compile_time = min(timeit.repeat(lambda: calc.compile(expression), number=5, repeat=3)) / 5
+        codegen_compile_time = min(timeit.repeat(lambda: calc.compile(expression, mode="codegen"),
+                                                 number=5, repeat=3)) / 5
+        break_even = (codegen_compile_time - compile_time) / max(program_time - codegen_time, 1e-12)
+        print(f"{size:>9} {tree_time * 1e6:>10.2f} {program_time * 1e6:>13.2f} {codegen_time * 1e6:>13.2f} "
+              f"{program_time / codegen_time:>7.1f}x {compile_time * 1e6:>13.1f} {codegen_compile_time * 1e6:>21.1f} "
+              f"{break_even:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compares the original DigitSum loop (multiply by 10 until the number is an integer, then peel off digits with float
+% and //) with the DigitSum operator (exact digit extraction from the text of the number), on short and long inputs.
+
+Run from the repository root:
+    python -m benchmarks.bench_digit_sum
+"""
+import math
+import timeit
+
+from operators.Operator import DigitSum
+
+INPUTS = [
+    ("small integer", 12345),
+    ("integral float", 123456789.0),
+    ("short fraction", 12.5),
+    ("0.1+0.2", 0.1 + 0.2),
+    ("1/3", 1 / 3),
+    ("1e-300", 1e-300),
+    ("1e300", 1e300),
+    ("1000!", math.factorial(1000)),
+    ("100000!", math.factorial(100000)),
+]
+
+
+def loop_digit_sum(left):
+    if left < 0:
+        return -loop_digit_sum(-left)
+    while int(left) != left:
+        left *= 10
+    res = 0
+    while left != 0:
+        res += left % 10
+        left //= 10
+    return res
+
+
+def measure(function, value) -> str:
+    try:
+        runs = 1 if isinstance(value, int) and value.bit_length() > 100000 else 200
+        seconds = min(timeit.repeat(lambda: function(value), number=runs, repeat=3)) / runs
+        return f"{seconds * 1e6:.1f}"
+    except (ArithmeticError, ValueError) as e:
+        return type(e).__name__
+
+
+def main():
+    digit_sum = DigitSum()
+    print(f"{'input':>15} {'loop (us)':>16} {'DigitSum (us)':>14}")
+    for name, value in INPUTS:
+        # The original loop is quadratic on huge integers and would run for minutes
+        loop = measure(loop_digit_sum, value) if name != "100000!" else "skipped"
+        print(f"{name:>15} {loop:>16} {measure(lambda v: digit_sum._calc(v, None), value):>14}")
+
+
+if __name__ == '__main__':
+    main()
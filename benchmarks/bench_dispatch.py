@@ -0,0 +1,149 @@
+"""
+Measures the per-character throughput of the loops that scan an expression: checking its characters, checking its
+structure, finding its last operator (the legacy parser) and tokenizing it. Compares the loops that call is_operator,
+_get_operator, get_priority and get_type for every character (with the allowed characters in a list) to the loops
+that look characters up in the calculator's operator dispatch table and character classes.
+
+Run from the repository root:
+    python -m benchmarks.bench_dispatch
+"""
+import random
+import timeit
+
+import Calculator
+from Parser import tokenize, VARIABLE_START, VARIABLE_CHARS, NUMBER, OPERATOR, SIGN, OPEN, CLOSE, VARIABLE
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+from operators.OperatorType import OperatorType
+
+
+def method_validate_characters(calc, allowed_chars: list, expression: str):
+    for char in expression:
+        if char not in allowed_chars and char not in VARIABLE_CHARS:
+            raise ValueError(char)
+
+
+def method_get_last_operator(calc, expression: str) -> int:
+    res = -1
+    min_priority = None
+    for i in range(len(expression)):
+        if calc.is_operator(expression[i]) and (
+                min_priority is None or calc._get_operator(expression[i]).get_priority() <= min_priority):
+            op = calc._get_operator(expression[i])
+            if op.get_symbol() != '-' or (
+                    i > 0 and (not calc.is_operator(expression[i - 1])
+                               or calc._get_operator(expression[i - 1]).get_type() == OperatorType.RIGHT)):
+                res = i
+                min_priority = calc._get_operator(expression[i]).get_priority()
+    return res
+
+
+def method_validate_structure(calc, expression: str):
+    ch = 0
+    while ch < len(expression):
+        if expression[ch] == '.':
+            if ch == 0 or not expression[ch - 1].isnumeric():
+                raise ValueError(ch)
+            if ch == len(expression) - 1 or not expression[ch + 1].isnumeric():
+                raise ValueError(ch)
+        elif calc.is_operator(expression[ch]):
+            op = calc._get_operator(expression[ch])
+            if op.get_type() != OperatorType.LEFT:
+                if ((ch == 0 and (op.get_symbol() != '-' or len(expression) == 1
+                                  or not (expression[1].isnumeric() or expression[1] in VARIABLE_START)))
+                        or (ch != 0 and calc.is_operator(expression[ch - 1])
+                            and op.get_symbol() != '-'
+                            and calc._get_operator(expression[ch - 1]).get_type() != OperatorType.RIGHT)):
+                    raise ValueError(ch)
+            if op.get_type() != OperatorType.RIGHT:
+                if (ch == len(expression) - 1
+                        or (calc.is_operator(expression[ch + 1])
+                            and calc._get_operator(expression[ch + 1]).get_symbol() != '-'
+                            and ((calc._get_operator(expression[ch + 1]).get_type() != OperatorType.LEFT)
+                                 or (ch == len(expression) - 2 or (calc.is_operator(expression[ch + 2])
+                                                                   and expression[ch + 2] != '-'))))):
+                    raise ValueError(ch)
+                elif (op.get_type() == OperatorType.LEFT
+                      and calc.is_operator(expression[ch + 1])
+                      and (expression[ch + 1] != '-'
+                           or ch == len(expression) - 2
+                           or calc.is_operator(expression[ch + 2]))):
+                    raise ValueError(ch)
+        ch += 1
+
+
+def method_tokenize(expression: str, operators: dict) -> list:
+    tokens = []
+    expect_operand = True
+    i = 0
+    length = len(expression)
+    while i < length:
+        char = expression[i]
+        if char == '(':
+            tokens.append((OPEN, None))
+            expect_operand = True
+            i += 1
+            continue
+        if char == ')':
+            tokens.append((CLOSE, None))
+            expect_operand = False
+            i += 1
+            continue
+
+        op = operators.get(char)
+        if op is None:
+            start = i
+            i += 1
+            if char in VARIABLE_START:
+                while i < length and expression[i] in VARIABLE_CHARS and expression[i] not in operators:
+                    i += 1
+                tokens.append((VARIABLE, expression[start:i]))
+            else:
+                while (i < length and expression[i] not in operators and expression[i] not in '()'
+                       and expression[i] not in VARIABLE_START):
+                    i += 1
+                tokens.append((NUMBER, expression[start:i]))
+            expect_operand = False
+            continue
+
+        if expect_operand and op.get_symbol() == '-':
+            tokens.append((SIGN, None))
+        else:
+            tokens.append((OPERATOR, op))
+            expect_operand = op.get_type() != OperatorType.RIGHT
+        i += 1
+    return tokens
+
+
+def random_expression(rand: random.Random, terms: int) -> str:
+    parts = []
+    for _ in range(terms):
+        term = rand.choice(["12.5", "x", "3", "~4", "5!", "rate_1", "(7-2)", "-9", "123#"])
+        parts.append(term + rand.choice("+-*/^@&$%"))
+    return "".join(parts) + "1"
+
+
+def main():
+    calc = Calculator.Calculator()
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    expression = random_expression(random.Random(10), 20_000)
+    allowed_chars = ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', '.', '(', ')'] + list(calc._operators)
+
+    loops = {
+        "characters": (lambda: method_validate_characters(calc, allowed_chars, expression),
+                       lambda: calc._validate_characters(expression)),
+        "structure": (lambda: method_validate_structure(calc, expression),
+                      lambda: calc._validate_structure(expression)),
+        "last operator": (lambda: method_get_last_operator(calc, expression),
+                          lambda: calc._get_last_operator(expression)),
+        "tokenize": (lambda: method_tokenize(expression, calc._operators),
+                     lambda: tokenize(expression, calc._operators, calc._char_classes)),
+    }
+    print(f"{len(expression)} characters")
+    print(f"{'loop':>14} {'methods (Mchar/s)':>18} {'table (Mchar/s)':>16} {'speedup':>8}")
+    for name, (method, table) in loops.items():
+        rates = [len(expression) / min(timeit.repeat(loop, number=5, repeat=3)) * 5 / 1e6 for loop in (method, table)]
+        print(f"{name:>14} {rates[0]:>18.2f} {rates[1]:>16.2f} {rates[1] / rates[0]:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
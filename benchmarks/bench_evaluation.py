@@ -0,0 +1,36 @@
+"""
+Compares evaluating an expression tree recursively (Calculator._evaluate_tree) with running the postfix program it
+compiles to.
+
+Run from the repository root:
+    python -m benchmarks.bench_evaluation
+"""
+import timeit
+
+import Calculator
+from Program import compile_tree
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+EXPRESSIONS = {
+    "short": "2^3 * 3! - -4 + (40-20+1) / (3$1)",
+    "chain of 500": "+".join(["1"] * 500),
+    "mixed of 2000": "+".join(["2*3-4/2^2@5&6"] * 200),
+}
+
+
+def main():
+    calc = Calculator.Calculator()
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+    print(f"{'expression':>14} {'tree (us)':>10} {'program (us)':>13} {'speedup':>8}")
+    for name, expression in EXPRESSIONS.items():
+        tree = calc._parse_expression_tree(calc._normalize(expression))
+        program = compile_tree(tree)
+        number = 200
+        tree_time = min(timeit.repeat(lambda: calc._evaluate_tree(tree), number=number, repeat=3)) / number
+        program_time = min(timeit.repeat(program.run, number=number, repeat=3)) / number
+        print(f"{name:>14} {tree_time * 1e6:>10.1f} {program_time * 1e6:>13.1f} {tree_time / program_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
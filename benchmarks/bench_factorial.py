@@ -0,0 +1,40 @@
+"""
+Compares the original factorial loop with the Factorial operator (a precomputed table of small factorials and a
+memoized math.factorial for larger ones), for n from 1 to 10^5.
+
+Run from the repository root:
+    python -m benchmarks.bench_factorial
+"""
+import timeit
+
+from operators.Operator import Factorial, _large_factorial
+
+NUMBERS = [1, 10, 100, 170, 1000, 10_000, 100_000]
+
+
+def loop_factorial(n: int) -> int:
+    result = 1
+    for i in range(1, n + 1):
+        result *= i
+    return result
+
+
+def measure(function, number: int) -> float:
+    repeat = 3 if number < 10_000 else 1
+    runs = 1000 if number < 10_000 else 1
+    return min(timeit.repeat(lambda: function(number), number=runs, repeat=repeat)) / runs
+
+
+def main():
+    factorial = Factorial()
+    print(f"{'n':>7} {'loop (us)':>12} {'first call (us)':>16} {'repeated (us)':>14}")
+    for n in NUMBERS:
+        loop = measure(loop_factorial, n)
+        _large_factorial.cache_clear()
+        first = measure(lambda m: (_large_factorial.cache_clear(), factorial._calc(m, None)), n)
+        repeated = measure(lambda m: factorial._calc(m, None), n)
+        print(f"{n:>7} {loop * 1e6:>12.1f} {first * 1e6:>16.1f} {repeated * 1e6:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
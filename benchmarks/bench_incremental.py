@@ -0,0 +1,74 @@
+"""
+Compares evaluating a large expression from scratch with updating an incremental expression after a single one of its
+inputs changed, on balanced random expressions of growing size and on flat sums and maximums of many inputs. An update
+only recalculates the path from the input to the root, and a wide chain is split into short chains, so its time should
+grow with the depth of the expression rather than with its size.
+
+Run from the repository root:
+    python -m benchmarks.bench_incremental
+"""
+import random
+import timeit
+
+import Calculator
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+
+def balanced_expression(rand: random.Random, depth: int, inputs: list) -> str:
+    """
+    A balanced expression in which every leaf is either a constant or an input of its own, so a single input has a
+    single path to the root
+    """
+    if depth == 0:
+        if rand.random() < 0.2:
+            return str(rand.randint(1, 9) / 10)
+        inputs.append("v" + str(len(inputs)))
+        return inputs[-1]
+    return ("(" + balanced_expression(rand, depth - 1, inputs) + rand.choice("+-*@&$") +
+            balanced_expression(rand, depth - 1, inputs) + ")")
+
+
+def flat_expression(operator: str, width: int) -> str:
+    """A single chain of an operator over width inputs, which the optimizer flattens into one node"""
+    return operator.join("v" + str(i) for i in range(width))
+
+
+def main():
+    calc = Calculator.Calculator(cache_size=0)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    rand = random.Random(18)
+    shapes = [("balanced " + str(depth), balanced_expression(rand, depth, [])) for depth in (9, 13, 16)]
+    shapes += [("flat " + operator + " " + str(width), flat_expression(operator, width))
+               for operator in "+$" for width in (1_000, 10_000, 50_000)]
+    print(f"{'shape':>14} {'nodes':>7} {'evaluate (us)':>14} {'update (us)':>12} {'recalculated':>13} {'speedup':>8}")
+    for shape, expression in shapes:
+        compiled = calc.compile(expression)
+        values = {name: rand.random() for name in compiled.get_variables()}
+        incremental = compiled.incremental(**values)
+        names = list(values)
+
+        number = 20
+        evaluate_time = min(timeit.repeat(lambda: compiled.evaluate(**values), number=number, repeat=3)) / number
+        updates = [{rand.choice(names): rand.random()} for _ in range(2000)]
+        update_time = min(timeit.repeat(lambda: [incremental.update(**update) for update in updates],
+                                        number=1, repeat=3)) / len(updates)
+
+        # The number of nodes a single update recalculates, on average
+        parents = incremental._parents
+        path_lengths = []
+        for name in names[:100]:
+            path = set()
+            stack = list(incremental._leaves[name])
+            while stack:
+                index = stack.pop()
+                if index not in path:
+                    path.add(index)
+                    stack.extend(parents[index])
+            path_lengths.append(len(path))
+
+        print(f"{shape:>14} {len(parents):>7} {evaluate_time * 1e6:>14.1f} {update_time * 1e6:>12.1f} "
+              f"{sum(path_lengths) / len(path_lengths):>13.1f} {evaluate_time / update_time:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Measures the overhead of instrumentation on compiling (with the cache disabled) and on evaluating cached expressions:
+on a calculator that was never instrumented, while it is instrumented, and after the instrumentation is removed.
+
+Run from the repository root:
+    python -m benchmarks.bench_instrumentation
+"""
+import timeit
+
+import Calculator
+from Instrumentation import Instrumentation
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+EXPRESSION = "2^x * 3! - -4 + (40-x+1) / (3$1)"
+
+
+def create_calculator(cache_size: int) -> Calculator.Calculator:
+    calc = Calculator.Calculator(cache_size=cache_size)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    return calc
+
+
+def measure(calc: Calculator.Calculator) -> float:
+    number = 2000
+    calc.evaluate_expression(EXPRESSION, x=2)
+    return min(timeit.repeat(lambda: calc.evaluate_expression(EXPRESSION, x=2), number=number, repeat=5)) / number
+
+
+def main():
+    print(f"{'':>10} {'never (us)':>11} {'on (us)':>9} {'removed (us)':>13}")
+    for name, cache_size in (("compile", 0), ("cached", 1024)):
+        calc = create_calculator(cache_size)
+        never = measure(calc)
+        calc.set_instrumentation(Instrumentation())
+        instrumented = measure(calc)
+        calc.set_instrumentation(None)
+        removed = measure(calc)
+        print(f"{name:>10} {never * 1e6:>11.2f} {instrumented * 1e6:>9.2f} {removed * 1e6:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
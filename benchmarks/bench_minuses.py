@@ -0,0 +1,60 @@
+"""
+Compares the original recursive _remove_adjacent_minuses, which recurses and copies the rest of the expression for
+every sequence of minuses, to the current single pass, as the number of sequences grows, and on a single sequence of
+10^6 minuses.
+
+Run from the repository root:
+    python -m benchmarks.bench_minuses
+"""
+import timeit
+
+import Calculator
+from operators.OperatorType import OperatorType
+
+SEQUENCES = [10, 100, 300, 900, 3000, 10_000, 100_000]
+
+
+def recursive_remove_adjacent_minuses(calc, expression: str) -> str:
+    i = 0
+    while i < len(expression) - 1:
+        if expression[i] == expression[i + 1] == '-':
+            j = i + 1
+            while j < len(expression) and expression[j] == '-':
+                j += 1
+            if (j - i) % 2 == 1:
+                return expression[:i] + '-' + recursive_remove_adjacent_minuses(calc, expression[j:])
+            elif ((i == 0 and j != len(expression)) or (i > 0 and calc.is_operator(expression[i - 1])
+                                                        and calc._get_operator(
+                        expression[i - 1]).get_type() != OperatorType.RIGHT)):
+                return expression[:i] + recursive_remove_adjacent_minuses(calc, expression[j:])
+            elif j > i + 2:
+                return expression[:i] + '--' + recursive_remove_adjacent_minuses(calc, expression[j:])
+        i += 1
+    return expression
+
+
+def measure(function, expression: str) -> str:
+    try:
+        number = 3 if len(expression) > 10_000 else 30
+        return f"{min(timeit.repeat(lambda: function(expression), number=number, repeat=3)) / number * 1e3:.3f}"
+    except RecursionError:
+        return "RecursionError"
+
+
+def main():
+    calc = Calculator.Calculator()
+    print(f"{'sequences':>10} {'recursive (ms)':>15} {'single pass (ms)':>17}")
+    for count in SEQUENCES:
+        expression = "1" + "---1" * count
+        old = measure(lambda e: recursive_remove_adjacent_minuses(calc, e), expression)
+        new = measure(calc._remove_adjacent_minuses, expression)
+        print(f"{count:>10} {old:>15} {new:>17}")
+
+    expression = "5" + "-" * 10 ** 6 + "3"
+    old = measure(lambda e: recursive_remove_adjacent_minuses(calc, e), expression)
+    new = measure(calc._remove_adjacent_minuses, expression)
+    print(f"{'10^6 in one':>10} {old:>15} {new:>17}")
+
+
+if __name__ == '__main__':
+    main()
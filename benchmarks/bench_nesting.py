@@ -0,0 +1,38 @@
+"""
+Measures how the time it takes to evaluate an expression grows with the depth of its nested brackets, with the legacy
+parser (which evaluates every pair of brackets and writes its result back into the expression string) and with the
+precedence climbing parser (which parses brackets straight into subtrees).
+
+Run from the repository root:
+    python -m benchmarks.bench_nesting
+"""
+import timeit
+
+import Calculator
+
+DEPTHS = [25, 50, 100, 200, 400]
+
+
+def nested_expression(depth: int) -> str:
+    return "(1+" * depth + "1" + ")" * depth
+
+
+def measure(calc: Calculator.Calculator, expression: str, number: int = 20) -> float:
+    return min(timeit.repeat(lambda: calc.evaluate_expression(expression), number=number, repeat=3)) / number
+
+
+def main():
+    legacy_calc = Calculator.Calculator(use_legacy_parser=True, cache_size=0)
+    calc = Calculator.Calculator(cache_size=0)
+
+    print(f"{'depth':>6} {'legacy (ms)':>12} {'per level (us)':>15} {'parser (ms)':>12} {'per level (us)':>15}")
+    for depth in DEPTHS:
+        expression = nested_expression(depth)
+        legacy = measure(legacy_calc, expression)
+        new = measure(calc, expression)
+        print(f"{depth:>6} {legacy * 1e3:>12.3f} {legacy / depth * 1e6:>15.2f} {new * 1e3:>12.3f} "
+              f"{new / depth * 1e6:>15.2f}")
+
+
+if __name__ == '__main__':
+    main()
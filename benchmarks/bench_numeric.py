@@ -0,0 +1,67 @@
+"""
+Compares the numeric backends on integer workloads: compiling and evaluating constant expressions (with the cache
+disabled, so every expression is parsed and folded), and evaluating compiled expressions with integer variables.
+The float backend converts every literal and variable to a float, and the factorials, digit sums and remainders
+convert between floats and integers, while the int backend keeps them all exact integers.
+
+Run from the repository root:
+    python -m benchmarks.bench_numeric
+"""
+import random
+import timeit
+
+import Calculator
+from NumericBackends import FLOAT, INTEGER, FRACTION, DECIMAL
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+
+def integer_expression(rand: random.Random, terms: int, names: list = None) -> str:
+    def operand() -> str:
+        if names and rand.random() < 0.5:
+            return rand.choice(names)
+        return str(rand.randint(1, 999))
+
+    parts = [operand()]
+    for _ in range(terms):
+        term = rand.choice([operand(), "(" + operand() + "%" + str(rand.randint(2, 12)) + ")!",
+                            operand() + "#", str(rand.randint(10, 40)) + "!#", operand() + "%" + operand(),
+                            "(" + operand() + "*" + operand() + ")#"])
+        parts.append(rand.choice("+-*") + term)
+    return "".join(parts)
+
+
+def create_calculator(backend: str) -> Calculator.Calculator:
+    calc = Calculator.Calculator(cache_size=0, backend=backend)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    return calc
+
+
+def main():
+    rand = random.Random(19)
+    constant = [integer_expression(rand, 20) for _ in range(50)]
+    names = ["a", "b", "c", "d"]
+    variable = [integer_expression(rand, 20, names) for _ in range(50)]
+    values = [{name: rand.randint(1, 999) for name in names} for _ in range(20)]
+
+    print(f"{'backend':>9} {'compile+evaluate (us)':>22} {'evaluate (us)':>14}")
+    baseline = None
+    for backend in (FLOAT, INTEGER, FRACTION, DECIMAL):
+        calc = create_calculator(backend)
+        compile_time = min(timeit.repeat(lambda: [calc.evaluate_expression(expression) for expression in constant],
+                                         number=3, repeat=3)) / (3 * len(constant))
+
+        # Variables are given as the kind of number the backend calculates with
+        convert = calc.get_backend().to_number
+        converted = [{name: convert(str(value)) for name, value in row.items()} for row in values]
+        compiled = [calc.compile(expression) for expression in variable]
+        evaluate_time = min(timeit.repeat(lambda: [expression.evaluate(**row) for expression in compiled
+                                                   for row in converted], number=3, repeat=3))
+        evaluate_time /= 3 * len(compiled) * len(converted)
+
+        baseline = baseline or (compile_time, evaluate_time)
+        print(f"{backend:>9} {compile_time * 1e6:>13.1f} ({baseline[0] / compile_time:>4.2f}x) "
+              f"{evaluate_time * 1e6:>7.1f} ({baseline[1] / evaluate_time:>4.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
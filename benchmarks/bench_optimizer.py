@@ -0,0 +1,40 @@
+"""
+Compares evaluating compiled expressions with and without constant folding and flattening of associative chains.
+
+Run from the repository root:
+    python -m benchmarks.bench_optimizer
+"""
+import timeit
+
+import Calculator
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+EXPRESSIONS = {
+    "sum of 1000": "+".join(["x"] * 1000),
+    "product of 1000": "*".join(["x", "1.0001"] * 500),
+    "min/max of 1000": "&".join(["x", "y"] * 250) + "$" + "$".join(["y"] * 500),
+    "constant terms": "+".join(["x*(2^10-3!)/(4@6)"] * 300),
+}
+
+
+def main():
+    calculators = {}
+    for optimize in (False, True):
+        calc = Calculator.Calculator(optimize=optimize)
+        calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+        calculators[optimize] = calc
+
+    print(f"{'expression':>16} {'plain (us)':>11} {'optimized (us)':>15} {'speedup':>8}")
+    for name, expression in EXPRESSIONS.items():
+        times = {}
+        for optimize, calc in calculators.items():
+            compiled = calc.compile(expression)
+            number = 200
+            times[optimize] = min(timeit.repeat(lambda: compiled.evaluate(x=1.5, y=2.5), number=number,
+                                                repeat=3)) / number
+        print(f"{name:>16} {times[False] * 1e6:>11.1f} {times[True] * 1e6:>15.1f} "
+              f"{times[False] / times[True]:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
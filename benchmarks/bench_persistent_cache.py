@@ -0,0 +1,58 @@
+"""
+Measures how long a freshly started calculator takes to compile a set of hot expressions: without a persistent cache,
+with an empty one (which also writes the plans), and with a warm one that already has their plans, like after a
+restart. Also measures a warm cache read by many worker processes at once.
+
+Run from the repository root:
+    python -m benchmarks.bench_persistent_cache [number of expressions]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import Calculator
+from benchmarks.bench_suite import generate
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+
+def create_calculator(path: str = None) -> Calculator.Calculator:
+    calc = Calculator.Calculator(cache_size=0, persistent_cache=path)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    return calc
+
+
+def compile_all(calc: Calculator.Calculator, expressions: list) -> float:
+    start = time.perf_counter()
+    for expression in expressions:
+        calc.compile(expression)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    # Expressions with variables, so their plans are trees rather than results
+    workloads = generate("flat_chain", count // 2, 1) + generate("deep_nesting", count // 2, 3)
+    expressions = [expression + "+x*" + str(i) for i, expression in enumerate(workloads)]
+    random.Random(23).shuffle(expressions)
+    print(f"{len(expressions)} expressions")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "plans.db")
+        uncached = compile_all(create_calculator(), expressions)
+        cold = compile_all(create_calculator(path), expressions)
+        warm = compile_all(create_calculator(path), expressions)
+        print(f"{'no persistent cache':>20} {uncached:>8.2f}s")
+        print(f"{'cold (writes plans)':>20} {cold:>8.2f}s")
+        print(f"{'warm (reads plans)':>20} {warm:>8.2f}s {uncached / warm:>6.1f}x faster")
+
+        workers = max(2, os.cpu_count() or 1)
+        start = time.perf_counter()
+        create_calculator(path).evaluate_batch([expression.replace("x", "1") for expression in expressions],
+                                               workers=workers)
+        print(f"{'warm, ' + str(workers) + ' processes':>20} {time.perf_counter() - start:>8.2f}s "
+              f"(evaluating, with the pool)")
+
+
+if __name__ == '__main__':
+    main()
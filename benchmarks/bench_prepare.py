@@ -0,0 +1,52 @@
+"""
+Compares normalizing and validating expressions with a separate pass for every step (_normalize and then _validate)
+to the single pass the calculator uses (_prepare), on short and long expressions.
+
+Run from the repository root:
+    python -m benchmarks.bench_prepare
+"""
+import random
+import timeit
+
+import Calculator
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+
+def typical_expression(rand: random.Random, terms: int) -> str:
+    parts = []
+    for _ in range(terms):
+        term = rand.choice(["12.5", "x", "3", "rate_1", "(7 - 2)", "0.25", "y", "(x + 1)"])
+        parts.append(term + " " + rand.choice("+-*/^@&$%") + " ")
+    return "".join(parts) + "1"
+
+
+def dense_expression(rand: random.Random, terms: int) -> str:
+    parts = []
+    for _ in range(terms):
+        term = rand.choice(["~4", "5!", "-9", "123#", "--x", "~-(y)"])
+        parts.append(term + rand.choice("+-*/^@&$%"))
+    return "".join(parts) + "1"
+
+
+def main():
+    calc = Calculator.Calculator()
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    rand = random.Random(11)
+    expressions = {
+        "short": "2^3 * 3! - -4 + (40-20+1) / (3$1)",
+        "typical x1000": typical_expression(rand, 1000),
+        "dense x1000": dense_expression(rand, 1000),
+    }
+
+    print(f"{'expression':>14} {'chars':>7} {'passes (us)':>12} {'single (us)':>12} {'speedup':>8}")
+    for name, expression in expressions.items():
+        number = 20000 if len(expression) < 100 else 100
+        separate = min(timeit.repeat(lambda: calc._validate(calc._normalize(expression)), number=number,
+                                     repeat=3)) / number
+        single = min(timeit.repeat(lambda: calc._prepare(expression), number=number, repeat=3)) / number
+        print(f"{name:>14} {len(expression):>7} {separate * 1e6:>12.1f} {single * 1e6:>12.1f} "
+              f"{separate / single:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
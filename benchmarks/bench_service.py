@@ -0,0 +1,97 @@
+"""
+A load generator for the evaluation service. It opens a number of connections, pipelines random expressions on each
+of them with a bounded number of requests waiting for a response, and reports the requests per second and the p50
+and p99 latencies.
+Unless a port is given, it starts the service (python main.py --serve) in a separate process first.
+
+Run from the repository root:
+    python -m benchmarks.bench_service [--requests N] [--connections N] [--depth N] [--workers N] [--port PORT]
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_batch import random_expression
+
+
+async def connection(host: str, port: int, expressions: list, depth: int, latencies: list) -> int:
+    """
+    Sends expressions on one connection, with at most depth of them waiting for a response
+    :return: the number of error responses
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    window = asyncio.Semaphore(depth)
+    sent = {}
+
+    async def send():
+        for i, expression in enumerate(expressions):
+            await window.acquire()
+            sent[i] = time.perf_counter()
+            writer.write(json.dumps({"id": i, "expression": expression}).encode() + b"\n")
+            await writer.drain()
+
+    sender = asyncio.create_task(send())
+    errors = 0
+    for _ in expressions:
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - sent.pop(response["id"]))
+        errors += "error" in response
+        window.release()
+    await sender
+    writer.close()
+    await writer.wait_closed()
+    return errors
+
+
+async def generate_load(host: str, port: int, expressions: list, connections: int, depth: int):
+    latencies = []
+    start = time.perf_counter()
+    errors = await asyncio.gather(*(connection(host, port, expressions[i::connections], depth, latencies)
+                                    for i in range(connections)))
+    seconds = time.perf_counter() - start
+
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f"{len(latencies)} requests on {connections} connections, pipeline depth {depth}, "
+          f"{sum(errors)} error responses")
+    print(f"{len(latencies) / seconds:.0f} requests/s, p50 {percentiles[49] * 1000:.2f} ms, "
+          f"p99 {percentiles[98] * 1000:.2f} ms, max {max(latencies) * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--depth", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes of the started service")
+    parser.add_argument("--threads", action="store_true", help="start the service with worker threads")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None, help="the port of a service that is already running")
+    args = parser.parse_args()
+
+    rand = random.Random(15)
+    expressions = [random_expression(rand) for _ in range(args.requests)]
+    server = None
+    port = args.port
+    if port is None:
+        command = [sys.executable, "main.py", "--serve", args.host + ":0"]
+        if args.workers is not None:
+            command += ["--workers", str(args.workers)]
+        if args.threads:
+            command.append("--threads")
+        server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+        port = int(server.stdout.readline().rpartition(":")[2])
+    try:
+        asyncio.run(generate_load(args.host, port, expressions, args.connections, args.depth))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
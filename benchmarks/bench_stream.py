@@ -0,0 +1,50 @@
+"""
+Measures the throughput of the streaming command line evaluator on a file of random expressions, in both output
+formats, and checks that the memory it uses does not grow with the size of the file.
+
+Run from the repository root:
+    python -m benchmarks.bench_stream [number of expressions]
+"""
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+import Calculator
+import StreamEvaluator
+from benchmarks.bench_batch import random_expression
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+
+def run(calc, path: str, output_format: str):
+    with open(path, encoding="utf-8", newline="", buffering=1 << 20) as input_file, \
+            open(os.devnull, "w", encoding="utf-8", buffering=1 << 20) as output_file:
+        return StreamEvaluator.evaluate_stream(calc, input_file, output_file, output_format, keep_going=True)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rand = random.Random(14)
+    # Without the compile cache, which would hold on to the expressions it has seen
+    calc = Calculator.Calculator(cache_size=0)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'expressions':>12} {'format':>7} {'seconds':>9} {'expressions/s':>14} {'peak KiB':>9}")
+        for size in (count // 10, count):
+            path = os.path.join(directory, "expressions.txt")
+            with open(path, "w", encoding="utf-8") as file:
+                file.writelines(random_expression(rand) + "\n" for _ in range(size))
+            for output_format in (StreamEvaluator.PLAIN, StreamEvaluator.JSONL):
+                summary = run(calc, path, output_format)
+                # Tracing allocations slows everything down, so the memory is measured on a separate run
+                tracemalloc.start()
+                run(calc, path, output_format)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"{summary.expressions:>12} {output_format:>7} {summary.seconds:>9.2f} "
+                      f"{summary.expressions / summary.seconds:>14.0f} {peak / 1024:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Compares compiling and evaluating a batch of expressions with and without sharing identical subtrees (see
+SubtreeTable). The expressions are made of a small pool of subexpressions, some of them constant and some of them of
+the variables, which repeat inside every expression and across the batch. Reports the memory the compiled
+expressions take, and the time it takes to compile them and to evaluate all of them.
+
+Run from the repository root:
+    python -m benchmarks.bench_subtrees [number of expressions]
+"""
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+import Calculator
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+
+def subexpressions(rand: random.Random, count: int) -> list:
+    """A pool of small subexpressions of the variables x and y"""
+    pool = []
+    for _ in range(count):
+        terms = [rand.choice(["x", "y", "(x+1)", "(y-2)", "~x"]) if rand.random() < 0.7 else str(rand.randint(1, 9))
+                 for _ in range(rand.randint(2, 4))]
+        pool.append("(" + "".join(term + rand.choice("*/@&$") for term in terms[:-1]) + terms[-1] + ")")
+    return pool
+
+
+def expression(rand: random.Random, pool: list) -> str:
+    terms = [rand.choice(pool) for _ in range(rand.randint(10, 30))]
+    return "".join(term + rand.choice("+-") for term in terms[:-1]) + terms[-1]
+
+
+def create_calculator(share_subtrees: bool, count: int) -> Calculator.Calculator:
+    calc = Calculator.Calculator(cache_size=count, share_subtrees=share_subtrees)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    return calc
+
+
+def measure_memory(share_subtrees: bool, expressions: list) -> int:
+    """The bytes the compiled expressions take. Measured apart from the times, since tracing slows allocations down."""
+    calc = create_calculator(share_subtrees, len(expressions))
+    gc.collect()
+    tracemalloc.start()
+    compiled = [calc.compile(expression) for expression in expressions]
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del compiled
+    return memory
+
+
+def measure_times(share_subtrees: bool, expressions: list) -> tuple:
+    calc = create_calculator(share_subtrees, len(expressions))
+    start = time.perf_counter()
+    compiled = [calc.compile(expression) for expression in expressions]
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for x in range(1, 6):
+        results = [expression.evaluate(x=x * 0.7, y=x + 0.5) for expression in compiled]
+    evaluate_time = time.perf_counter() - start
+    return compile_time, evaluate_time, results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    rand = random.Random(22)
+    pool = subexpressions(rand, 40)
+    expressions = [expression(rand, pool) for _ in range(count)]
+    print(f"{count} expressions, {len(pool)} distinct subexpressions")
+    print(f"{'subtrees':>9} {'memory (MiB)':>13} {'compile (s)':>12} {'evaluate x5 (s)':>16}")
+    measured = {}
+    for share_subtrees in (False, True):
+        compile_time, evaluate_time, results = measure_times(share_subtrees, expressions)
+        memory = measure_memory(share_subtrees, expressions)
+        measured[share_subtrees] = (memory, evaluate_time, results)
+        print(f"{'shared' if share_subtrees else 'copied':>9} {memory / 2 ** 20:>13.1f} {compile_time:>12.2f} "
+              f"{evaluate_time:>16.2f}")
+    assert measured[False][2] == measured[True][2]
+    print(f"memory saved: {1 - measured[True][0] / measured[False][0]:.0%}, "
+          f"evaluation time saved: {1 - measured[True][1] / measured[False][1]:.0%}")
+
+
+if __name__ == '__main__':
+    main()
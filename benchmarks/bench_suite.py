@@ -0,0 +1,243 @@
+"""
+A benchmark suite of seeded workloads, which measures every phase of compiling and evaluating an expression on its
+own: normalization, validation, both of them fused (the way Calculator.compile does them), parsing, optimization and
+evaluation. For every workload and phase it reports the operations per second, and the memory an operation allocates
+at its peak.
+The results can be saved as a JSON baseline, and a later run can be compared against it: the run fails if a phase got
+slower, or allocates more, than the threshold allows. Speeds are only comparable on the same machine, so baselines
+should be saved where they are compared.
+
+Run from the repository root:
+    python -m benchmarks.bench_suite [--quick] [--workload NAME ...] [--save FILE] [--compare FILE]
+                                     [--threshold FRACTION]
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import Calculator
+from BatchEvaluation import EXPRESSION_ERRORS
+from Optimizer import optimize_tree
+from Program import compile_tree
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+INNER_OPERATORS = "+-*/^@&$%"
+
+
+def flat_chain(rand: random.Random, scale: int) -> str:
+    """A long chain of numbers with inner operators and no brackets"""
+    return str(rand.randint(1, 9)) + "".join(rand.choice("+-*/") + str(rand.randint(1, 99))
+                                             for _ in range(scale * 50))
+
+
+def deep_nesting(rand: random.Random, scale: int) -> str:
+    """Brackets nested scale * 10 deep, with an operation at every level"""
+    depth = scale * 10
+    opening = "".join("(" + str(rand.randint(1, 9)) + rand.choice("+*") for _ in range(depth))
+    closing = "".join(")" + rand.choice("+-") + str(rand.randint(1, 9)) for _ in range(depth))
+    return opening + "1" + closing
+
+
+def minus_runs(rand: random.Random, scale: int) -> str:
+    """Terms separated by long runs of minuses and whitespaces, which normalization collapses"""
+    return str(rand.randint(1, 99)) + "".join(
+        rand.choice("+-*") + " " + "-" * rand.randint(1, 40) + " " + str(rand.randint(1, 99))
+        for _ in range(scale * 10))
+
+
+def factorials(rand: random.Random, scale: int) -> str:
+    """Many factorials and digit sums, including stacked ones that create large integers"""
+    terms = []
+    for _ in range(scale * 10):
+        term = str(rand.randint(0, 12)) + "!"
+        for _ in range(rand.randint(0, 2)):
+            term += rand.choice(["#", "!#", "#!"])
+        terms.append(term)
+    return "+".join(terms)
+
+
+def custom_operators(rand: random.Random, scale: int) -> str:
+    """A mix of every operator, with sign minuses, tildes and brackets"""
+    expression = str(rand.randint(1, 9))
+    for _ in range(scale * 20):
+        term = rand.choice([str(rand.randint(1, 9)), str(rand.randint(0, 6)) + "!", "~" + str(rand.randint(1, 9)),
+                            "-" + str(rand.randint(1, 9)), str(rand.randint(10, 999)) + "#",
+                            "(" + str(rand.randint(1, 9)) + rand.choice(INNER_OPERATORS) + str(rand.randint(1, 9)) +
+                            ")"])
+        expression += rand.choice(INNER_OPERATORS) + term
+    return expression
+
+
+WORKLOADS = {
+    "flat_chain": flat_chain,
+    "deep_nesting": deep_nesting,
+    "minus_runs": minus_runs,
+    "factorials": factorials,
+    "custom_operators": custom_operators,
+}
+
+
+def generate(name: str, count: int, scale: int) -> list:
+    """
+    Generates the expressions of a workload, the same ones on every run
+    :param name: the name of the workload
+    :param count: the number of expressions
+    :param scale: how large the expressions are
+    :return: the list of expressions
+    """
+    rand = random.Random(name)
+    return [WORKLOADS[name](rand, scale) for _ in range(count)]
+
+
+def phases(calc: Calculator.Calculator, expressions: list) -> dict:
+    """
+    Prepares the input of every phase from the output of the phase before it, so each one is measured on its own
+    :return: a dict of the name of every phase to a tuple of its function and its inputs
+    """
+    normalized = [calc._normalize(expression) for expression in expressions]
+    trees = [calc._parse_expression_tree(expression) for expression in normalized]
+    # Evaluation runs the program of the unoptimized tree, since the optimizer folds constant expressions completely
+    programs = [compile_tree(tree) for tree in trees]
+    return {
+        "normalize": (calc._normalize, expressions),
+        "validate": (calc._validate, normalized),
+        "prepare": (calc._prepare, expressions),
+        "parse": (calc._parse_expression_tree, normalized),
+        "optimize": (optimize_tree, trees),
+        "evaluate": (lambda program: program.run(), programs),
+    }
+
+
+def _call(function, argument):
+    try:
+        function(argument)
+    except EXPRESSION_ERRORS:
+        pass
+
+
+def measure_speed(function, inputs: list, min_time: float, rounds: int = 3) -> float:
+    """
+    Measures the operations per second of a phase, as the best of a few rounds
+    :param function: the phase
+    :param inputs: the inputs of the phase
+    :param min_time: the minimal number of seconds all the rounds take together
+    :param rounds: the number of rounds
+    :return: the number of operations per second
+    """
+    best = 0.0
+    for _ in range(rounds):
+        operations = 0
+        start = time.perf_counter()
+        while True:
+            for argument in inputs:
+                _call(function, argument)
+            operations += len(inputs)
+            seconds = time.perf_counter() - start
+            if seconds >= min_time / rounds:
+                break
+        best = max(best, operations / seconds)
+    return best
+
+
+def measure_memory(function, inputs: list) -> float:
+    """
+    Measures the memory a phase allocates at its peak
+    :param function: the phase
+    :param inputs: the inputs of the phase
+    :return: the average number of bytes allocated at the peak of an operation
+    """
+    total = 0
+    tracemalloc.start()
+    try:
+        for argument in inputs:
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            _call(function, argument)
+            total += tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+    return total / len(inputs)
+
+
+def run_suite(workloads: list, count: int, scale: int, min_time: float) -> dict:
+    """
+    Runs the benchmarks of workloads
+    :return: a dict of workloads to dicts of phases to their ops_per_sec and bytes_per_op
+    """
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10_000))
+    calc = Calculator.Calculator(cache_size=0)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    results = {}
+    for name in workloads:
+        results[name] = {}
+        for phase, (function, inputs) in phases(calc, generate(name, count, scale)).items():
+            results[name][phase] = {"ops_per_sec": measure_speed(function, inputs, min_time),
+                                    "bytes_per_op": measure_memory(function, inputs)}
+            print(f"{name:>17} {phase:>9} {results[name][phase]['ops_per_sec']:>12.1f} "
+                  f"{results[name][phase]['bytes_per_op'] / 1024:>12.1f}", flush=True)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compares the results of a run against a baseline
+    :param results: the results of the run
+    :param baseline: the results of the baseline
+    :param threshold: the fraction by which a phase may be slower or allocate more than in the baseline
+    :return: descriptions of the phases that regressed past the threshold
+    """
+    regressions = []
+    for name, workload in results.items():
+        for phase, result in workload.items():
+            base = baseline.get(name, {}).get(phase)
+            if base is None:
+                continue
+            if result["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+                regressions.append(f"{name} {phase}: {result['ops_per_sec']:.1f} ops/s, baseline "
+                                   f"{base['ops_per_sec']:.1f} ops/s")
+            if result["bytes_per_op"] > base["bytes_per_op"] * (1 + threshold):
+                regressions.append(f"{name} {phase}: {result['bytes_per_op']:.0f} bytes/op, baseline "
+                                   f"{base['bytes_per_op']:.0f} bytes/op")
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks every phase of the calculator on seeded workloads")
+    parser.add_argument("--workload", action="append", choices=list(WORKLOADS),
+                        help="a workload to run (all of them by default)")
+    parser.add_argument("--quick", action="store_true", help="fewer and smaller expressions and shorter rounds")
+    parser.add_argument("--save", metavar="FILE", help="save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="fail if a phase regressed compared to a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="the fraction by which a phase may regress (0.2 by default)")
+    args = parser.parse_args(argv)
+
+    workloads = args.workload or list(WORKLOADS)
+    count, scale, min_time = (5, 2, 0.3) if args.quick else (20, 5, 1.5)
+    print(f"{'workload':>17} {'phase':>9} {'ops/s':>12} {'KiB/op':>12}")
+    results = run_suite(workloads, count, scale, min_time)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "quick": args.quick,
+                       "results": results}, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline.get("quick") != args.quick:
+            print("The baseline was measured with different sizes (--quick)", file=sys.stderr)
+            return 2
+        regressions = compare(results, baseline["results"], args.threshold)
+        for regression in regressions:
+            print("REGRESSION " + regression, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
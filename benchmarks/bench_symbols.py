@@ -0,0 +1,116 @@
+"""
+Measures how the number of registered operators affects tokenizing and compiling, with operators whose symbols are
+longer than a character and named functions. The same expressions are tokenized and compiled by calculators with
+more and more generated operators, up to hundreds of them. Compares the tokenizer, which matches symbols with a trie,
+to a loop that tries every registered symbol, longest first, at every position of the expression.
+
+Run from the repository root:
+    python -m benchmarks.bench_symbols
+"""
+import itertools
+import random
+import timeit
+
+import Calculator
+from Parser import tokenize
+from operators.Operator import Operator, Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum, \
+    MinimumFunction, MaximumFunction
+from operators.OperatorType import OperatorType
+
+# The characters of the generated inner operators and the letters of the generated functions, which the expressions
+# never use
+SYMBOL_CHARS = "<>=|?:;[]{}"
+NAME_CHARS = "abcdefghijklmnopqrstuvwxyz"
+
+
+class DoubleStar(Power):
+    def get_symbol(self) -> str:
+        return '**'
+
+
+class Mod(Modulo):
+    def get_symbol(self) -> str:
+        return 'mod'
+
+
+class Generated(Operator):
+    """A generated inner operator or function, which is registered but never used by the expressions"""
+    def __init__(self, symbol: str, operator_type: OperatorType):
+        self._symbol = symbol
+        self._operator_type = operator_type
+
+    def _calc(self, left, right):
+        return left
+
+    def get_symbol(self) -> str:
+        return self._symbol
+
+    def get_priority(self) -> int:
+        return 5
+
+    def get_type(self) -> OperatorType:
+        return self._operator_type
+
+
+def generated_operators(count: int) -> list:
+    """count operators: half inner operators with 2 or 3 characters long symbols, half functions with names"""
+    symbols = itertools.chain(itertools.product(SYMBOL_CHARS, repeat=2), itertools.product(SYMBOL_CHARS, repeat=3))
+    names = itertools.product(NAME_CHARS, repeat=2)
+    operators = [Generated("".join(next(symbols)), OperatorType.INNER) for _ in range(count // 2)]
+    functions = [Generated("fn" + "".join(next(names)), OperatorType.FUNCTION) for _ in range(count - count // 2)]
+    return operators + functions
+
+
+def create_calculator(extra: int) -> Calculator.Calculator:
+    calc = Calculator.Calculator(cache_size=0)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum(),
+                        DoubleStar(), Mod(), MinimumFunction(), MaximumFunction()] + generated_operators(extra))
+    return calc
+
+
+def random_expression(rand: random.Random, terms: int) -> str:
+    parts = []
+    for _ in range(terms):
+        term = rand.choice(["12.5", "x", "3", "~4", "5!", "rate_1", "(7-2)", "max(x,2,rate_1)", "min(3,x)", "123#"])
+        parts.append(term + rand.choice(["+", "-", "*", "/", "**", "mod", "@", "$"]))
+    return "".join(parts) + "1"
+
+
+def method_match_symbols(expression: str, symbols: list, operators: dict) -> int:
+    """Finds the symbols of an expression by trying every symbol at every position, and returns how many it found"""
+    found = 0
+    i = 0
+    length = len(expression)
+    while i < length:
+        for symbol in symbols:
+            if expression.startswith(symbol, i) and (
+                    operators[symbol].get_type() != OperatorType.FUNCTION or
+                    expression.startswith('(', i + len(symbol))):
+                found += 1
+                i += len(symbol)
+                break
+        else:
+            i += 1
+    return found
+
+
+def main():
+    expression = random_expression(random.Random(25), 5_000)
+    expressions = [random_expression(random.Random(seed), 20) for seed in range(200)]
+    print(f"{len(expression)} characters to tokenize, {len(expressions)} expressions to compile")
+    print(f"{'operators':>9} {'every symbol (Mchar/s)':>23} {'trie (Mchar/s)':>15} {'compile (expr/s)':>17}")
+    for extra in (0, 50, 200, 400, 800):
+        calc = create_calculator(extra)
+        symbols = sorted(calc._operators, key=len, reverse=True)
+        operators, classes, trie = calc._operators, calc._char_classes, calc._trie
+        naive = len(expression) / min(timeit.repeat(lambda: method_match_symbols(expression, symbols, operators),
+                                                    number=1, repeat=3)) / 1e6
+        rate = len(expression) / min(timeit.repeat(lambda: tokenize(expression, operators, classes, trie),
+                                                   number=5, repeat=5)) * 5 / 1e6
+        compile_rate = len(expressions) / min(timeit.repeat(lambda: [calc.compile(e) for e in expressions],
+                                                            number=1, repeat=5))
+        print(f"{len(calc._operators):>9} {naive:>23.2f} {rate:>15.2f} {compile_rate:>17.0f}")
+
+
+if __name__ == '__main__':
+    main()
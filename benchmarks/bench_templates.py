@@ -0,0 +1,51 @@
+"""
+Compares evaluating a batch expression by expression with evaluating it grouped by templates, on batches in which
+every template (the structure of an expression without its number literals) is shared by a different number of
+expressions: from every template being used once to every template being used a thousand times.
+
+Run from the repository root:
+    python -m benchmarks.bench_templates [number of expressions]
+"""
+import random
+import sys
+import time
+
+import Calculator
+from BatchEvaluation import split_template
+from benchmarks.bench_batch import random_expression
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+
+def fill(template: tuple, rand: random.Random) -> str:
+    """An expression of a template, with new random literals"""
+    return template[0] + "".join(str(rand.randint(1, 9)) + part for part in template[1:])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    calc = Calculator.Calculator()
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    print(f"{count} expressions")
+    print(f"{'per template':>13} {'templates':>10} {'one by one (s)':>15} {'templates (s)':>14} {'speedup':>8}")
+    for reuse in (1, 10, 100, 1000):
+        rand = random.Random(reuse)
+        templates = [split_template(random_expression(rand))[0] for _ in range(max(1, count // reuse))]
+        expressions = [fill(rand.choice(templates), rand) for _ in range(count)]
+
+        calc.clear_cache()
+        start = time.perf_counter()
+        expected = calc.evaluate_batch(expressions, workers=1)
+        one_by_one = time.perf_counter() - start
+
+        calc.clear_cache()
+        start = time.perf_counter()
+        results = calc.evaluate_batch(expressions, workers=1, templates=True)
+        grouped = time.perf_counter() - start
+
+        assert [str(result) for result in results] == [str(result) for result in expected]
+        print(f"{reuse:>13} {len(set(templates)):>10} {one_by_one:>15.2f} {grouped:>14.2f} "
+              f"{one_by_one / grouped:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Measures with tracemalloc the memory held by 100k cached compiled expressions, and compares the memory of their
+expression trees made of Tree nodes (which have __slots__) with the same trees made of nodes with a __dict__, like
+Tree used to have.
+
+Run from the repository root:
+    python -m benchmarks.bench_tree_memory
+"""
+import gc
+import random
+import tracemalloc
+
+import Calculator
+from Tree import Tree
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+COUNT = 100_000
+
+
+class DictTree:
+    """
+    The expression tree node as it was before it had __slots__
+    """
+
+    def __init__(self, value, left=None, right=None, operands=None):
+        self._left = left
+        self._right = right
+        self._value = value
+        self._operands = operands
+
+
+def random_expression(rand: random.Random) -> str:
+    terms = [rand.choice(["x", "y", "z", str(rand.randint(1, 1000))]) for _ in range(rand.randint(3, 8))]
+    expression = terms[0]
+    for term in terms[1:]:
+        expression += rand.choice("+-*/^@&$%") + term
+    return "(" + expression + ")" + rand.choice(["", "#", "*~x"])
+
+
+def copy_tree(tree: Tree, node_class):
+    copies = {}
+    for node in tree.iter_postorder():
+        operands = node.get_operands()
+        copies[id(node)] = node_class(node.get_value(), copies.get(id(node.get_left())),
+                                      copies.get(id(node.get_right())),
+                                      None if operands is None else [copies[id(operand)] for operand in operands])
+    return copies[id(tree)]
+
+
+def measure(build) -> tuple:
+    """
+    :return: the result of build and the memory it allocated and still holds, in bytes
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    rand = random.Random(9)
+    expressions = [random_expression(rand) for _ in range(COUNT)]
+    calc = Calculator.Calculator(cache_size=COUNT, optimize=False)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+    _, cache_memory = measure(lambda: [calc.compile(expression) for expression in expressions])
+    trees = [compiled._tree for compiled in calc._cache.values()]
+    nodes = sum(1 for tree in trees for _ in tree.iter_postorder())
+    print(f"{calc.cache_info().currsize} cached expressions, {nodes} tree nodes")
+    print(f"{'whole cache':>22}: {cache_memory / 2 ** 20:8.1f} MiB")
+
+    for name, node_class in (("trees with __dict__", DictTree), ("trees with __slots__", Tree)):
+        _, memory = measure(lambda: [copy_tree(tree, node_class) for tree in trees])
+        print(f"{name:>22}: {memory / 2 ** 20:8.1f} MiB, {memory / nodes:6.1f} bytes per node")
+
+
+if __name__ == '__main__':
+    main()
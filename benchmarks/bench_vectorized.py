@@ -0,0 +1,42 @@
+"""
+Compares evaluating a compiled expression row by row with evaluating it once over NumPy arrays.
+
+Run from the repository root:
+    python -m benchmarks.bench_vectorized
+"""
+import time
+
+import numpy as np
+
+import Calculator
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+EXPRESSION = "(price * quantity - discount) / quantity ^ 0.5 + (quantity % 7)! & 100"
+ROWS = [1_000, 10_000, 100_000]
+
+
+def main():
+    calc = Calculator.Calculator()
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    compiled = calc.compile(EXPRESSION)
+    rand = np.random.default_rng(1234)
+
+    print(f"{'rows':>8} {'row by row (ms)':>16} {'vectorized (ms)':>16} {'speedup':>8}")
+    for rows in ROWS:
+        arrays = {"price": rand.uniform(1, 100, rows), "quantity": rand.integers(1, 50, rows).astype(float),
+                  "discount": rand.uniform(0, 10, rows)}
+        columns = [array.tolist() for array in arrays.values()]
+
+        start = time.perf_counter()
+        for price, quantity, discount in zip(*columns):
+            compiled.evaluate(price=price, quantity=quantity, discount=discount)
+        row_by_row = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compiled.evaluate_vectorized(**arrays)
+        vectorized = time.perf_counter() - start
+        print(f"{rows:>8} {row_by_row * 1e3:>16.1f} {vectorized * 1e3:>16.2f} {row_by_row / vectorized:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,112 @@
+import argparse
+import asyncio
+import io
+import sys
+
 import Calculator
+import EvaluationService
+import NumericBackends
+import StreamEvaluator
+from CalculatorExceptions import CalculatorInputError
 from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
 
-if __name__ == '__main__':
-    calc = Calculator.Calculator()
+# Large buffers for streams of expressions, so they are read and written in few system calls
+_BUFFER_SIZE = 1 << 20
+
+
+def create_calculator(backend: str = NumericBackends.FLOAT) -> Calculator.Calculator:
+    """
+    Creates a calculator with all the operators
+    :param backend: the name of the numeric backend to calculate with
+    :return: the calculator
+    """
+    calc = Calculator.Calculator(backend=backend)
     calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
-    calc.print_allowed_chars()
+    return calc
+
+
+def _parse_args(argv: list | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Evaluates mathematical expressions. Without an input file, reads "
+                                                 "expressions interactively.")
+    parser.add_argument("input", nargs="?", help="a file of newline-delimited expressions, or - for the standard input")
+    parser.add_argument("-o", "--output", help="the file to write the results to (the standard output by default)")
+    parser.add_argument("--backend", choices=list(NumericBackends.BACKENDS), default=NumericBackends.FLOAT,
+                        help="the kind of numbers to calculate with")
+    parser.add_argument("--format", choices=[StreamEvaluator.PLAIN, StreamEvaluator.JSONL],
+                        default=StreamEvaluator.PLAIN, help="write a plain line or a JSON object for every expression")
+    parser.add_argument("--serve", metavar="[HOST:]PORT",
+                        help="run a JSON Lines evaluation service on a TCP port instead (0 for any free port)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="the number of worker processes (1 for files and the number of CPUs for the service by "
+                             "default)")
+    parser.add_argument("--chunksize", type=int, default=1000,
+                        help="the number of expressions sent to a worker and written at once")
+    parser.add_argument("--keep-going", action="store_true",
+                        help="continue after an expression that cannot be evaluated")
+    parser.add_argument("--summary", action="store_true", help="print the throughput to the standard error at the end")
+    parser.add_argument("--threads", action="store_true", help="evaluate in worker threads instead of processes")
+    parser.add_argument("--timeout", type=float, default=10.0,
+                        help="the number of seconds after which the service gives up on an expression")
+    parser.add_argument("--max-in-flight", type=int, default=64,
+                        help="the maximum number of expressions the service evaluates at once")
+    return parser.parse_args(argv)
+
+
+def _serve(calc: Calculator.Calculator, args: argparse.Namespace) -> int:
+    host, _, port = args.serve.rpartition(":")
+    try:
+        port = int(port)
+        asyncio.run(EvaluationService.serve(
+            calc, host or "127.0.0.1", port, workers=args.workers, use_threads=args.threads,
+            max_in_flight=args.max_in_flight, timeout=args.timeout,
+            on_start=lambda address: print("Serving on " + address[0] + ":" + str(address[1]), flush=True)))
+    except (ValueError, CalculatorInputError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        pass
+    return 0
 
-    while True:
-        calc.evaluate_expression_from_input()
+
+def main(argv: list | None = None) -> int:
+    """
+    Runs the calculator from the command line
+    :param argv: the command line arguments (sys.argv[1:] by default)
+    :return: the exit code, 1 if some of the expressions could not be evaluated
+    """
+    args = _parse_args(argv)
+    calc = create_calculator(args.backend)
+    if hasattr(sys, "set_int_max_str_digits"):
+        # Results like large factorials have more digits than Python converts to text by default
+        sys.set_int_max_str_digits(0)
+    if args.serve is not None:
+        return _serve(calc, args)
+    if args.input is None:
+        calc.print_allowed_chars()
+        while True:
+            calc.evaluate_expression_from_input()
+
+    workers = 1 if args.workers is None else args.workers
+    if workers < 1 or args.chunksize < 1:
+        print("The number of workers and the chunk size must be positive", file=sys.stderr)
+        return 2
+
+    if args.input == "-":
+        input_file = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    else:
+        input_file = open(args.input, encoding="utf-8", newline="", buffering=_BUFFER_SIZE)
+    if args.output is None:
+        output_file = io.TextIOWrapper(io.BufferedWriter(sys.stdout.buffer, _BUFFER_SIZE), encoding="utf-8")
+    else:
+        output_file = open(args.output, "w", encoding="utf-8", buffering=_BUFFER_SIZE)
+
+    with input_file, output_file:
+        summary = StreamEvaluator.evaluate_stream(calc, input_file, output_file, args.format, workers,
+                                                  args.chunksize, args.keep_going)
+    if args.summary:
+        print(summary, file=sys.stderr)
+    return 1 if summary.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
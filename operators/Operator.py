@@ -1,8 +1,20 @@
+import decimal
+import functools
+import math
 from abc import abstractmethod
+from fractions import Fraction
 
 from CalculatorExceptions import CalculationError, OperatorError
 from operators.OperatorType import OperatorType
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for vectorized calculations
+    np = None
+
+# All the types of numbers a calculator can calculate with (see NumericBackends)
+NUMERIC_TYPES = (float, int, Fraction, decimal.Decimal)
+
 
 class Operator:
     """
@@ -29,6 +41,99 @@ class Operator:
             raise OperatorError("Operator" + self.get_symbol() + " is missing a right operand")
         return self._calc(left_operand, right_operand)
 
+    def get_numeric_types(self) -> tuple:
+        """
+        Gets the types of numbers the operator calculates correctly. A calculator whose numeric backend produces other
+        types of numbers converts them to floats before passing them to the operator. Operators only support floats
+        unless they override this method.
+        :return: a tuple of the supported types, out of float, int, Fraction and Decimal
+        """
+        return (float,)
+
+    def is_pure(self) -> bool:
+        """
+        Checks whether the result of the operator only depends on its operands, so it can be calculated once when an
+        expression is compiled (see optimize_tree) and results of expressions that only use pure operators can be kept
+        (see PersistentCache). Operators are not pure unless they override this method.
+        :return: True if the operator always gives the same result for the same operands, False otherwise
+        """
+        return False
+
+    def is_associative(self) -> bool:
+        """
+        Checks whether the operator is associative, which allows the calculator to apply it on a whole chain of
+        operands at once with _calc_many instead of one pair at a time. Operators are not associative unless they
+        override this method.
+        :return: True if (a op b) op c always equals a op (b op c), False otherwise
+        """
+        return False
+
+    def _calc_many(self, operands: list) -> float:
+        """
+        Calculates the value after applying an associative operation on a chain of operands. By default, the operation
+        is applied on every pair of operands from left to right.
+        :param operands: the operands, from left to right
+        :raises CalculationError: if there has been an error while tempting to calculate
+        :return: the result of the operation
+        """
+        result = operands[0]
+        for operand in operands[1:]:
+            result = self._calc(result, operand)
+        return result
+
+    def get_arity(self) -> tuple:
+        """
+        Gets the numbers of arguments a function (an operator of type FUNCTION) can be called with. Functions accept
+        any number of arguments, but at least one, unless they override this method.
+        :return: a tuple of the minimal number of arguments and the maximal one, or None if there is no maximum
+        """
+        return 1, None
+
+    def calc_vectorized(self, left_operand, right_operand) -> tuple:
+        """
+        Applies the operation element-wise on NumPy arrays of operands. Operators that do not implement
+        _calc_vectorized are calculated by calling _calc on every element.
+        :param left_operand: an array of left operands, or None if the operator does not use a left operand
+        :param right_operand: an array of right operands, or None if the operator does not use a right operand
+        :return: a tuple of the array of results and a boolean array that marks the elements that could not be
+            calculated (or None if all of them could)
+        """
+        result = self._calc_vectorized(left_operand, right_operand)
+        if result is NotImplemented:
+            return self._calc_elementwise(left_operand, right_operand)
+        return result
+
+    def _calc_vectorized(self, left, right):
+        """
+        Operators may override this method to calculate the operation on whole NumPy arrays of operands at once.
+        :param left: an array of left operands, or None if the operator does not use a left operand
+        :param right: an array of right operands, or None if the operator does not use a right operand
+        :return: a tuple of the array of results and a boolean array that marks the elements that could not be
+            calculated (or None if all of them could), or NotImplemented if the operator does not support it
+        """
+        return NotImplemented
+
+    def _calc_elementwise(self, left, right) -> tuple:
+        """
+        Calculates the operation on NumPy arrays of operands by calling _calc on every pair of elements
+        :param left: an array of left operands, or None if the operator does not use a left operand
+        :param right: an array of right operands, or None if the operator does not use a right operand
+        :return: a tuple of the array of results and a boolean array that marks the elements that could not be
+            calculated
+        """
+        shape = np.broadcast_shapes(*[np.shape(operand) for operand in (left, right) if operand is not None])
+        lefts = np.broadcast_to(left, shape).ravel().tolist() if left is not None else [None] * math.prod(shape)
+        rights = np.broadcast_to(right, shape).ravel().tolist() if right is not None else [None] * math.prod(shape)
+        result = np.empty(len(lefts))
+        invalid = np.zeros(len(lefts), dtype=bool)
+        for i in range(len(lefts)):
+            try:
+                result[i] = self._calc(lefts[i], rights[i])
+            except (CalculationError, ArithmeticError, ValueError):
+                result[i] = math.nan
+                invalid[i] = True
+        return result.reshape(shape), invalid.reshape(shape)
+
     @abstractmethod
     def _calc(self, left: float | None, right: float | None) -> float:
         """
@@ -44,7 +149,8 @@ class Operator:
     @abstractmethod
     def get_symbol(self) -> str:
         """
-        Gets the char symbol representing the operator
+        Gets the symbol representing the operator: a single character, or a longer symbol like ** or a name like mod
+        (see Calculator.add_operator). The symbol of a function is its name.
         :return: the symbol
         """
         pass
@@ -68,6 +174,9 @@ class Operator:
 
         RIGHT: The operator should be to the right of a single operand, and it applies the operation on it
 
+        FUNCTION: The operator is a named function, applied with _calc_many on the list of arguments in brackets after
+        its name, like max(1, 2, 3). A call is an operand, so the priority of a function is never compared.
+
         :return: the type of the operator
         """
         pass
@@ -89,6 +198,35 @@ class Plus(Operator):
         """
         return left + right
 
+    def _calc_vectorized(self, left, right):
+        return left + right, None
+
+    def get_numeric_types(self) -> tuple:
+        return NUMERIC_TYPES
+
+    def is_associative(self) -> bool:
+        return True
+
+    def _calc_many(self, operands: list) -> float:
+        """
+        Calculates the sum of all the operands, rounded only once. Without floats the sum is already exact.
+        With infinities or nans, or numbers too large for fsum, the operands are added one by one like + adds them,
+        since fsum raises on them instead.
+        :param operands: the operands
+        :return: the result of the operation
+        """
+        if any(isinstance(operand, float) for operand in operands):
+            try:
+                if all(map(math.isfinite, operands)):
+                    return math.fsum(operands)
+            except OverflowError:
+                # An operand or a partial sum is too large for a float
+                pass
+        return sum(operands)
+
+    def is_pure(self) -> bool:
+        return True
+
     def get_symbol(self) -> str:
         return '+'
 
@@ -115,6 +253,15 @@ class Minus(Operator):
         """
         return left - right
 
+    def _calc_vectorized(self, left, right):
+        return left - right, None
+
+    def get_numeric_types(self) -> tuple:
+        return NUMERIC_TYPES
+
+    def is_pure(self) -> bool:
+        return True
+
     def get_symbol(self) -> str:
         return '-'
 
@@ -141,6 +288,26 @@ class Multiply(Operator):
         """
         return left * right
 
+    def _calc_vectorized(self, left, right):
+        return left * right, None
+
+    def get_numeric_types(self) -> tuple:
+        return NUMERIC_TYPES
+
+    def is_associative(self) -> bool:
+        return True
+
+    def _calc_many(self, operands: list) -> float:
+        """
+        Calculates the product of all the operands
+        :param operands: the operands
+        :return: the result of the operation
+        """
+        return math.prod(operands)
+
+    def is_pure(self) -> bool:
+        return True
+
     def get_symbol(self) -> str:
         return '*'
 
@@ -164,12 +331,26 @@ class Divide(Operator):
         :param left: the left operand
         :param right: the right operand
         :raises CalculationError: if the right operand is 0
-        :return: the result of the operation
+        :return: the result of the operation. The quotient of integers that divide exactly is an integer.
         """
         if right == 0:
             raise CalculationError("Cannot divide by 0")
+        if type(left) is int and type(right) is int:
+            quotient, remainder = divmod(left, right)
+            if remainder == 0:
+                return quotient
         return left / right
 
+    def _calc_vectorized(self, left, right):
+        invalid = right == 0
+        return left / np.where(invalid, 1, right), invalid
+
+    def get_numeric_types(self) -> tuple:
+        return NUMERIC_TYPES
+
+    def is_pure(self) -> bool:
+        return True
+
     def get_symbol(self) -> str:
         return '/'
 
@@ -187,6 +368,10 @@ class Power(Operator):
         Priority: 3
         Type: INNER
     """
+    # The largest exact power (of integers or fractions) the operator calculates, in bits, so a single calculation
+    # cannot take too long. Larger powers are calculated with floats.
+    MAX_EXACT_BITS = 1 << 21
+
     def _calc(self, base: float | None, exponent: float | None) -> float:
         """
         Calculates the result of the left operand raised to the power of the right operand
@@ -200,8 +385,26 @@ class Power(Operator):
             raise CalculationError("Cannot calculate the root of a negative number")
         if base == 0 and exponent < 0:
             raise CalculationError("Cannot calculate 0 to the power of a none-positive number")
+        if isinstance(base, (int, Fraction)) and isinstance(exponent, (int, Fraction)) and exponent.denominator == 1:
+            bits = max(base.numerator.bit_length(), base.denominator.bit_length())
+            if bits > 1 and abs(exponent) * bits > Power.MAX_EXACT_BITS:
+                base = float(base)
         return base ** exponent
 
+    def _calc_vectorized(self, base, exponent):
+        invalid = ((base < 0) & (-1 < exponent) & (exponent < 1)) | ((base == 0) & (exponent < 0))
+        result = np.power(base, exponent)
+        # Negative numbers raised to fractions and results too large for a float cannot be calculated either
+        invalid |= np.isnan(result) & ~np.isnan(base) & ~np.isnan(exponent)
+        invalid |= np.isinf(result) & np.isfinite(base) & np.isfinite(exponent)
+        return result, invalid
+
+    def get_numeric_types(self) -> tuple:
+        return NUMERIC_TYPES
+
+    def is_pure(self) -> bool:
+        return True
+
     def get_symbol(self) -> str:
         return '^'
 
@@ -224,10 +427,24 @@ class Modulo(Operator):
         Calculates the remainder of the result of the calculation of division between the left and right operand
         :param left: the one being divided
         :param right: the divider
+        :raises CalculationError: if the right operand is 0
         :return: the result of the operation
         """
+        if right == 0:
+            raise CalculationError("Cannot calculate the remainder of division by 0")
         return left % right
 
+    def _calc_vectorized(self, left, right):
+        invalid = right == 0
+        return np.mod(left, np.where(invalid, 1, right)), invalid
+
+    def get_numeric_types(self) -> tuple:
+        # The remainder of a Decimal has the sign of the dividend instead of the divider
+        return float, int, Fraction
+
+    def is_pure(self) -> bool:
+        return True
+
     def get_symbol(self) -> str:
         return '%'
 
@@ -252,7 +469,19 @@ class Average(Operator):
         :param right: the right operand
         :return: the result of the calculation
         """
-        return (left + right) / 2
+        total = left + right
+        if type(total) is int and total % 2 == 0:
+            return total // 2
+        return total / 2
+
+    def _calc_vectorized(self, left, right):
+        return (left + right) / 2, None
+
+    def get_numeric_types(self) -> tuple:
+        return NUMERIC_TYPES
+
+    def is_pure(self) -> bool:
+        return True
 
     def get_symbol(self) -> str:
         return '@'
@@ -282,6 +511,26 @@ class Minimum(Operator):
             return left
         return right
 
+    def _calc_vectorized(self, left, right):
+        return np.where(left < right, left, right), None
+
+    def get_numeric_types(self) -> tuple:
+        return NUMERIC_TYPES
+
+    def is_associative(self) -> bool:
+        return True
+
+    def _calc_many(self, operands: list) -> float:
+        """
+        Calculates the minimal operand
+        :param operands: the operands
+        :return: the result of the operation
+        """
+        return min(operands)
+
+    def is_pure(self) -> bool:
+        return True
+
     def get_symbol(self) -> str:
         return '&'
 
@@ -310,6 +559,26 @@ class Maximum(Operator):
             return left
         return right
 
+    def _calc_vectorized(self, left, right):
+        return np.where(left > right, left, right), None
+
+    def get_numeric_types(self) -> tuple:
+        return NUMERIC_TYPES
+
+    def is_associative(self) -> bool:
+        return True
+
+    def _calc_many(self, operands: list) -> float:
+        """
+        Calculates the maximal operand
+        :param operands: the operands
+        :return: the result of the operation
+        """
+        return max(operands)
+
+    def is_pure(self) -> bool:
+        return True
+
     def get_symbol(self) -> str:
         return '$'
 
@@ -320,6 +589,40 @@ class Maximum(Operator):
         return OperatorType.INNER
 
 
+class MinimumFunction(Minimum):
+    """
+    Extends the class minimum, calculates the minimum of its arguments: min(3, 1, 2)
+        Symbol: min
+        Priority: 7
+        Type: FUNCTION
+    """
+    def get_symbol(self) -> str:
+        return 'min'
+
+    def get_priority(self) -> int:
+        return 7
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.FUNCTION
+
+
+class MaximumFunction(Maximum):
+    """
+    Extends the class maximum, calculates the maximum of its arguments: max(3, 1, 2)
+        Symbol: max
+        Priority: 7
+        Type: FUNCTION
+    """
+    def get_symbol(self) -> str:
+        return 'max'
+
+    def get_priority(self) -> int:
+        return 7
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.FUNCTION
+
+
 class Negative(Operator):
     """
     Extends the class operator, changes the sign of the operand to its right
@@ -336,6 +639,15 @@ class Negative(Operator):
         """
         return -right
 
+    def _calc_vectorized(self, unused, right):
+        return -right, None
+
+    def get_numeric_types(self) -> tuple:
+        return NUMERIC_TYPES
+
+    def is_pure(self) -> bool:
+        return True
+
     def get_symbol(self) -> str:
         return '~'
 
@@ -353,23 +665,41 @@ class Factorial(Operator):
         Priority: 6
         Type: RIGHT
     """
-    def _calc(self, left: float | None, unused: float | None) -> float:
+    # The largest number whose factorial the operator calculates, so a single calculation cannot take too long
+    MAX_OPERAND = 100000
+
+    def _calc(self, left: float | None, unused: float | None) -> int:
         """
-        Calculates the factorial of the operand to its left
+        Calculates the factorial of the operand to its left. The result is an exact integer, which only turns into a
+        float when it is used by another operation.
         :param left: the operator to its left
         :param unused: not in use since there is no right operand
-        :raises CalculationError: if the left operator is not an integer
+        :raises CalculationError: if the left operator is not an integer or is larger than MAX_OPERAND
         :return: the result of the operation
         """
         if left < 0:
             return -self._calc(-left, unused)
-        op = int(left)
-        if op != left:
+        if left > Factorial.MAX_OPERAND:
+            raise CalculationError("Can only calculate the factorial of numbers up to " + str(Factorial.MAX_OPERAND))
+        if math.isnan(left) or int(left) != left:
             raise CalculationError("Can only calculate the factorial of an integer!")
-        result = 1
-        for i in range(1, op + 1):
-            result *= i
-        return result
+        op = int(left)
+        if op < len(_SMALL_FACTORIALS):
+            return _SMALL_FACTORIALS[op]
+        return _large_factorial(op)
+
+    def _calc_vectorized(self, left, unused):
+        operand = np.abs(left)
+        # Factorials of numbers above 170 are too large for a float
+        invalid = ~(operand == np.floor(operand)) | (operand > 170)
+        result = _float_factorials()[np.where(invalid, 0, operand).astype(np.int64)]
+        return np.where(left < 0, -result, result), invalid
+
+    def get_numeric_types(self) -> tuple:
+        return NUMERIC_TYPES
+
+    def is_pure(self) -> bool:
+        return True
 
     def get_symbol(self) -> str:
         return '!'
@@ -388,24 +718,54 @@ class DigitSum(Operator):
         Priority: 6
         Type: RIGHT
     """
-    def _calc(self, left: float | None, unused: float | None) -> float:
-        """
-        Calculates the sum of the digits of the left operator
+    def _calc(self, left: float | None, unused: float | None) -> int:
+        """
+        Calculates the sum of the digits of the left operator.
+        The digits of an integer are its exact decimal digits, even if it is too large for a float. A float with a
+        fraction usually has no short exact decimal value (0.1+0.2 is really 0.3000000000000000444089209850062616169452
+        66723632812...), so its digits are those of the shortest decimal number that converts back to the same float,
+        which is how Python prints it: the digit sum of 0.1+0.2 is the digit sum of 0.30000000000000004, which is 7.
+        Either way the digits are extracted in time proportional to their number, without any float arithmetic.
         :param left: the left operator
         :param unused: not in use since there is no right operand
+        :raises CalculationError: if the left operator is infinite or not a number
         :return: the sum of the digits. If the operator is negative it will return minus the sum of the digits.
         """
+        if isinstance(left, int):
+            return -_integer_digit_sum(-left) if left < 0 else _integer_digit_sum(left)
+        if not math.isfinite(left):
+            raise CalculationError("Can only calculate the digit sum of a finite number!")
         if left < 0:
             return -self._calc(-left, unused)
-
-        while int(left) != left:
-            left *= 10
-
-        res = 0
-        while left != 0:
-            res += left % 10
-            left //= 10
-        return res
+        if left.is_integer():
+            return _integer_digit_sum(int(left))
+        # The exponent of a small number, like the 5 in 1.5e-05, is not one of its digits
+        return _sum_digits(repr(left).partition('e')[0])
+
+    def _calc_vectorized(self, left, unused):
+        operand = np.abs(left)
+        # Integers up to 2^53 are exact in a float, so their digits can be peeled off with float arithmetic
+        integer = (operand == np.floor(operand)) & (operand < 2 ** 53)
+        remaining = np.where(integer, operand, 0)
+        result = np.zeros(np.shape(operand))
+        while np.any(remaining != 0):
+            result += remaining % 10
+            remaining //= 10
+        invalid = ~np.isfinite(operand)
+
+        # Numbers with a fraction and huge integers are rare enough to calculate one by one
+        others = ~integer & ~invalid
+        if np.any(others):
+            other_results, other_invalid = self._calc_elementwise(operand[others], None)
+            result[others] = other_results
+            invalid[others] = other_invalid
+        return np.where(left < 0, -result, result), invalid
+
+    def get_numeric_types(self) -> tuple:
+        return float, int
+
+    def is_pure(self) -> bool:
+        return True
 
     def get_symbol(self) -> str:
         return '#'
@@ -415,3 +775,85 @@ class DigitSum(Operator):
 
     def get_type(self) -> OperatorType:
         return OperatorType.RIGHT
+
+
+def _sum_digits(text: str) -> int:
+    """
+    Sums the decimal digits of the text of a non-negative number, ignoring its decimal point
+    :param text: the text of the number, without a sign or an exponent
+    :return: the sum of the digits
+    """
+    digits = text.replace('.', '').encode('ascii')
+    # The code of every digit character is the digit plus the code of '0'
+    return sum(digits) - ord('0') * len(digits)
+
+
+def _integer_digit_sum(n: int) -> int:
+    """
+    Calculates the sum of the decimal digits of a non-negative integer.
+    Python limits the length of the integers it converts to text, and converts long ones in quadratic time, so an
+    integer longer than 4096 bits is converted through the decimal module instead: it is split in halves of bits
+    which are converted separately and combined by decimal multiplication, which is fast for long numbers.
+    :param n: the integer
+    :return: the sum of its digits
+    """
+    if n < 2 ** 64:
+        # Short integers are summed fastest with integer arithmetic
+        total = 0
+        while n:
+            n, digit = divmod(n, 10)
+            total += digit
+        return total
+    if n.bit_length() <= 4096:
+        return _sum_digits(str(n))
+
+    context = decimal.Context(prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN)
+    powers = {}
+
+    def to_decimal(m: int, bits: int) -> decimal.Decimal:
+        if bits <= 4096:
+            return decimal.Decimal(m)
+        low_bits = bits // 2
+        high = m >> low_bits
+        if low_bits not in powers:
+            powers[low_bits] = context.power(decimal.Decimal(2), low_bits)
+        return context.add(context.multiply(to_decimal(high, bits - low_bits), powers[low_bits]),
+                           to_decimal(m - (high << low_bits), low_bits))
+
+    return _sum_digits(str(to_decimal(n, n.bit_length())))
+
+
+def _small_factorials() -> list:
+    """
+    Calculates the factorials of 0 to 170, the largest factorial that fits in a float
+    :return: the list of factorials
+    """
+    factorials = [1]
+    for i in range(1, 171):
+        factorials.append(factorials[-1] * i)
+    return factorials
+
+
+_SMALL_FACTORIALS = _small_factorials()
+_float_factorials_array = None
+
+
+@functools.lru_cache(maxsize=64)
+def _large_factorial(n: int) -> int:
+    """
+    Calculates the factorial of a number that is not in the table of small factorials. Recent results are memoized.
+    :param n: the number
+    :return: the factorial of the number
+    """
+    return math.factorial(n)
+
+
+def _float_factorials():
+    """
+    Gets the factorials of 0 to 170 as a NumPy array of floats
+    :return: the array of factorials
+    """
+    global _float_factorials_array
+    if _float_factorials_array is None:
+        _float_factorials_array = np.array(_SMALL_FACTORIALS, dtype=float)
+    return _float_factorials_array
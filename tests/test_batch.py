@@ -0,0 +1,137 @@
+import pickle
+import random
+
+import pytest
+
+import Calculator
+from BatchEvaluation import split_template
+from CalculatorExceptions import CalculationError, CalculatorInputError
+from operators.Operator import Operator, Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+from operators.OperatorType import OperatorType
+
+calc = Calculator.Calculator()
+calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+
+class Hypotenuse(Operator):
+    def _calc(self, left, right):
+        return (left ** 2 + right ** 2) ** 0.5
+
+    def get_symbol(self) -> str:
+        return '|'
+
+    def get_priority(self) -> int:
+        return 4
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.INNER
+
+
+class Broken(Operator):
+    """An operator that raises an error the calculator does not know for a left operand of 13"""
+    def _calc(self, left, right):
+        if left == 13:
+            raise KeyError(left)
+        return left + right
+
+    def get_symbol(self) -> str:
+        return '|'
+
+    def get_priority(self) -> int:
+        return 4
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.INNER
+
+
+def test_results_in_order():
+    expressions = [str(i) + "*2" for i in range(100)]
+    assert calc.evaluate_batch(expressions, workers=2, chunksize=7) == [i * 2 for i in range(100)]
+
+
+def test_errors_are_results():
+    results = calc.evaluate_batch(["1+1", "2^", "1/0", "4!", "1 + (2"], workers=2, chunksize=1)
+    assert results[0] == 2 and results[3] == 24
+    assert isinstance(results[1], CalculatorInputError)
+    assert isinstance(results[2], CalculationError)
+    assert isinstance(results[4], CalculatorInputError) and results[4].offset == 4
+
+
+def test_other_errors_are_results():
+    broken = Calculator.Calculator(cache_size=0)
+    broken.add_operator(Broken())
+    for workers in (1, 2):
+        results = broken.evaluate_batch(["1|2", "13|1", "3|4"], workers=workers, chunksize=3)
+        assert results[0] == 3 and results[2] == 7
+        assert isinstance(results[1], KeyError)
+
+
+def test_custom_operator():
+    custom_calc = Calculator.Calculator(cache_size=0)
+    custom_calc.add_operator(Hypotenuse())
+    assert custom_calc.evaluate_batch(["3|4", "5|12"], workers=2) == [5, 13]
+
+
+def test_single_worker_in_process():
+    expressions = ["2^10", "~3!", "5@", "(7$2)#"]
+    results = calc.evaluate_batch(expressions, workers=1)
+    assert [str(result) for result in results] == [str(result) for result in calc.evaluate_batch(expressions)]
+
+
+def test_invalid_workers():
+    with pytest.raises(CalculatorInputError):
+        calc.evaluate_batch(["1"], workers=0)
+
+
+def test_pickled_calculator():
+    copy = pickle.loads(pickle.dumps(calc))
+    assert copy.evaluate_expression("2^3 * 3! - -4 + (40-20+1) / (3$1)") == 59
+    assert copy.cache_info().maxsize == calc.cache_info().maxsize
+
+
+def _comparable(result):
+    return (type(result), str(result), getattr(result, "offset", None))
+
+
+def test_templates_match_evaluate():
+    rand = random.Random(21)
+    shapes = ["(a+b)*c^2", "a - -b / c", "-a^b + c!", "(a$b)&-c", "a@b % c", "-(a) - b#", "a / (b - c)"]
+    expressions = []
+    for _ in range(600):
+        expression = rand.choice(shapes)
+        for name in "abc":
+            expression = expression.replace(name, rand.choice(["0", "2", "3", "1.5", "10", "007", "-4"]), 1)
+        expressions.append(expression)
+    expressions += ["1.2.3", "2 3 + 1", "x + 1", "1 + (2", "", "2x"]
+    results = calc.evaluate_batch(expressions, workers=1, templates=True)
+    expected = calc.evaluate_batch(expressions, workers=1)
+    assert [_comparable(result) for result in results] == [_comparable(result) for result in expected]
+
+
+def test_templates_isolate_other_errors():
+    # A negative base raised to a fraction is complex, and comparing it raises a TypeError
+    expressions = ["-3#^-(4.25)^3/--~10@-0", "-5#^-(2)^3/--~10@-1", "-6#^-(2)^3/--~10@-1"]
+    results = calc.evaluate_batch(expressions, workers=1, templates=True)
+    expected = calc.evaluate_batch(expressions, workers=1)
+    assert isinstance(results[0], TypeError)
+    assert [_comparable(result) for result in results] == [_comparable(result) for result in expected]
+
+    broken = Calculator.Calculator(cache_size=0)
+    broken.add_operator(Broken())
+    # Large enough to be evaluated with a generated function
+    expressions = [str(i) + "|1" for i in range(100)]
+    results = broken.evaluate_batch(expressions, workers=1, templates=True)
+    assert isinstance(results[13], KeyError)
+    assert results[:13] + results[14:] == [i + 1 for i in range(100) if i != 13]
+
+
+def test_templates_group_literals():
+    template, literals = split_template("(2 + 3.5)*x1 - -40")
+    assert literals == ["2", "3.5", "40"]
+    assert template == split_template("(7+1.0)*x1--9")[0]
+    assert template != split_template("(7+1.0)*x2--9")[0]
+
+
+def test_templates_in_processes():
+    expressions = [str(i) + "*2+" + str(i % 3) for i in range(300)]
+    assert calc.evaluate_batch(expressions, workers=2, templates=True) == [i * 2 + i % 3 for i in range(300)]
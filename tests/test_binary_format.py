@@ -0,0 +1,108 @@
+import decimal
+import pickle
+import random
+from fractions import Fraction
+
+import pytest
+
+import Calculator
+from BinaryFormat import MAGIC, encode_tree, decode_tree
+from CalculatorExceptions import CalculatorInputError
+from CompiledExpression import CompiledExpression
+from Tree import Tree
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+OPERATORS = [Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()]
+
+calc = Calculator.Calculator()
+calc.add_operators(OPERATORS)
+
+
+def test_round_trip():
+    rand = random.Random(24)
+    parts = ["x", "y", "(x+1)", "(y$x)", "~x", "(x*y-2)", "3!", "(2@x)", "0.25", "1000000", "(y%3)", "12#"]
+    for _ in range(200):
+        expression = rand.choice(parts)
+        for _ in range(rand.randint(1, 12)):
+            expression += rand.choice("+-*/&$") + rand.choice(parts)
+        compiled = calc.compile(expression)
+        loaded = CompiledExpression.loads(calc, compiled.dumps())
+        assert loaded.get_expression() == compiled.get_expression()
+        values = {"x": rand.uniform(-5, 5), "y": rand.uniform(1, 5)}
+        assert loaded.evaluate(**values) == compiled.evaluate(**values)
+        assert CompiledExpression.loads(calc, compiled.dumps(), mode="codegen").evaluate(**values) == \
+            compiled.evaluate(**values)
+
+
+def test_smaller_than_pickle():
+    compiled = calc.compile("(x+1)*y^2 - 3! + 2$x&y - 0.1*x*y*7")
+    assert len(compiled.dumps()) * 4 < len(pickle.dumps(compiled._tree))
+
+
+@pytest.mark.parametrize("value", [1.5, 3.0, -7.0, -0.0, 2.0 ** 60, float("inf"), float("nan"), 10 ** 30,
+                                   -10 ** 1000, Fraction(-1, 3), decimal.Decimal("1.10"), complex(1.5, -0.25)])
+def test_numbers_round_trip(value):
+    decoded = decode_tree(encode_tree(Tree(value)), {}).get_value()
+    assert type(decoded) is type(value) and repr(decoded) == repr(value)
+
+
+def test_folded_complex_numbers():
+    # The optimizer folds the power of a negative number into a complex constant
+    for expression in ("(0-2)^(0-2.5)", "x + (0-8)^1.5"):
+        compiled = calc.compile(expression)
+        for mode in ("program", "codegen"):
+            loaded = CompiledExpression.loads(calc, compiled.dumps(), mode=mode)
+            assert loaded.evaluate(x=1) == compiled.evaluate(x=1)
+
+
+def test_backends():
+    for backend in ("fraction", "decimal", "int"):
+        calculator = Calculator.Calculator(backend=backend, optimize=False)
+        calculator.add_operators(OPERATORS)
+        compiled = calculator.compile("1/3 + x*2.5 - 7%4")
+        loaded = CompiledExpression.loads(calculator, compiled.dumps())
+        assert loaded.evaluate(x=4) == compiled.evaluate(x=4)
+
+
+def test_shared_subtrees_stay_shared():
+    shared = Calculator.Calculator(share_subtrees=True)
+    compiled = shared.compile("(x*2+1)*(x*2+1)/(x*2+1)")
+    unshared = Calculator.Calculator().compile("(x*2+1)*(x*2+1)/(x*2+1)")
+    assert len(compiled.dumps()) < len(unshared.dumps())
+    tree = CompiledExpression.loads(Calculator.Calculator(), compiled.dumps())._tree
+    assert tree.get_left().get_left() is tree.get_left().get_right() is tree.get_right()
+
+
+def test_legacy_brackets():
+    legacy = Calculator.Calculator(use_legacy_parser=True)
+    compiled = legacy.compile("(2+3)*4")
+    assert compiled._tree is None
+    assert CompiledExpression.loads(legacy, compiled.dumps()).evaluate() == 20
+    with pytest.raises(CalculatorInputError):
+        CompiledExpression.loads(legacy, compiled.dumps(), mode="codegen")
+
+
+def test_zero_copy_buffers():
+    data = calc.compile("x$2+1").dumps()
+    buffer = bytearray(b"header" + data)
+    view = memoryview(buffer)[len(b"header"):]
+    assert CompiledExpression.loads(calc, view).evaluate(x=5) == 6
+    # Loading released its own view, so the buffer can change size again
+    view.release()
+    buffer += b"more"
+
+
+def test_invalid_data():
+    data = calc.compile("x$2+1.5").dumps()
+    for length in range(len(data)):
+        with pytest.raises(CalculatorInputError):
+            CompiledExpression.loads(calc, data[:length])
+    invalid = [b"XX" + data[2:], MAGIC + bytes([99]) + data[3:], data + b"\0", "text"]
+    for value in invalid:
+        with pytest.raises(CalculatorInputError):
+            CompiledExpression.loads(calc, value)
+    # The calculator has no $ operator
+    with pytest.raises(CalculatorInputError):
+        CompiledExpression.loads(Calculator.Calculator(), data)
+    with pytest.raises(CalculatorInputError):
+        CompiledExpression.loads(calc, data, mode="interpreted")
@@ -0,0 +1,143 @@
+import math
+import random
+
+import pytest
+
+import Calculator
+import CompiledExpression
+from BinaryFormat import dumps_expression
+from CalculatorExceptions import CalculationError, CalculatorInputError
+from Instrumentation import Instrumentation, EVALUATE
+from Tree import Tree
+from operators.Operator import Operator, Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+from operators.OperatorType import OperatorType
+
+calc = Calculator.Calculator()
+calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+
+def _outcome(compiled, **variables):
+    # Negative numbers raised to fractions outside of (-1, 1) are complex, which later operators may not compare
+    try:
+        return compiled.evaluate(**variables)
+    except (CalculationError, CalculatorInputError, TypeError) as e:
+        return type(e), str(e)
+
+
+def _same(first, second) -> bool:
+    if isinstance(first, float) and isinstance(second, float) and math.isnan(first):
+        return math.isnan(second)
+    return first == second and type(first) is type(second)
+
+
+def test_matches_program():
+    rand = random.Random(20)
+    terms = ["x", "y", "~x", "y!", "x#", "2", "0", "(x-y)", "(y^0.5)", "(x%y)", "(0-x)"]
+    for _ in range(300):
+        expression = rand.choice(terms)
+        for _ in range(rand.randint(1, 8)):
+            expression += rand.choice("+-*/^@&$%") + rand.choice(terms)
+        program = calc.compile(expression)
+        generated = calc.compile(expression, mode="codegen")
+        for x, y in [(3.0, 4.0), (-2.5, 0.0), (0.0, -1.0), (7, 2), (-8, 3)]:
+            assert _same(_outcome(program, x=x, y=y), _outcome(generated, x=x, y=y)), expression
+
+
+def test_inlined_operators():
+    source = calc.compile("x+y*2-x/y^3%y", mode="codegen").get_source()
+    assert "v0 + " in source or " + v0" in source
+    assert "CalculationError('Cannot divide by 0')" in source
+    assert calc.compile("x+y").get_source() is None
+
+
+def test_chains():
+    # A flattened sum is rounded once, like in the program
+    expression = "+".join("x" + str(i) for i in range(30)) + "+0.1+0.2"
+    values = {"x" + str(i): 0.1 * i for i in range(30)}
+    assert calc.compile(expression, mode="codegen").evaluate(**values) == calc.compile(expression).evaluate(**values)
+    assert calc.compile("x&y&3&z", mode="codegen").evaluate(x=5, y=-1, z=2) == -1
+    assert calc.compile("x$y$3$z", mode="codegen").evaluate(x=5, y=-1, z=2) == 5
+    assert calc.compile("x*y*3*z", mode="codegen").evaluate(x=5, y=-1, z=2) == -30
+
+
+def test_errors():
+    with pytest.raises(CalculationError, match="divide by 0"):
+        calc.compile("x/(y-y)", mode="codegen").evaluate(x=1, y=2)
+    with pytest.raises(CalculationError, match="root of a negative"):
+        calc.compile("x^0.5", mode="codegen").evaluate(x=-4)
+    with pytest.raises(CalculationError, match="none-positive"):
+        calc.compile("x^-1", mode="codegen").evaluate(x=0)
+    with pytest.raises(CalculationError, match="too large"):
+        calc.compile("x^y", mode="codegen").evaluate(x=10.0, y=1000.0)
+    with pytest.raises(CalculatorInputError, match="Missing a value"):
+        calc.compile("x+y", mode="codegen").evaluate(x=1)
+    with pytest.raises(CalculatorInputError, match="Unknown compilation mode"):
+        calc.compile("1+2", mode="native")
+
+
+def test_custom_operators_are_called():
+    class Hypot(Operator):
+        def _calc(self, left, right):
+            return math.hypot(left, right)
+
+        def get_symbol(self) -> str:
+            return '?'
+
+        def get_priority(self) -> int:
+            return 2
+
+        def get_type(self) -> OperatorType:
+            return OperatorType.INNER
+
+    custom = Calculator.Calculator()
+    custom.add_operator(Hypot())
+    compiled = custom.compile("x?y+1", mode="codegen")
+    assert compiled.evaluate(x=3, y=4) == 6
+    assert "x?y" not in compiled.get_source()
+
+
+def test_cached_separately():
+    calculator = Calculator.Calculator()
+    program = calculator.compile("x+1")
+    generated = calculator.compile("x+1", mode="codegen")
+    assert program is not generated
+    assert calculator.compile("x + 1", mode="codegen") is generated
+    assert calculator.compile("x+1") is program
+
+
+@pytest.mark.parametrize("backend", ["int", "fraction", "decimal"])
+def test_backends(backend):
+    # Without the optimizer, so the constant expressions are calculated by the generated code
+    calculator = Calculator.Calculator(optimize=False, backend=backend)
+    calculator.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    for expression in ["2^70/2^69+3!", "7/2+1@2", "(10%3)*4#", "2^0.5"]:
+        assert _same(calculator.compile(expression, mode="codegen").evaluate(),
+                     calculator.compile(expression).evaluate()), expression
+
+
+def test_legacy_parser():
+    legacy = Calculator.Calculator(use_legacy_parser=True)
+    assert legacy.compile("1+2*3", mode="codegen").evaluate() == 7
+    with pytest.raises(CalculatorInputError):
+        legacy.compile("(1+2)*3", mode="codegen")
+
+
+def test_instrumented():
+    instrumentation = Instrumentation()
+    calculator = Calculator.Calculator()
+    with calculator.instrumented(instrumentation):
+        assert calculator.compile("x*2", mode="codegen").evaluate(x=3) == 6
+    assert instrumentation.get_phase_stats()[EVALUATE].calls == 1
+
+
+def test_checked_without_a_program(monkeypatch):
+    def compile_tree(*args, **kwargs):
+        raise AssertionError("A program was compiled")
+    monkeypatch.setattr(CompiledExpression, "compile_tree", compile_tree)
+    assert calc.compile("x*2+1", mode="codegen").evaluate(x=3) == 7
+    # Loaded trees are not checked by the parser, so generating the code checks their operands
+    plus = calc._numeric_operators['+']
+    for tree in (Tree(plus, left=Tree(1)), Tree(plus, right=Tree(1)), Tree(Factorial(), left=Tree(3), right=Tree(1))):
+        data = dumps_expression("1+", tree)
+        with pytest.raises(CalculatorInputError):
+            CompiledExpression.CompiledExpression.loads(calc, data, mode="codegen")
@@ -0,0 +1,53 @@
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculatorInputError
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+
+def new_calculator(cache_size: int = 1024) -> Calculator.Calculator:
+    calc = Calculator.Calculator(cache_size=cache_size)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    return calc
+
+
+def test_compile_evaluate():
+    compiled = new_calculator().compile("2^3 * 3! - -4 + (40-20+1) / (3$1)")
+    assert compiled.evaluate() == 59
+    assert compiled.evaluate() == 59
+
+
+def test_cache_hits_on_normalized_expression():
+    calc = new_calculator()
+    assert calc.evaluate_expression("5 --- 6") == -1
+    assert calc.evaluate_expression("5-6") == -1
+    assert calc.compile("5\t-\n6") is calc.compile("5-6")
+    info = calc.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (3, 1, 1)
+
+
+def test_cache_eviction():
+    calc = new_calculator(cache_size=2)
+    first = calc.compile("1+1")
+    calc.compile("1+2")
+    calc.compile("1+1")
+    calc.compile("1+3")
+    assert calc.compile("1+1") is first
+    assert calc.cache_info().evictions == 1
+    assert calc.cache_info().currsize == 2
+
+
+def test_disabled_cache():
+    calc = new_calculator(cache_size=0)
+    assert calc.compile("1+1") is not calc.compile("1+1")
+    assert calc.cache_info().currsize == 0
+
+
+def test_add_operator_invalidates_cache():
+    calc = Calculator.Calculator()
+    with pytest.raises(CalculatorInputError):
+        calc.evaluate_expression("2^3")
+    calc.compile("1+1")
+    calc.add_operator(Power())
+    assert calc.cache_info().currsize == 0
+    assert calc.evaluate_expression("2^3") == 8
@@ -0,0 +1,48 @@
+import math
+
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculationError
+from operators.Operator import Power, Factorial, DigitSum
+
+calc = Calculator.Calculator()
+calc.add_operators([Power(), Factorial(), DigitSum()])
+
+
+def test_integers():
+    assert calc.evaluate_expression("123#") == 6
+    assert calc.evaluate_expression("0#") == 0
+    assert calc.evaluate_expression("-4095#") == -18
+    assert DigitSum()._calc(10 ** 20 - 1, None) == 180
+
+
+def test_fractions():
+    assert calc.evaluate_expression("12.5#") == 8
+    assert calc.evaluate_expression("-0.75#") == -12
+
+
+def test_non_terminating_fraction():
+    # 0.1+0.2 is printed as 0.30000000000000004, and those are the digits that are summed
+    assert calc.evaluate_expression("(0.1+0.2)#") == 7
+    assert calc.evaluate_expression("(1/3)#") == 48
+
+
+def test_small_fraction():
+    assert DigitSum()._calc(1.5e-07, None) == 6
+
+
+def test_huge_integer():
+    # 3000! is too long for Python to convert to a string by default
+    remaining, expected = math.factorial(3000), 0
+    while remaining:
+        remaining, digit = divmod(remaining, 10)
+        expected += digit
+    assert calc.evaluate_expression("3000!#") == expected
+
+
+def test_not_finite():
+    with pytest.raises(CalculationError):
+        DigitSum()._calc(math.inf, None)
+    with pytest.raises(CalculationError):
+        DigitSum()._calc(math.nan, None)
@@ -0,0 +1,43 @@
+import math
+
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculationError
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+calc = Calculator.Calculator()
+calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+
+def test_exact_result():
+    assert calc.evaluate_expression("25!") == math.factorial(25)
+    assert calc.evaluate_expression("200!") == math.factorial(200)
+
+
+def test_float_operand():
+    assert Factorial()._calc(6.0, None) == 720
+
+
+def test_large_result_in_float_operation():
+    with pytest.raises(CalculationError):
+        calc.evaluate_expression("171! * 1.5")
+
+
+def test_large_result_in_float_operation_with_variable():
+    with pytest.raises(CalculationError):
+        calc.evaluate_expression("x! / 2", x=200)
+
+
+def test_negative():
+    assert calc.evaluate_expression("~(4!)") == -24
+
+
+def test_not_an_integer():
+    with pytest.raises(CalculationError):
+        calc.evaluate_expression("2.5!")
+
+
+def test_too_large_operand():
+    with pytest.raises(CalculationError):
+        calc.evaluate_expression("(10^6)!")
@@ -0,0 +1,163 @@
+import math
+
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculatorInputError, OperatorError
+from CompiledExpression import CompiledExpression
+from operators.Operator import Operator, Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum, \
+    MinimumFunction, MaximumFunction
+from operators.OperatorType import OperatorType
+
+
+class DoubleStar(Power):
+    def get_symbol(self) -> str:
+        return '**'
+
+
+class Mod(Modulo):
+    def get_symbol(self) -> str:
+        return 'mod'
+
+
+class Hypot(Operator):
+    def _calc(self, left, right):
+        return math.hypot(left, right)
+
+    def _calc_many(self, operands: list):
+        return math.hypot(*operands)
+
+    def get_arity(self) -> tuple:
+        return 2, 3
+
+    def get_symbol(self) -> str:
+        return 'hypot'
+
+    def get_priority(self) -> int:
+        return 7
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.FUNCTION
+
+
+class Symbol(Operator):
+    """An inner operator or a function with any symbol, that returns its first operand"""
+    def __init__(self, symbol: str, operator_type: OperatorType = OperatorType.INNER, arity: tuple = (1, None)):
+        self._symbol = symbol
+        self._operator_type = operator_type
+        self._arity = arity
+
+    def _calc(self, left, right):
+        return left
+
+    def get_arity(self) -> tuple:
+        return self._arity
+
+    def get_symbol(self) -> str:
+        return self._symbol
+
+    def get_priority(self) -> int:
+        return 1
+
+    def get_type(self) -> OperatorType:
+        return self._operator_type
+
+
+calc = Calculator.Calculator()
+calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum(),
+                    DoubleStar(), Mod(), MinimumFunction(), MaximumFunction(), Hypot()])
+
+
+@pytest.mark.parametrize("expression, variables, result", [
+    ("2**3**2", {}, 64),
+    ("2*3**2", {}, 18),
+    ("2**--3", {}, 8),
+    ("2**-1", {}, 0.5),
+    ("7 mod 3", {}, 1),
+    ("x mod y", dict(x=7, y=4), 3),
+    ("xmody", dict(x=7, y=4), 3),
+    ("maxval + minimum", dict(maxval=2, minimum=3), 5),
+    ("max(1, 2, 3)", {}, 3),
+    ("max(4)", {}, 4),
+    ("min(x, -y, 3) + max(x)", dict(x=5, y=1), 4),
+    ("max((1+2)*3, 4)", {}, 9),
+    ("max(max(1, x), min(2, 3))", dict(x=0), 2),
+    ("max(1, --2)", {}, 2),
+    ("-max(2, 3)!", {}, -6),
+    ("~max(1, 2)", {}, -2),
+    ("2*max(1, 2)^2", {}, 8),
+    ("hypot(3, 4)", {}, 5),
+    ("hypot(x, 4, 12)", dict(x=3), 13),
+])
+def test_symbols_and_functions(expression, variables, result):
+    assert calc.evaluate_expression(expression, **variables) == result
+    assert calc.compile(expression, mode="codegen").evaluate(**variables) == result
+    assert CompiledExpression.loads(calc, calc.compile(expression).dumps()).evaluate(**variables) == result
+
+
+@pytest.mark.parametrize("expression", ["max()", "hypot(1)", "hypot(1, 2, 3, 4)", "1, 2", "(1, 2)", "max(1,)",
+                                        "max(, 1)", "2max(1)", "max(1", "max 1", "mod 3", "3 mod", "3 ** * 2",
+                                        "max(1)(2)"])
+def test_invalid_expressions(expression):
+    with pytest.raises(CalculatorInputError):
+        calc.evaluate_expression(expression)
+
+
+def test_function_names_are_variables_without_brackets():
+    assert calc.evaluate_expression("max + min", max=1, min=2) == 3
+    assert calc.evaluate_expression("max(max, min)", max=1, min=2) == 2
+
+
+def test_minuses():
+    assert calc.compile("2**--x").get_expression() == "2**x"
+    assert calc.compile("x mod --y").get_expression() == "xmody"
+    assert calc.evaluate_expression("2** -x", x=2) == 0.25
+
+
+def test_invalid_operators():
+    invalid = [Symbol(''), Symbol(','), Symbol('<,'), Symbol('a1'), Symbol('a b'), Symbol('->'),
+               Symbol('f(', OperatorType.FUNCTION), Symbol('1f', OperatorType.FUNCTION),
+               Symbol('**', OperatorType.FUNCTION), Symbol('f', OperatorType.FUNCTION, (0, 1))]
+    for operator in invalid:
+        with pytest.raises(OperatorError):
+            Calculator.Calculator().add_operator(operator)
+    custom = Calculator.Calculator()
+    custom.add_operators([Symbol('<<'), Symbol('first', OperatorType.FUNCTION, (1, 1))])
+    assert custom.evaluate_expression("first(5) << 2 * 3") == 5
+
+    legacy = Calculator.Calculator(use_legacy_parser=True)
+    for operator in (DoubleStar(), MaximumFunction()):
+        with pytest.raises(OperatorError):
+            legacy.add_operator(operator)
+
+
+def test_unknown_operators():
+    custom = Calculator.Calculator()
+    custom.add_operator(Symbol('<<'))
+    with pytest.raises(CalculatorInputError):
+        # A single < is not an operator of this calculator
+        custom.evaluate_expression("2<3")
+
+
+def test_vectorized():
+    np = pytest.importorskip("numpy")
+    compiled = calc.compile("hypot(x, y) + max(x, y, 3) - x")
+    x = np.array([3.0, 5.0, 8.0])
+    y = np.array([4.0, 12.0, 15.0])
+    expected = [compiled.evaluate(x=a, y=b) for a, b in zip(x, y)]
+    assert list(compiled.evaluate_vectorized(x=x, y=y)) == expected
+
+
+def test_batches():
+    expressions = ["max(1, 2)+3", "max(4, 5)+6", "max(1)+2", "hypot(3, 4) mod 3", "2**3**2"]
+    results = [calc.evaluate_expression(expression) for expression in expressions]
+    assert calc.evaluate_batch(expressions, templates=True) == results
+    assert calc.evaluate_batch(expressions, workers=2) == results
+
+
+def test_shared_subtrees():
+    shared = Calculator.Calculator(share_subtrees=True)
+    shared.add_operators([MaximumFunction(), DoubleStar()])
+    compiled = shared.compile("max(x, 1)**2 + max(x, 1)")
+    assert compiled._tree.get_left().get_left() is compiled._tree.get_right()
+    assert compiled.evaluate(x=3) == 12
@@ -0,0 +1,145 @@
+import random
+
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculationError, CalculatorInputError
+from operators.Operator import Operator, Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+from operators.OperatorType import OperatorType
+
+calc = Calculator.Calculator()
+calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+
+class CountingMaximum(Maximum):
+    """Counts the operands of every chain it calculates"""
+    def __init__(self):
+        self.counted = 0
+
+    def _calc_many(self, operands: list) -> float:
+        self.counted += len(operands)
+        return super()._calc_many(operands)
+
+
+class Last(Operator):
+    """A function that is not associative, which gives its last argument"""
+    def _calc(self, left, right):
+        return right
+
+    def _calc_many(self, operands: list) -> float:
+        return operands[-1]
+
+    def get_symbol(self) -> str:
+        return 'last'
+
+    def get_priority(self) -> int:
+        return 7
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.FUNCTION
+
+
+def test_update():
+    compiled = calc.compile("(x+y)*z - x/2 + 3*4")
+    incremental = compiled.incremental(x=1, y=2, z=3)
+    assert incremental.get_result() == compiled.evaluate(x=1, y=2, z=3)
+    assert incremental.update(x=5) == compiled.evaluate(x=5, y=2, z=3)
+    assert incremental.update(y=-1, z=0.5) == compiled.evaluate(x=5, y=-1, z=0.5)
+    assert incremental.get_variables() == {"x": 5, "y": -1, "z": 0.5}
+
+
+def test_chains_match_evaluate():
+    # Flattened sums are rounded once, so they must be recalculated the same way
+    compiled = calc.compile("+".join("x" + str(i) for i in range(50)) + "+0.1+0.2")
+    values = {"x" + str(i): 0.1 * i for i in range(50)}
+    incremental = compiled.incremental(**values)
+    for i in range(0, 50, 7):
+        values["x" + str(i)] = 1 / (i + 3)
+        assert incremental.update(**{"x" + str(i): values["x" + str(i)]}) == compiled.evaluate(**values)
+
+
+def test_wide_chains_update_a_path():
+    counting = CountingMaximum()
+    custom = Calculator.Calculator()
+    custom.add_operator(counting)
+    compiled = custom.compile("$".join("x" + str(i) for i in range(10_000)))
+    values = {"x" + str(i): i % 1000 for i in range(10_000)}
+    incremental = compiled.incremental(**values)
+    for i in (0, 5_000, 9_999):
+        values["x" + str(i)] = 2000 + i
+        counting.counted = 0
+        result = incremental.update(**{"x" + str(i): 2000 + i})
+        # A few chains of 16 operands on the path, rather than all of the operands
+        assert counting.counted <= 5 * 16
+        assert result == compiled.evaluate(**values)
+
+
+def test_wide_sums():
+    compiled = calc.compile("+".join("x" + str(i) for i in range(1000)))
+    values = {"x" + str(i): 0.1 * i for i in range(1000)}
+    incremental = compiled.incremental(**values)
+    values["x7"] = 1 / 3
+    assert incremental.update(x7=1 / 3) == pytest.approx(compiled.evaluate(**values), rel=1e-15)
+
+
+def test_wide_functions_are_not_split():
+    custom = Calculator.Calculator()
+    custom.add_operator(Last())
+    compiled = custom.compile("last(" + ",".join("x" + str(i) for i in range(100)) + ")")
+    incremental = compiled.incremental(**{"x" + str(i): i for i in range(100)})
+    assert incremental.get_result() == 99
+    assert incremental.update(x99=-1) == -1
+
+
+def test_random_updates():
+    rand = random.Random(18)
+    names = ["a", "b", "c", "d"]
+    expression = "a"
+    for _ in range(200):
+        expression += rand.choice("+-*@&$") + rand.choice(names + ["~a", "b!", "2", "(c-d)", "(a+1)"])
+    compiled = calc.compile(expression)
+    values = {"a": 1, "b": 2, "c": 3, "d": 0.5}
+    incremental = compiled.incremental(**values)
+    for _ in range(100):
+        name = rand.choice(names)
+        values[name] = rand.randint(0, 4)
+        assert incremental.update(**{name: values[name]}) == pytest.approx(compiled.evaluate(**values))
+
+
+def test_variable_used_many_times():
+    compiled = calc.compile("x*x - 2*x + (x-1)!")
+    incremental = compiled.incremental(x=3)
+    assert incremental.update(x=4) == compiled.evaluate(x=4)
+
+
+def test_error_is_recovered_by_next_update():
+    compiled = calc.compile("1/x + y")
+    incremental = compiled.incremental(x=2, y=1)
+    with pytest.raises(CalculationError):
+        incremental.update(x=0)
+    # The division by x is still pending, so changing only y calculates it again
+    with pytest.raises(CalculationError):
+        incremental.update(y=3)
+    assert incremental.update(x=4) == compiled.evaluate(x=4, y=3)
+
+
+def test_missing_and_unknown_variables():
+    compiled = calc.compile("x+y")
+    with pytest.raises(CalculatorInputError):
+        compiled.incremental(x=1)
+    incremental = compiled.incremental(x=1, y=2)
+    with pytest.raises(CalculatorInputError):
+        incremental.update(z=1)
+
+
+def test_constant_expression():
+    incremental = calc.compile("2^10 - 3!").incremental()
+    assert incremental.get_result() == 1018
+    assert incremental.update() == 1018
+
+
+def test_instances_are_not_shared():
+    first = calc.compile("x*2").incremental(x=1)
+    second = calc.compile("x*2").incremental(x=10)
+    first.update(x=3)
+    assert (first.get_result(), second.get_result()) == (6, 20)
@@ -0,0 +1,114 @@
+import pickle
+
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculationError
+from Instrumentation import Instrumentation, PHASES
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+
+def create_calculator(**options) -> Calculator.Calculator:
+    calc = Calculator.Calculator(**options)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    return calc
+
+
+def test_phases():
+    calc = create_calculator()
+    with calc.instrumented() as stats:
+        assert calc.evaluate_expression("x * 2 + 1", x=3) == 7
+        assert calc.evaluate_expression("x*2 + 1", x=4) == 9
+    phases = stats.get_phase_stats()
+    assert list(phases) == list(PHASES)
+    # The second expression is found in the cache after normalizing it
+    assert [phases[phase].calls for phase in PHASES] == [2, 1, 1, 2]
+    assert all(phases[phase].seconds > 0 for phase in PHASES)
+
+
+def test_operators():
+    calc = create_calculator()
+    with calc.instrumented() as stats:
+        for x in range(5):
+            calc.evaluate_expression("x!^2-x", x=x)
+    operators = stats.get_operator_stats()
+    assert {symbol: calls for symbol, (calls, _) in operators.items()} == {"!": 5, "^": 5, "-": 5}
+    assert operators["!"].seconds > 0
+
+
+def test_operator_errors_are_counted():
+    calc = create_calculator()
+    with calc.instrumented() as stats:
+        with pytest.raises(CalculationError):
+            calc.evaluate_expression("1/x", x=0)
+    assert stats.get_operator_stats()["/"].calls == 1
+    assert stats.get_phase_stats()["evaluate"].calls == 1
+
+
+def test_size_histogram():
+    calc = create_calculator()
+    with calc.instrumented(Instrumentation(size_buckets=(4, 16))) as stats:
+        for expression in ("1+2", "1+2+3+4", "1+2+3+4+5+6+7+8+9"):
+            calc.evaluate_expression(expression)
+    assert stats.get_size_histogram() == [(4, 1), (16, 1), (None, 1)]
+
+
+def test_callback():
+    calls = []
+    calc = create_calculator()
+    with calc.instrumented(Instrumentation(on_phase=lambda phase, seconds: calls.append(phase))):
+        calc.evaluate_expression("1+x", x=1)
+    assert calls == ["prepare", "parse", "optimize", "evaluate"]
+
+
+def test_legacy_parser():
+    calc = create_calculator(use_legacy_parser=True)
+    with calc.instrumented() as stats:
+        assert calc.evaluate_expression("((1+2)*(3+4))") == 21
+    phases = stats.get_phase_stats()
+    # Brackets are evaluated recursively, but only the outermost call is timed
+    assert phases["evaluate"].calls == 1
+
+
+def test_off_after_the_block():
+    calc = create_calculator()
+    with calc.instrumented() as stats:
+        calc.evaluate_expression("1+x", x=1)
+    assert calc.get_instrumentation() is None
+    assert not {"_prepare", "_parse_expression_tree", "_optimize_tree", "_calc"} & set(vars(calc))
+    # Expressions compiled while instrumented are not kept, so they are not timed anymore
+    assert calc.cache_info().currsize == 0
+    calc.evaluate_expression("1+x", x=2)
+    assert stats.get_phase_stats()["evaluate"].calls == 1
+
+
+def test_pickled_calculator_is_not_instrumented():
+    calc = create_calculator()
+    with calc.instrumented():
+        copy = pickle.loads(pickle.dumps(calc))
+    assert copy.get_instrumentation() is None
+    assert copy.evaluate_expression("2^3") == 8
+
+
+def test_prometheus():
+    calc = create_calculator()
+    with calc.instrumented(Instrumentation(size_buckets=(4,))) as stats:
+        calc.evaluate_expression("x+x", x=1)
+    text = stats.to_prometheus()
+    assert '# TYPE calculator_phase_seconds_total counter' in text
+    assert 'calculator_phase_calls_total{phase="evaluate"} 1' in text
+    assert 'calculator_operator_calls_total{operator="+"} 1' in text
+    assert 'calculator_expression_size_characters_bucket{le="4"} 1' in text
+    assert 'calculator_expression_size_characters_bucket{le="+Inf"} 1' in text
+    assert 'calculator_expression_size_characters_count 1' in text
+    assert text.endswith("\n")
+    assert stats.to_prometheus(prefix="calc").startswith("# HELP calc_phase_calls_total")
+
+
+def test_reset():
+    calc = create_calculator()
+    with calc.instrumented() as stats:
+        calc.evaluate_expression("1+x", x=1)
+        stats.reset()
+    assert all(calls == 0 for calls, _ in stats.get_phase_stats().values())
+    assert stats.get_operator_stats() == {}
@@ -0,0 +1,176 @@
+import pickle
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculationError, CalculatorInputError
+from NumericBackends import NumericBackend, FLOAT, INTEGER, FRACTION, DECIMAL
+from operators.Operator import Operator, Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+from operators.OperatorType import OperatorType
+
+
+def create_calculator(backend) -> Calculator.Calculator:
+    calc = Calculator.Calculator(backend=backend)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    return calc
+
+
+class Hypotenuse(Operator):
+    """A custom operator that only declares floats"""
+    def _calc(self, left, right):
+        assert type(left) is float and type(right) is float
+        return (left ** 2 + right ** 2) ** 0.5
+
+    def get_symbol(self) -> str:
+        return '|'
+
+    def get_priority(self) -> int:
+        return 4
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.INNER
+
+
+class Hex(Operator):
+    """A custom operator that only declares floats, and uses a method only floats have"""
+    def _calc(self, left, right):
+        return len(left.hex().split('.')[0]) - 2
+
+    def get_symbol(self) -> str:
+        return 'h'
+
+    def get_priority(self) -> int:
+        return 5
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.RIGHT
+
+
+def check(calc, expression: str, expected):
+    result = calc.evaluate_expression(expression)
+    assert result == expected and type(result) is type(expected), (expression, result)
+
+
+def test_float_backend_is_the_default():
+    calc = create_calculator(FLOAT)
+    assert Calculator.Calculator().get_backend() == calc.get_backend()
+    check(calc, "2^10", 1024.0)
+    check(calc, "7/2", 3.5)
+    check(calc, "3!+4!+5!", 150)
+
+
+def test_integers_stay_exact():
+    calc = create_calculator(INTEGER)
+    check(calc, "10000%5 * 17!", 0)
+    check(calc, "2^100 + 1", 2 ** 100 + 1)
+    check(calc, "20!/18!", 380)
+    check(calc, "2@4 - 3", 0)
+    check(calc, "~-3 - ~2", 5)
+    # With floats, 2^64+1 is rounded to 2^64
+    check(calc, "(2^64+1)#", 89)
+    check(create_calculator(FLOAT), "(2^64+1)#", 88)
+    check(calc, "1+2+3+4", 10)
+
+
+def test_integers_become_floats_when_needed():
+    calc = create_calculator(INTEGER)
+    check(calc, "7/2", 3.5)
+    check(calc, "3@4", 3.5)
+    check(calc, "2^-1", 0.5)
+    check(calc, "1.5*2", 3.0)
+    check(calc, "1+2+0.5", 3.5)
+
+
+def test_huge_exact_powers_are_calculated_with_floats():
+    calc = create_calculator(INTEGER)
+    with pytest.raises(CalculationError):
+        calc.evaluate_expression("2^10000000")
+    assert calc.evaluate_expression("1^10000000") == 1
+
+
+def test_fractions():
+    calc = create_calculator(FRACTION)
+    check(calc, "1/3 + 1/6", Fraction(1, 2))
+    check(calc, "0.1 + 0.2 - 0.3", Fraction(0))
+    check(calc, "3!/4!", Fraction(1, 4))
+    check(calc, "(1/3)^2", Fraction(1, 9))
+    check(calc, "7%(5/2)", Fraction(2))
+    check(calc, "0.25#", Fraction(7))
+    assert type(calc.evaluate_expression("2^0.5")) is float
+
+
+def test_decimals():
+    calc = create_calculator(DECIMAL)
+    check(calc, "0.1 + 0.2", Decimal("0.3"))
+    check(calc, "3!/4!", Decimal("0.25"))
+    check(calc, "~1.50 * 2", Decimal("-3.00"))
+    check(calc, "12#", Decimal(3))
+    # The remainder of a decimal is calculated like the remainder of a float
+    check(calc, "-7%3", Decimal("2.0"))
+
+
+def test_custom_operator_gets_floats():
+    for backend in (FLOAT, INTEGER, FRACTION, DECIMAL):
+        calc = create_calculator(backend)
+        calc.add_operators([Hypotenuse(), Hex()])
+        assert calc.evaluate_expression("3|4") == 5
+        assert calc.evaluate_expression("3!|8") == 10
+        assert calc.evaluate_expression("3h") == 1
+        # Factorials and digit sums give integers, which are converted before they reach the operator
+        assert calc.evaluate_expression("3!h") == 1
+        assert calc.evaluate_expression("99#h") == 1
+        assert calc.compile("x!h", mode="codegen").evaluate(x=3) == 1
+
+
+def test_declared_types():
+    assert Operator.get_numeric_types(Hypotenuse()) == (float,)
+    assert Fraction in Power().get_numeric_types()
+    assert Decimal not in Modulo().get_numeric_types()
+    assert DigitSum().get_numeric_types() == (float, int)
+
+
+def test_errors():
+    with pytest.raises(CalculatorInputError):
+        Calculator.Calculator(backend="complex")
+    with pytest.raises(CalculatorInputError):
+        Calculator.Calculator(use_legacy_parser=True, backend=INTEGER)
+    for backend in (FLOAT, INTEGER, FRACTION, DECIMAL):
+        calc = create_calculator(backend)
+        with pytest.raises(CalculationError):
+            calc.evaluate_expression("1/(3-3)")
+        with pytest.raises(CalculationError):
+            calc.evaluate_expression("5%0")
+        with pytest.raises(CalculatorInputError):
+            calc.evaluate_expression("1.2.3+1")
+
+
+def test_compiled_and_incremental():
+    calc = create_calculator(FRACTION)
+    compiled = calc.compile("x/3 + 1/3")
+    assert compiled.evaluate(x=Fraction(2)) == 1
+    incremental = compiled.incremental(x=Fraction(1))
+    assert incremental.update(x=Fraction(5)) == 2
+
+
+def test_pickled_calculator_keeps_the_backend():
+    calc = pickle.loads(pickle.dumps(create_calculator(FRACTION)))
+    assert calc.get_backend().get_name() == FRACTION
+    check(calc, "1/3", Fraction(1, 3))
+
+
+def test_custom_backend():
+    class HalfBackend(NumericBackend):
+        """Every literal counts halves"""
+        def get_name(self) -> str:
+            return "half"
+
+        def get_types(self) -> tuple:
+            return (float,)
+
+        def to_number(self, text: str) -> float:
+            return float(text) / 2
+
+    calc = Calculator.Calculator(backend=HalfBackend())
+    assert calc.evaluate_expression("4+6") == 5
@@ -0,0 +1,114 @@
+import math
+
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculationError
+from Optimizer import optimize_tree
+from Tree import Tree
+from Variable import Variable
+from operators.Operator import Operator, Plus, Minus, Power, Factorial, Minimum, Maximum, Average, Negative, \
+    Modulo, DigitSum
+from operators.OperatorType import OperatorType
+
+calc = Calculator.Calculator()
+calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+
+class Subtract(Operator):
+    def _calc(self, left: float | None, right: float | None) -> float:
+        return left - right
+
+    def get_symbol(self) -> str:
+        return '_'
+
+    def get_priority(self) -> int:
+        return 1
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.INNER
+
+
+class Counter(Operator):
+    """Adds the number of times it was calculated to the operand to its left, so it is not pure"""
+    def __init__(self):
+        self.count = 0
+
+    def _calc(self, left: float | None, right: float | None) -> float:
+        self.count += 1
+        return left + self.count
+
+    def get_symbol(self) -> str:
+        return '?'
+
+    def get_priority(self) -> int:
+        return 6
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.RIGHT
+
+
+def test_constant_folding():
+    tree = optimize_tree(calc._parse_expression_tree("2*3+x*(4!-20)"))
+    assert tree.get_left().get_value() == 6
+    assert tree.get_right().get_right().get_value() == 4
+
+
+def test_impure_operators_are_not_folded():
+    counting = Calculator.Calculator()
+    counting.add_operator(Counter())
+    compiled = counting.compile("5?+1")
+    assert not compiled._tree.is_leaf()
+    assert compiled.evaluate() == 7
+    assert compiled.evaluate() == 8
+    # The pure parts around it are still folded
+    assert counting.compile("(2*3)?")._tree.get_left().is_leaf()
+
+
+def test_flattening():
+    plus = Plus()
+    tree = optimize_tree(Tree(plus, Tree(plus, Tree(Variable("a")), Tree(Variable("b"))),
+                              Tree(plus, Tree(Variable("c")), Tree(Variable("d")))))
+    assert [operand.get_value() for operand in tree.get_operands()] == [Variable(name) for name in "abcd"]
+
+
+def test_only_same_operator_is_flattened():
+    tree = optimize_tree(calc._parse_expression_tree("a+b-c+d"))
+    assert tree.get_operands() is None
+    assert tree.get_left().get_value().get_symbol() == '-'
+
+
+def test_non_associative_operator_is_not_flattened():
+    subtract = Subtract()
+    tree = optimize_tree(Tree(subtract, Tree(subtract, Tree(Variable("a")), Tree(Variable("b"))), Tree(Variable("c"))))
+    assert tree.get_operands() is None
+    assert tree.get_left().get_value() is subtract
+
+
+def test_accurate_sum():
+    assert calc.evaluate_expression("0.1+0.2+0.3") == 0.6
+    assert calc.evaluate_expression("x+0.2+0.3", x=0.1) == 0.6
+    assert Calculator.Calculator(optimize=False).evaluate_expression("0.1+0.2+0.3") != 0.6
+
+
+def test_infinite_sums():
+    assert math.isnan(calc.evaluate_expression("x+y+z", x=math.inf, y=-math.inf, z=1))
+    assert math.isnan(calc.evaluate_expression("9" * 400 + "+~" + "9" * 400 + "+1"))
+    assert calc.evaluate_expression("x+y+z", x=1e308, y=1e308, z=-1e308) == math.inf
+    assert calc.evaluate_batch(["9" * 400 + "+~" + "9" * 400 + "+1", "1+2+3"], workers=1)[1] == 6
+
+
+def test_chains():
+    assert calc.evaluate_expression("a*b*c*2 + a&b&c + a$b$c$0", a=2, b=3, c=4) == 54
+
+
+def test_errors_are_raised_on_evaluation():
+    compiled = calc.compile("1/0 + x")
+    with pytest.raises(CalculationError):
+        compiled.evaluate(x=1)
+
+
+def test_minus_is_not_flattened():
+    minus = Minus()
+    tree = optimize_tree(Tree(minus, Tree(minus, Tree(Variable("a")), Tree(Variable("b"))), Tree(Variable("c"))))
+    assert tree.get_operands() is None
@@ -0,0 +1,115 @@
+import random
+
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculatorInputError
+from Tree import Tree
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+OPERATORS = [Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()]
+
+calc = Calculator.Calculator()
+calc.add_operators(OPERATORS)
+
+legacy_calc = Calculator.Calculator(use_legacy_parser=True)
+legacy_calc.add_operators(OPERATORS)
+
+
+def same_tree(first: Tree, second: Tree) -> bool:
+    if first is None or second is None:
+        return first is second
+    return (first.get_value() == second.get_value()
+            and same_tree(first.get_left(), second.get_left())
+            and same_tree(first.get_right(), second.get_right()))
+
+
+def random_expression(rand: random.Random, terms: int) -> str:
+    expression = ""
+    for i in range(terms):
+        if i > 0:
+            expression += rand.choice("+-*/^%@&$")
+        sign = rand.random() < 0.2
+        if sign:
+            expression += '-'
+        elif rand.random() < 0.2:
+            expression += '~'
+        expression += str(rand.randint(0, 99))
+        if rand.random() < 0.3:
+            expression += str(rand.randint(0, 9)) + '.' + str(rand.randint(0, 9))
+        expression += rand.choice(["", "", "!", "#", "!!"])
+    return expression
+
+
+def test_same_tree_as_legacy_parser():
+    for expression in ["5", "-5", "5-6", "2^3*3!--4", "~-3!/3+10@0", "7-1+~8+0&4^4", "12%11+40/3^0.5/10+~6",
+                       "2*~3!", "3!-2", "2^2^3", "5+-6*-1"]:
+        assert same_tree(calc._parse_expression_tree(expression), calc._build_expression_tree(expression))
+
+
+def test_same_tree_as_legacy_parser_random():
+    rand = random.Random(1234)
+    for _ in range(300):
+        expression = random_expression(rand, rand.randint(1, 15))
+        assert same_tree(calc._parse_expression_tree(expression), calc._build_expression_tree(expression)), expression
+
+
+def test_same_results_as_legacy_parser():
+    for expression in ["2^3 * 3! - -4 + (40-20+1) / (3$1)", "7----------\t----\n----------------1 + ~8 + 0&(4^4 + 7)",
+                       "(123#%3)! + 4^2 - (8+2)*1.5 - 2 +~11", "((10 * 7 + 20) / 3 - (5 ^ 2) - ~8) @ (15 - 14) * 2 - 29"]:
+        assert calc.evaluate_expression(expression) == legacy_calc.evaluate_expression(expression)
+
+
+def test_long_expression():
+    assert calc.evaluate_expression("+".join(["1"] * 500)) == 500
+
+
+def test_missing_operator():
+    with pytest.raises(CalculatorInputError):
+        calc.evaluate_expression("5!3")
+
+
+# The deliberate differences from the legacy parser (see CHANGELOG.md)
+@pytest.mark.parametrize("expression, legacy_result, result", [
+    ("2*-~3", -6, 6),
+    ("3*-~-2", 6, -6),
+    ("2^-~3", 0.125, 8),
+])
+def test_sign_before_operand_is_kept(expression, legacy_result, result):
+    assert legacy_calc.evaluate_expression(expression) == legacy_result
+    assert calc.evaluate_expression(expression) == result
+
+
+@pytest.mark.parametrize("expression, legacy_result", [("3#36", 3), ("4!1", 24), ("2(3)", 23)])
+def test_missing_operator_is_rejected(expression, legacy_result):
+    assert legacy_calc.evaluate_expression(expression) == legacy_result
+    with pytest.raises(CalculatorInputError, match="missing an operator between two operands"):
+        calc.evaluate_expression(expression)
+
+
+@pytest.mark.parametrize("expression", ["63.17.1%()!", "(2)1@()4", "(1+2)^63.17.1()(1+2)3.5", "2+()"])
+def test_empty_brackets_are_reported_first(expression):
+    for calculator in (calc, legacy_calc):
+        with pytest.raises(CalculatorInputError, match="Brackets cannot be empty!"):
+            calculator.evaluate_expression(expression)
+
+
+def test_small_bracket_result():
+    assert calc.evaluate_expression("(1/100000)*100000 + (1/3)*3") == 2
+
+
+def test_signed_brackets():
+    assert calc.evaluate_expression("2*-(1+2)^2") == 18
+
+
+def test_deep_nesting():
+    assert calc.evaluate_expression("(1+" * 300 + "1" + ")" * 300) == 301
+
+
+def test_very_deep_nesting():
+    assert calc.evaluate_expression("(" * 5000 + "1" + ")" * 5000) == 1
+
+
+def test_missing_operator_before_brackets():
+    with pytest.raises(CalculatorInputError):
+        calc.evaluate_expression("2(3)")
@@ -0,0 +1,150 @@
+import pickle
+
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculationError, CalculatorInputError
+from PersistentCache import PersistentCache
+from operators.Operator import Operator, Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+from operators.OperatorType import OperatorType
+
+
+def create_calculator(path, **options) -> Calculator.Calculator:
+    calc = Calculator.Calculator(persistent_cache=path, **options)
+    calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+    return calc
+
+
+def not_parsed(calc: Calculator.Calculator):
+    def parse(*args):
+        raise AssertionError("The expression was parsed")
+    calc._parse_expression_tree = parse
+
+
+class Noise(Operator):
+    """An impure operator"""
+    calls = 0
+
+    def _calc(self, left, right):
+        Noise.calls += 1
+        return left + Noise.calls
+
+    def get_symbol(self) -> str:
+        return '?'
+
+    def get_priority(self) -> int:
+        return 5
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.RIGHT
+
+
+def test_warm_restart(tmp_path):
+    path = tmp_path / "plans.db"
+    cold = create_calculator(path)
+    expressions = ["(x+1)*y^2 - 3!", "2*x$y&4", "~x#"]
+    expected = [cold.evaluate_expression(expression, x=3, y=2) for expression in expressions]
+
+    warm = create_calculator(path)
+    not_parsed(warm)
+    assert [warm.evaluate_expression(expression, x=3, y=2) for expression in expressions] == expected
+    # Normalized the same way
+    assert warm.evaluate_expression("( x + 1 ) * y ^ 2 - 3 !", x=3, y=2) == expected[0]
+
+
+def test_results_of_pure_expressions(tmp_path):
+    path = tmp_path / "plans.db"
+    create_calculator(path, optimize=False).evaluate_expression("2^10 + 3! * 4")
+    warm = create_calculator(path, optimize=False)
+    compiled = warm.compile("2^10+3!*4")
+    assert compiled._tree.is_leaf() and compiled.evaluate() == 1048
+
+    # Errors are raised again, and impure operators are calculated again
+    with pytest.raises(CalculationError):
+        create_calculator(path, optimize=False).evaluate_expression("1/0")
+    with pytest.raises(CalculationError):
+        create_calculator(path, optimize=False).evaluate_expression("1/0")
+    for optimize in (False, True):
+        noisy = Calculator.Calculator(persistent_cache=path, optimize=optimize)
+        noisy.add_operator(Noise())
+        first = noisy.evaluate_expression("1?")
+        noisy.clear_cache()
+        assert noisy.evaluate_expression("1?") == first + 1
+        # Nor after a restart
+        first = noisy.evaluate_expression("1?*2")
+        restarted = Calculator.Calculator(persistent_cache=path, optimize=optimize)
+        restarted.add_operator(Noise())
+        not_parsed(restarted)
+        assert restarted.evaluate_expression("1?*2") == first + 2
+
+
+def test_changed_operators_invalidate(tmp_path):
+    path = tmp_path / "plans.db"
+    create_calculator(path).compile("x$2")
+
+    class OtherMaximum(Maximum):
+        def _calc(self, left, right):
+            return left if left >= right else right
+
+    other = Calculator.Calculator(persistent_cache=path)
+    other.add_operators([Power(), Factorial(), Minimum(), OtherMaximum(), Average(), Negative(), Modulo(), DigitSum()])
+    other.compile("x$2")
+    assert len(other._persistent_cache) == 2
+
+    class Pair(Maximum):
+        def get_arity(self) -> tuple:
+            return 2, 2
+
+    # So does a different arity
+    paired = Calculator.Calculator(persistent_cache=path)
+    paired.add_operators([Power(), Factorial(), Minimum(), Pair(), Average(), Negative(), Modulo(), DigitSum()])
+    paired.compile("x$2")
+    assert len(other._persistent_cache) == 3
+    # A different backend has its own plans too
+    create_calculator(path, backend="fraction").compile("x$2")
+    assert len(other._persistent_cache) == 4
+
+
+def test_eviction(tmp_path):
+    calc = create_calculator(PersistentCache(tmp_path / "plans.db", max_entries=5))
+    for i in range(20):
+        calc.compile("x+" + str(i))
+    assert len(calc._persistent_cache) == 5
+    with pytest.raises(CalculatorInputError):
+        PersistentCache(tmp_path / "other.db", max_entries=0)
+
+
+def test_invalid_plans_are_ignored(tmp_path):
+    path = tmp_path / "plans.db"
+    calc = create_calculator(path)
+    calc.compile("x*3")
+    calc._persistent_cache._connection.execute("UPDATE plans SET plan = substr(plan, 1, length(plan) - 1)")
+    assert create_calculator(path).evaluate_expression("x*3", x=2) == 6
+
+
+def test_unusable_files_act_as_empty(tmp_path):
+    (tmp_path / "text.db").write_bytes(b"not a database" * 100)
+    # A directory that does not exist, and a file that is not a database
+    for path in (tmp_path / "missing" / "plans.db", tmp_path / "text.db"):
+        calc = create_calculator(path)
+        assert calc.evaluate_expression("x*3", x=2) == 6
+        assert len(calc._persistent_cache) == 0
+        calc._persistent_cache.clear()
+    calc = create_calculator(tmp_path / "plans.db")
+    calc._persistent_cache._connection.execute("DROP TABLE plans")
+    assert calc.evaluate_expression("x*3", x=2) == 6
+    assert len(calc._persistent_cache) == 0
+    calc._persistent_cache.clear()
+
+
+def test_shared_by_processes(tmp_path):
+    path = tmp_path / "plans.db"
+    calc = create_calculator(path)
+    expressions = [str(i) + "*x" for i in range(50)]
+    assert pickle.loads(pickle.dumps(calc))._persistent_cache.get_path() == str(path)
+    # The workers compile the expressions, and write their plans
+    results = calc.evaluate_batch(expressions, workers=2)
+    assert all(isinstance(result, CalculatorInputError) for result in results)
+    warm = create_calculator(path)
+    not_parsed(warm)
+    assert [warm.evaluate_expression(expression, x=2) for expression in expressions] == [i * 2 for i in range(50)]
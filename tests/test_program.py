@@ -0,0 +1,36 @@
+import pytest
+
+import Calculator
+from CalculatorExceptions import OperatorError
+from Program import compile_tree, Program, CONST, BINARY, POSTFIX
+from Tree import Tree
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum, Plus
+
+calc = Calculator.Calculator()
+calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+
+def test_postfix_instructions():
+    factorial = Factorial()
+    plus = Plus()
+    program = compile_tree(Tree(plus, Tree(1.0), Tree(factorial, Tree(3.0))))
+    assert program.get_instructions() == [(CONST, 1.0), (CONST, 3.0), (POSTFIX, factorial._calc), (BINARY, plus._calc)]
+    assert program.run() == 7
+
+
+def test_same_result_as_tree():
+    for expression in ["2^3*3!--4+(40-20+1)/(3$1)", "~-3!/3+10@0+(10-(500/100+1))^2", "(123#%3)!+4^2-(8+2)*1.5-2+~11"]:
+        assert calc.compile(expression).evaluate() == calc._evaluate_tree(calc._parse_expression_tree(expression))
+
+
+def test_missing_operand():
+    with pytest.raises(OperatorError):
+        compile_tree(Tree(Plus(), Tree(1.0)))
+
+
+def test_long_chain():
+    assert calc.evaluate_expression("+".join(["1"] * 100000)) == 100000
+
+
+def test_single_constant():
+    assert Program([(CONST, 5.0)]).run() == 5
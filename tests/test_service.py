@@ -0,0 +1,129 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculatorInputError
+from EvaluationService import EvaluationService
+from operators.Operator import Operator, Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+from operators.OperatorType import OperatorType
+
+calc = Calculator.Calculator()
+calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+
+class Slow(Operator):
+    """Takes a tenth of a second, and keeps the largest number of calculations that ran at once"""
+    lock = threading.Lock()
+    running = 0
+    most_running = 0
+
+    def _calc(self, left, right):
+        with Slow.lock:
+            Slow.running += 1
+            Slow.most_running = max(Slow.most_running, Slow.running)
+        time.sleep(0.1)
+        with Slow.lock:
+            Slow.running -= 1
+        return left
+
+    def get_symbol(self) -> str:
+        return '?'
+
+    def get_priority(self) -> int:
+        return 6
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.RIGHT
+
+
+async def exchange(service: EvaluationService, lines: list) -> list:
+    """
+    Sends all the lines on one connection before reading any response
+    """
+    host, port = await service.start()
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"".join(line + b"\n" for line in lines))
+    await writer.drain()
+    responses = [json.loads(await reader.readline()) for _ in lines]
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+def run_service(lines: list, **options) -> list:
+    async def run():
+        async with EvaluationService(calc, **options) as service:
+            return await exchange(service, lines)
+    return asyncio.run(run())
+
+
+def request(request_id, expression: str) -> bytes:
+    return json.dumps({"id": request_id, "expression": expression}).encode()
+
+
+def test_pipelined_responses_in_order():
+    lines = [request(i, str(i) + "*2") for i in range(200)]
+    responses = run_service(lines, workers=2, max_in_flight=8, max_pipeline=16)
+    assert [response["id"] for response in responses] == list(range(200))
+    assert [response["result"] for response in responses] == [i * 2.0 for i in range(200)]
+
+
+def test_threads():
+    responses = run_service([request("a", "3!"), request("b", "2^10")], workers=2, use_threads=True)
+    assert responses == [{"id": "a", "expression": "3!", "result": 6},
+                         {"id": "b", "expression": "2^10", "result": 1024.0}]
+
+
+def test_errors():
+    responses = run_service([request(1, "4/0"), request(2, "2+a$"), b"not json", b'{"expression": 5}',
+                             json.dumps({"expression": "1+1"}).encode()], workers=1, use_threads=True)
+    assert responses[0] == {"id": 1, "expression": "4/0", "error": "Cannot divide by 0", "type": "CalculationError"}
+    assert responses[1]["type"] == "CalculatorInputError" and responses[1]["offset"] == 3
+    assert responses[2]["type"] == "CalculatorInputError" and "id" not in responses[2]
+    assert responses[3]["type"] == "CalculatorInputError"
+    assert responses[4] == {"expression": "1+1", "result": 2.0}
+
+
+def test_timeout():
+    responses = run_service([request(1, "40000!#"), request(2, "1+1")], workers=1, use_threads=True, timeout=0.001)
+    assert responses[0]["type"] == "TimeoutError"
+    assert responses[1]["id"] == 2
+
+
+def test_timed_out_expressions_stay_in_flight():
+    slow = Calculator.Calculator()
+    slow.add_operator(Slow())
+
+    async def run():
+        async with EvaluationService(slow, workers=3, use_threads=True, max_in_flight=1, timeout=0.01) as service:
+            return await exchange(service, [request(i, str(i) + "?") for i in range(3)])
+    responses = asyncio.run(run())
+    assert [response["type"] for response in responses] == ["TimeoutError"] * 3
+    # Every expression waited for the one before it to really finish, not only to time out
+    assert Slow.most_running == 1
+
+
+def test_many_connections():
+    async def client(host, port, number):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(b"".join(request(i, str(number) + "+" + str(i)) + b"\n" for i in range(50)))
+        responses = [json.loads(await reader.readline()) for _ in range(50)]
+        writer.close()
+        return [response["result"] for response in responses] == [float(number + i) for i in range(50)]
+
+    async def run():
+        async with EvaluationService(calc, workers=2, max_in_flight=4, max_pipeline=8) as service:
+            host, port = await service.start()
+            return await asyncio.gather(*(client(host, port, number) for number in range(10)))
+    assert all(asyncio.run(run()))
+
+
+def test_invalid_limits():
+    with pytest.raises(CalculatorInputError):
+        EvaluationService(calc, max_in_flight=0)
+    with pytest.raises(CalculatorInputError):
+        EvaluationService(calc, timeout=-1)
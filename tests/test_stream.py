@@ -0,0 +1,77 @@
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import Calculator
+import StreamEvaluator
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+calc = Calculator.Calculator()
+calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_stream(text: str, **options) -> tuple:
+    output = io.StringIO()
+    summary = StreamEvaluator.evaluate_stream(calc, io.StringIO(text), output, **options)
+    return output.getvalue(), summary
+
+
+def test_plain_output():
+    output, summary = run_stream("1+2\n3!\r\n2^10\n")
+    assert output == "3.0\n6\n1024.0\n"
+    assert (summary.expressions, summary.errors) == (3, 0)
+
+
+def test_stops_at_first_error():
+    output, summary = run_stream("1+2\n4/0\n5*5\n")
+    assert output == "3.0\nerror: Cannot divide by 0\n"
+    assert (summary.expressions, summary.errors) == (2, 1)
+
+
+def test_keep_going():
+    output, summary = run_stream("1+2\n4/0\n5*5\n1+\n", keep_going=True)
+    lines = output.splitlines()
+    assert lines[:3] == ["3.0", "error: Cannot divide by 0", "25.0"]
+    assert lines[3].startswith("error: ")
+    assert (summary.expressions, summary.errors) == (4, 2)
+
+
+def test_jsonl_output():
+    output, _ = run_stream("1+2\n2+a$\n", output_format=StreamEvaluator.JSONL, keep_going=True)
+    first, second = [json.loads(line) for line in output.splitlines()]
+    assert first == {"expression": "1+2", "result": 3.0}
+    assert second["expression"] == "2+a$"
+    assert second["type"] == "CalculatorInputError"
+    assert second["offset"] == 3
+
+
+def test_jsonl_non_finite_result():
+    assert json.loads(StreamEvaluator.format_result("x", float("inf"), StreamEvaluator.JSONL))["result"] == "inf"
+
+
+def test_chunks_are_written_in_order():
+    text = "".join(str(i) + "*2\n" for i in range(2500))
+    output, summary = run_stream(text, chunksize=100)
+    assert output == "".join(str(float(i * 2)) + "\n" for i in range(2500))
+    assert summary.expressions == 2500
+
+
+def test_workers():
+    text = "".join(str(i) + "+1\n" for i in range(300)) + "4/0\n" + "7*6\n"
+    output, summary = run_stream(text, workers=2, chunksize=16, keep_going=True)
+    lines = output.splitlines()
+    assert lines[:300] == [str(float(i + 1)) for i in range(300)]
+    assert lines[300:] == ["error: Cannot divide by 0", "42.0"]
+    assert (summary.expressions, summary.errors) == (302, 1)
+
+
+def test_command_line():
+    result = subprocess.run([sys.executable, "main.py", "-", "--keep-going", "--summary"], cwd=ROOT,
+                            input="1+2\n4/0\n3!\n", capture_output=True, text=True, timeout=60)
+    assert result.stdout == "3.0\nerror: Cannot divide by 0\n6\n"
+    assert "3 expressions (1 errors)" in result.stderr
+    assert result.returncode == 1
@@ -0,0 +1,97 @@
+import decimal
+import pickle
+import random
+
+import Calculator
+from SubtreeTable import SubtreeTable
+from Tree import Tree
+from operators.Operator import Operator, Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+from operators.OperatorType import OperatorType
+
+OPERATORS = [Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()]
+
+calc = Calculator.Calculator(share_subtrees=True)
+calc.add_operators(OPERATORS)
+plain = Calculator.Calculator()
+plain.add_operators(OPERATORS)
+
+
+class Counted(Operator):
+    """Doubles its left operand, and counts how many times it did"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def _calc(self, left, right):
+        self.calls += 1
+        return left * 2
+
+    def get_symbol(self) -> str:
+        return '?'
+
+    def get_priority(self) -> int:
+        return 5
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.RIGHT
+
+
+def test_identical_subtrees_are_shared():
+    tree = calc.compile("(x+1)*(x+1) - (x+1)")._tree
+    product = tree.get_left()
+    assert product.get_left() is product.get_right() is tree.get_right()
+    # Across expressions too
+    assert calc.compile("(x+1)/y")._tree.get_left() is tree.get_right()
+
+
+def test_shared_nodes_are_calculated_once():
+    counted = Counted()
+    calculator = Calculator.Calculator(share_subtrees=True)
+    calculator.add_operator(counted)
+    for mode in ("program", "codegen"):
+        counted.calls = 0
+        assert calculator.compile("x? * x? + x? - y", mode=mode).evaluate(x=3, y=1) == 41
+        assert counted.calls == 1
+
+
+def test_results_match_unshared():
+    rand = random.Random(22)
+    parts = ["x", "y", "(x+1)", "(y$x)", "~x", "(x*y-2)", "3!", "((x+1)*(x+1))", "(2@x)"]
+    for _ in range(200):
+        expression = rand.choice(parts)
+        for _ in range(rand.randint(2, 12)):
+            expression += rand.choice("+-*/&$") + rand.choice(parts)
+        values = {"x": rand.uniform(-5, 5), "y": rand.uniform(1, 5)}
+        expected = plain.compile(expression).evaluate(**values)
+        assert calc.compile(expression).evaluate(**values) == expected
+        assert calc.compile(expression, mode="codegen").evaluate(**values) == expected
+        incremental = calc.compile(expression).incremental(**values)
+        assert incremental.update(x=values["x"] + 1) == plain.compile(expression).evaluate(x=values["x"] + 1,
+                                                                                           y=values["y"])
+
+
+def test_different_numbers_are_not_shared():
+    table = SubtreeTable()
+    zero, negative_zero = table.intern(Tree(0.0)), table.intern(Tree(-0.0))
+    assert zero is not negative_zero
+    assert table.intern(Tree(decimal.Decimal("1.0"))) is not table.intern(Tree(decimal.Decimal("1.00")))
+    assert table.intern(Tree(2.5)) is table.intern(Tree(2.5))
+
+
+def test_table_starts_over():
+    table = SubtreeTable(max_size=10)
+    for i in range(50):
+        table.intern(Tree(float(i)))
+        assert len(table) <= 10
+    calculator = Calculator.Calculator(share_subtrees=True)
+    calculator.compile("x*2+1")
+    assert len(calculator._subtrees) > 0
+    calculator.clear_cache()
+    assert len(calculator._subtrees) == 0
+
+
+def test_pickled():
+    copy = pickle.loads(pickle.dumps(calc))
+    assert copy._subtrees is not None
+    assert copy.evaluate_expression("(x+1)*(x+1)", x=2) == 9
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculatorInputError
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+calc = Calculator.Calculator()
+calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+
+def separate_passes(expression: str) -> str:
+    try:
+        normalized = calc._normalize(expression)
+        calc._validate(normalized)
+        return normalized
+    except CalculatorInputError as e:
+        return "error: " + str(e)
+
+
+def single_pass(expression: str) -> str:
+    try:
+        return calc._prepare(expression)
+    except CalculatorInputError as e:
+        return "error: " + str(e)
+
+
+def test_same_as_separate_passes():
+    for expression in ["5 --- 6", "--5", "5*--6", "5!--6", "(--5)", "----", "1 + * 2", "(1+2", "1+2)+3", "1)",
+                       "((1)", "1.", ".5", "~~5", "5~", "-", "x -- y", "2^3 * 3! - -4 + (40-20+1) / (3$1)"]:
+        assert single_pass(expression) == separate_passes(expression), expression
+
+
+def test_same_as_separate_passes_random():
+    rand = random.Random(4321)
+    characters = "0123456789.()+-*/^!#~%@$&xy_ \t----(())?"
+    for _ in range(20000):
+        expression = "".join(rand.choice(characters) for _ in range(rand.randint(0, 12)))
+        assert single_pass(expression) == separate_passes(expression), expression
+
+
+@pytest.mark.parametrize("expression, offset", [
+    ("1 + 2 * ?", 8),
+    ("(1 + 2", 0),
+    ("1 + 2) + (3", 5),
+    ("1 + * 2", 2),
+    ("1 + 2 .", 6),
+    ("5 -- -- 3 + *", 10),
+    ("((4)", 0),
+])
+def test_offset(expression, offset):
+    with pytest.raises(CalculatorInputError) as info:
+        calc.compile(expression)
+    assert info.value.offset == offset
+
+
+def test_offset_of_operator_random():
+    rand = random.Random(99)
+    for _ in range(5000):
+        expression = "".join(rand.choice("12 -+*~!(") for _ in range(rand.randint(1, 12)))
+        try:
+            calc.compile(expression)
+        except CalculatorInputError as e:
+            message = str(e)
+            if message.startswith("Invalid expression structure: operator "):
+                assert expression[e.offset] == message.split()[4], expression
+
+
+def test_normalized_expression_is_not_read_again(monkeypatch):
+    compiled = calc.compile("7*3")
+
+    def prepare(expression):
+        raise AssertionError("the expression was read again")
+
+    monkeypatch.setattr(calc, "_prepare", prepare)
+    assert calc.compile("7*3") is compiled
+
+
+def test_million_minuses():
+    expression = "5" + "-" * 10 ** 6 + "3"
+    assert calc._remove_adjacent_minuses(expression) == "5--3"
+    assert calc.evaluate_expression(expression) == 8
+
+
+def test_many_minus_sequences():
+    expression = "1" + "---1" * 10 ** 5
+    assert calc._remove_adjacent_minuses(expression) == "1" + "-1" * 10 ** 5
+    assert calc._prepare(expression) == "1" + "-1" * 10 ** 5
+    assert calc.evaluate_expression("1" + "---1" * 10 ** 4) == 1 - 10 ** 4
+    assert calc._remove_adjacent_minuses("2" + "*--2" * 10 ** 5) == "2" + "*2" * 10 ** 5
@@ -0,0 +1,33 @@
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculatorInputError
+from operators.Operator import Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+
+calc = Calculator.Calculator()
+calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+
+def test_variables():
+    assert calc.evaluate_expression("x^2 + 2*x*y_1 + y_1^2", x=3, y_1=4) == 49
+
+
+def test_signed_variable():
+    assert calc.evaluate_expression("-x + 2*-rate", x=1, rate=2) == -5
+
+
+def test_compiled_variables():
+    compiled = calc.compile("(a + b)! / a")
+    assert compiled.get_variables() == ["a", "b"]
+    assert compiled.evaluate(a=1, b=2) == 6
+    assert compiled.evaluate(a=2, b=2) == 12
+
+
+def test_missing_variable():
+    with pytest.raises(CalculatorInputError):
+        calc.evaluate_expression("x + y", x=1)
+
+
+def test_number_followed_by_variable():
+    with pytest.raises(CalculatorInputError):
+        calc.evaluate_expression("2x", x=1)
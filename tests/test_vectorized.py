@@ -0,0 +1,74 @@
+import math
+
+import pytest
+
+import Calculator
+from CalculatorExceptions import CalculationError
+from operators.Operator import Operator, Power, Factorial, Minimum, Maximum, Average, Negative, Modulo, DigitSum
+from operators.OperatorType import OperatorType
+
+np = pytest.importorskip("numpy")
+
+calc = Calculator.Calculator()
+calc.add_operators([Power(), Factorial(), Minimum(), Maximum(), Average(), Negative(), Modulo(), DigitSum()])
+
+
+class Hypotenuse(Operator):
+    def _calc(self, left: float | None, right: float | None) -> float:
+        return math.hypot(left, right)
+
+    def get_symbol(self) -> str:
+        return '|'
+
+    def get_priority(self) -> int:
+        return 3
+
+    def get_type(self) -> OperatorType:
+        return OperatorType.INNER
+
+
+def scalar_results(compiled, **arrays) -> list:
+    results = []
+    for values in zip(*arrays.values()):
+        try:
+            results.append(compiled.evaluate(**dict(zip(arrays.keys(), values))))
+        except CalculationError:
+            results.append(math.nan)
+    return results
+
+
+def test_same_as_scalar():
+    compiled = calc.compile("x^2 + y/x - (x$y)! + y# + x%2 + ~x@y&3 + (x*10)#")
+    x = np.array([1, 2, 0, -3, 4.5, 12, 1.25, -0.5])
+    y = np.array([3, 0, 5, 2, 1.25, 7, -8, 0.5])
+    assert np.allclose(compiled.evaluate_vectorized(x=x, y=y), scalar_results(compiled, x=x, y=y), equal_nan=True)
+
+
+def test_power_errors():
+    compiled = calc.compile("x^y")
+    x = np.array([-4, 0, 2, -8])
+    y = np.array([0.5, -1, 3, 2])
+    assert np.allclose(compiled.evaluate_vectorized(x=x, y=y), [math.nan, math.nan, 8, 64], equal_nan=True)
+
+
+def test_mask_policy():
+    result = calc.compile("1/x").evaluate_vectorized("mask", x=np.array([1, 0, 4]))
+    assert list(result.mask) == [False, True, False]
+    assert result[2] == 0.25
+
+
+def test_raise_policy():
+    with pytest.raises(CalculationError):
+        calc.compile("1/x").evaluate_vectorized("raise", x=np.array([1, 0, 4]))
+
+
+def test_broadcasting():
+    result = calc.compile("x*y + 1").evaluate_vectorized(x=np.array([[1], [2]]), y=np.array([1, 2, 3]))
+    assert result.tolist() == [[2, 3, 4], [3, 5, 7]]
+
+
+def test_custom_operator_fallback():
+    custom_calc = Calculator.Calculator()
+    custom_calc.add_operator(Hypotenuse())
+    result = custom_calc.compile("x|4 + 1").evaluate_vectorized(x=np.array([3, 0]))
+    assert result.tolist() == [6, 5]